@@ -1,19 +1,70 @@
-from flask import Flask, render_template, request, redirect, url_for
+import itertools
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+from flask import Flask, abort, jsonify, render_template, request, redirect, url_for
 
 from core.deal_enums import GameStatus
 from game_logic import Game
+from rooms import DEFAULT_TABLE, TableManager
 
 app = Flask(__name__)
-game = Game()
-
-
-@app.route('/')
-def index():
-    """Strona główna gry."""
-    if game.game_status == GameStatus.DEAL_CARDS:
-        game.deal_cards()
-    # Sprawdź, czy gracze mają już rozdane karty
-    if not all(player.hand for player in game.players):
+tables = TableManager(Game)  # niezależne stoły, tworzone przy pierwszym wejściu pod /table/<table_id>
+
+STATE_WAIT_MAX = 30.0  # najdłuższe oczekiwanie long-poll na zmianę stanu (sekundy)
+_BOOT = uuid.uuid4().hex[:8]  # ETagi sprzed restartu serwera nie pasują do nowych gier
+_registry = threading.Lock()  # chroni tworzenie i zamykanie stołów
+_epochs = itertools.count()
+# Wpisy istnieją tak długo jak stół: tworzone razem z nim, usuwane przy zamknięciu
+table_changes: Dict[str, threading.Condition] = {}  # blokada stołu, budzi czekających na zmianę stanu
+table_epochs: Dict[str, int] = {}  # numer nadany stołowi przy utworzeniu: nowa gra zaczyna od wersji 0
+state_cache: Dict[str, Tuple[str, dict]] = {}  # id stołu: (ETag, stan) ostatnio zbudowanego stanu
+
+
+def _lock(table_id: str, create: bool = True) -> Optional[threading.Condition]:
+    """
+    Bierze blokadę stołu, z create=True tworząc stół, jeśli go nie ma.
+    Zwraca None (bez blokady), gdy stołu nie ma, a create=False.
+    """
+    while True:
+        with _registry:
+            changes = table_changes.get(table_id)
+            if changes is None:
+                if not create:
+                    return None
+                changes = table_changes[table_id] = threading.Condition()
+                table_epochs[table_id] = next(_epochs)
+                tables.get_or_create(table_id)
+        changes.acquire()
+        if table_changes.get(table_id) is changes:
+            return changes
+        changes.release()  # stół zamknięto, zanim blokada została wzięta
+
+
+@contextmanager
+def _action(table_id: str):
+    """Akcja na grze stołu: pod blokadą stołu, po niej budzi czekających, jeśli stan się zmienił."""
+    changes = _lock(table_id)
+    try:
+        game = tables.get(table_id)
+        before = _etag(table_id, game)
+        yield game
+        if _etag(table_id, game) != before:
+            changes.notify_all()
+    finally:
+        changes.release()
+
+
+def _etag(table_id: str, game: Game) -> str:
+    return f"{_BOOT}-{table_epochs.get(table_id)}-{game.version}"
+
+
+def _view(game: Game) -> dict:
+    """Dane do wyświetlenia stołu, wspólne dla szablonu i /state."""
+    # Sprawdź, czy gracze mają już rozdane karty (po rozdaniu pasowanym zostają im karty poprzedniego)
+    if game.game_status == GameStatus.DEAL_CARDS or not all(player.hand for player in game.players):
         hands = None  # Brak rąk do wyświetlenia
     else:
         # Ręce graczy w formacie do szablonu (np. ['2H', '3D', ...])
@@ -29,41 +80,126 @@ def index():
     )
 
     bidding_rounds, bidding_order = game.get_bidding_history()
-    legal_bids = game.get_legal_bids()
+    legal_bids = game.get_legal_bids() if game.game_status == GameStatus.AUCTION else []
 
     legal_cards = game.get_legal_cards_to_play() if game.game_status == GameStatus.PLAY else []
 
-    return render_template("game.html",
-                           game=game,
-                           hands=hands,
-                           trick=trick,
-                           bidding_rounds=bidding_rounds,
-                           bidding_order=bidding_order,
-                           legal_bids=legal_bids,
-                           legal_cards=legal_cards  # ← pass this into the template
-                           )
-
-
-@app.route('/bid', methods=['POST'])
-def bid():
+    return dict(hands=hands,
+                trick=trick,
+                bidding_rounds=bidding_rounds,
+                bidding_order=bidding_order,
+                legal_bids=legal_bids,
+                legal_cards=legal_cards)
+
+
+def _state(game: Game) -> dict:
+    """Stan do /state; przed rozdaniem (status DEAL_CARDS) bez rąk, kolejki i odzywek."""
+    contract = game.get_contract()
+    dealt = game.game_status != GameStatus.DEAL_CARDS
+    return {
+        'version': game.version,
+        'status': game.game_status.name,
+        'turn': game.playing_direction.abbreviation() if dealt and game.playing_direction else None,
+        'contract': str(contract) if contract and contract.level else None,
+        'tricks': list(game.get_tricks_count()),
+        'scores': str(game.get_current_scores()),
+        **_view(game),
+    }
+
+
+@app.route('/', defaults={'table_id': DEFAULT_TABLE})
+@app.route('/table/<table_id>')
+def index(table_id):
+    """Strona główna gry."""
+    with _action(table_id) as game:
+        if game.game_status == GameStatus.DEAL_CARDS:
+            game.deal_cards()
+        view = _view(game)
+    return render_template("game.html", table_id=table_id, game=game, **view)
+
+
+@app.route('/state', defaults={'table_id': DEFAULT_TABLE})
+@app.route('/table/<table_id>/state')
+def state(table_id):
+    """
+    Stan gry w JSON z wersją i ETagiem. Klient odsyła ETag w If-None-Match i dopóki stan się nie zmienił, dostaje
+    pustą odpowiedź 304 (stan nie jest nawet budowany). Z ?wait=<sekundy> (long-poll) serwer czeka na zmianę stanu
+    najdłużej STATE_WAIT_MAX sekund i dopiero wtedy odpowiada: nowym stanem albo 304.
+    Odczyt nie zmienia gry: stół czekający na rozdanie dostaje stan DEAL_CARDS bez kart, rozdają akcje i strona stołu.
+    """
+    wait = min(max(request.args.get('wait', 0.0, type=float), 0.0), STATE_WAIT_MAX)
+    changes = _lock(table_id, create=False)
+    if changes is None:
+        abort(404)  # odczyt stanu nie tworzy stołu
+    try:
+        game = tables.get(table_id)
+        if wait and request.if_none_match.contains(_etag(table_id, game)):
+            # wait_for zwalnia blokadę stołu na czas czekania, akcje innych graczy mogą się wykonać
+            changes.wait_for(lambda: table_changes.get(table_id) is not changes or not request.if_none_match.contains(
+                _etag(table_id, tables.get(table_id))), wait)
+            if table_changes.get(table_id) is not changes:
+                abort(404)  # stół został w tym czasie zamknięty
+            game = tables.get(table_id)
+        etag = _etag(table_id, game)
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+        else:
+            # Stan danej wersji jest budowany raz, kolejni pytający dostają go z pamięci
+            cached = state_cache.get(table_id)
+            if cached is None or cached[0] != etag:
+                cached = etag, _state(game)
+                state_cache[table_id] = cached
+            response = jsonify(cached[1])
+    finally:
+        changes.release()
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@app.route('/bid', defaults={'table_id': DEFAULT_TABLE}, methods=['POST'])
+@app.route('/table/<table_id>/bid', methods=['POST'])
+def bid(table_id):
     """Obsługa licytacji."""
     bid = request.form.get('bid')
-    game.bid(bid)
-    return redirect(url_for('index'))
+    with _action(table_id) as game:
+        game.bid(bid)
+    return redirect(url_for('index', table_id=table_id))
 
 
-@app.route('/play', methods=['POST'])
-def play():
+@app.route('/play', defaults={'table_id': DEFAULT_TABLE}, methods=['POST'])
+@app.route('/table/<table_id>/play', methods=['POST'])
+def play(table_id):
     card = request.form.get('card')
-    game.play_card(card)
-    return redirect(url_for('index'))
+    with _action(table_id) as game:
+        game.play_card(card)
+    return redirect(url_for('index', table_id=table_id))
 
 
 
-@app.route('/new_deal', methods=['POST'])
-def new_deal():
+@app.route('/new_deal', defaults={'table_id': DEFAULT_TABLE}, methods=['POST'])
+@app.route('/table/<table_id>/new_deal', methods=['POST'])
+def new_deal(table_id):
     """Przejście do nowego rozdania po zakończeniu gry."""
-    game.prepare_new_deal()  # zakładam, że ustawia game_status = DEAL_CARDS
+    with _action(table_id) as game:
+        game.prepare_new_deal()  # zakładam, że ustawia game_status = DEAL_CARDS
+    return redirect(url_for('index', table_id=table_id))
+
+
+@app.route('/table/<table_id>/close', methods=['POST'])
+def close_table(table_id):
+    """Usuwa stół wraz z jego grą."""
+    changes = _lock(table_id, create=False)
+    if changes is None:
+        return redirect(url_for('index'))
+    try:
+        with _registry:
+            tables.remove_table(table_id)
+            del table_changes[table_id], table_epochs[table_id]
+            state_cache.pop(table_id, None)
+        changes.notify_all()  # czekający na stan dostaną 404
+    finally:
+        changes.release()
     return redirect(url_for('index'))
 
 
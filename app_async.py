@@ -0,0 +1,234 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import wraps
+from inspect import signature
+from typing import Dict, Optional
+from urllib.parse import parse_qs
+
+import socketio
+from jinja2 import Environment, FileSystemLoader
+
+from cluster import Shard
+from metrics import REGISTRY
+from persistence import TableStore
+from rooms import DEFAULT_TABLE
+from spectators import SPECTATOR_TICK
+from table_server import LOCAL_ADDRESSES, Emit, MoveRoom, TableServer, count_packet, par_update, timed
+
+"""
+Realtime mode on asyncio: the same game as app_socket.py, served by python-socketio's AsyncServer as an ASGI app.
+
+    uvicorn app_async:app --port 5000        (or python app_async.py)
+
+Every event handler is a coroutine. The game actions themselves take microseconds and run on the event loop, one at
+a time per table (a lock per table keeps the order in which they arrived); everything slower is awaited instead of
+blocking the loop: the double dummy solving for par runs in the shared process pool, rebuilding a table from its log
+and opening or flushing the SQLite store run in the default thread pool. An idle connection is only a Socket.IO
+session and a seat in TableManager, so a process holds tens of thousands of them.
+
+Started by cluster.py, the server is one worker of several: it only accepts the tables of its shard and shares
+broadcasts with the other workers through the cluster's message bus.
+"""
+
+shard = Shard.from_env()  # None when the server runs alone
+sio = socketio.AsyncServer(async_mode='asgi', client_manager=shard.manager() if shard else None)
+# Worker processes start on first use and are shared by all tables. A cluster already runs a server per core, so each
+# of its servers solves with a single process instead of starting one per core
+solver_pool = ProcessPoolExecutor(max_workers=1 if shard else None)
+server = TableServer(solver_pool)  # the game itself, this module only carries out its actions on the AsyncServer
+tables = server.tables
+table_locks: Dict[str, asyncio.Lock] = {}
+store: Optional[TableStore] = None  # opened at startup
+
+_templates = Environment(loader=FileSystemLoader('templates'))
+_templates.globals['url_for'] = lambda endpoint, filename: f'/{endpoint}/{filename}'
+
+
+def on_event(event: str):
+    """
+    sio.on for a coroutine, timing it and counting its errors
+    """
+    def register(handler):
+        arity = len(signature(handler).parameters)
+
+        @wraps(handler)
+        async def timed_handler(*args):
+            with timed(event):
+                # connect gets (sid, environ, auth) and disconnect (sid, reason), the handlers take what they need
+                return await handler(*args[:arity])
+
+        return sio.on(event)(timed_handler)
+    return register
+
+
+def count_emits(send_packet):
+    @wraps(send_packet)
+    async def counted(eio_sid, packet):
+        count_packet(packet)
+        return await send_packet(eio_sid, packet)
+    return counted
+
+
+sio.eio.send_packet = count_emits(sio.eio.send_packet)
+
+
+async def perform(actions):
+    for action in actions:
+        if isinstance(action, Emit):
+            args = () if action.data is None else (action.data,)
+            await sio.emit(action.event, *args, to=action.to, skip_sid=action.skip_sid)
+        elif isinstance(action, MoveRoom):
+            if action.leave is not None:
+                await sio.leave_room(action.sid, action.leave)
+            if action.enter is not None:
+                await sio.enter_room(action.sid, action.enter)
+        else:
+            sio.start_background_task(send_par, action.handler, action.table_id, action.par_job)
+
+
+def table_lock(table_id: str) -> asyncio.Lock:
+    if table_id not in table_locks:
+        table_locks[table_id] = asyncio.Lock()
+    return table_locks[table_id]
+
+
+async def run_in_thread(function, *args):
+    return await asyncio.get_running_loop().run_in_executor(None, function, *args)
+
+
+@on_event('connect')
+async def handle_connect(sid, environ):
+    # The client picks its table with ?table=<id>
+    query = parse_qs(environ.get('QUERY_STRING', ''))
+    table_id = query.get('table', [''])[0] or DEFAULT_TABLE
+    if shard and not shard.owns(table_id):
+        raise socketio.exceptions.ConnectionRefusedError(f'Table {table_id} is served by another worker')
+    async with table_lock(table_id):
+        handler, new_table = server.join(sid, table_id, query.get('wire') == ['binary'])
+        # Rebuilding a rubber from its log runs in a thread
+        if new_table and not await run_in_thread(server.restore, table_id, handler):
+            server.new_rubber(table_id, handler, store.open_log(table_id))
+        await perform(server.connected(sid))
+
+
+@on_event('disconnect')
+async def handle_disconnect(sid):
+    table_id = tables.table_id_of(sid)
+    if table_id is None:
+        server.disconnect(sid)  # only forgets its wire protocol
+        return
+    async with table_lock(table_id):
+        await perform(server.disconnect(sid))
+        if table_id not in tables:
+            table_locks.pop(table_id, None)
+
+
+async def at_table(sid, actions):
+    """
+    Run a game action of the connection's table under the table's lock, so the actions of a table keep their order
+    :param actions: TableServer method taking the sid, with its other arguments bound
+    """
+    table_id = tables.table_id_of(sid)
+    if table_id is None:
+        return
+    async with table_lock(table_id):
+        await perform(actions(sid))
+
+
+@on_event('choose_role')
+async def choose_role(sid, role: str):
+    await at_table(sid, lambda sid: server.choose_role(sid, role))
+
+
+@on_event('toggle_ready')
+async def toggle_ready(sid):
+    await at_table(sid, server.toggle_ready)
+
+
+@on_event('make_bid')
+async def make_bid(sid, bid):
+    await at_table(sid, lambda sid: server.make_bid(sid, bid))
+
+
+@on_event('play_card')
+async def play_card(sid, card):
+    await at_table(sid, lambda sid: server.play_card(sid, card))
+
+
+@on_event('request_resync')
+async def request_resync(sid):
+    await at_table(sid, server.request_resync)
+
+
+@on_event('end_scores')
+async def end_scores(sid):
+    await at_table(sid, server.end_scores)
+
+
+async def send_par(handler, table_id, par_job):
+    # The solver future of the process pool is awaited directly, nothing polls
+    if par_job is None:
+        return  # par is turned off
+    try:
+        await asyncio.wrap_future(par_job['future'])
+    except asyncio.CancelledError:
+        return  # the table was closed or a new deal started
+    except Exception:
+        pass  # reported by par_update
+    update = await run_in_thread(par_update, handler, table_id, par_job)
+    if update is not None:
+        await perform([update])
+
+
+async def release_delayed_views():
+    while True:
+        await sio.sleep(SPECTATOR_TICK)
+        await perform(server.spectator_views())
+
+
+async def http_app(scope, receive, send):
+    """
+    The page and the metrics; Socket.IO and /static are served by socketio.ASGIApp
+    """
+    if scope['path'] == '/':
+        status, content_type, body = 200, 'text/html; charset=utf-8', _index_page
+    elif scope['path'] == '/metrics':
+        # Prometheus text format, only for scrapers on this machine
+        if (scope.get('client') or ('',))[0] in LOCAL_ADDRESSES:
+            status, content_type, body = 200, 'text/plain; version=0.0.4; charset=utf-8', REGISTRY.render().encode()
+        else:
+            status, content_type, body = 403, 'text/plain', b'Forbidden'
+    else:
+        status, content_type, body = 404, 'text/plain', b'Not Found'
+    await receive()
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', content_type.encode())]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+_index_page = _templates.get_template('test_temp.html').render().encode()
+
+
+async def startup():
+    global store
+    store = await run_in_thread(TableStore, os.environ.get('BRIDGE_DB', 'tables.db'))
+    server.table_logs.update(await run_in_thread(store.load))
+    if server.spectators.delay:
+        sio.start_background_task(release_delayed_views)
+
+
+async def shutdown():
+    await run_in_thread(store.close)  # commits the last queued actions
+    solver_pool.shutdown(wait=False, cancel_futures=True)
+
+
+app = socketio.ASGIApp(sio, other_asgi_app=http_app, static_files={'/static': 'static'},
+                       on_startup=startup, on_shutdown=shutdown)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    print('Server started')
+    uvicorn.run(app, host='0.0.0.0', port=5000)
@@ -1,13 +1,69 @@
 # import eventlet
 # eventlet.monkey_patch(os=False)
-from flask import Flask, render_template, request
-from flask_socketio import SocketIO, emit
-from game_handler_jason import Handler
+import atexit
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import wraps
+from inspect import signature
+
+from flask import Flask, Response, abort, render_template, request
+from flask_socketio import SocketIO, join_room, leave_room
+from metrics import REGISTRY
+from persistence import TableStore
+from rooms import DEFAULT_TABLE
+from spectators import SPECTATOR_TICK
+from table_server import LOCAL_ADDRESSES, Emit, MoveRoom, TableServer, count_packet, par_update, timed
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'tanuki???'
 socketio = SocketIO(app, async_mode='gevent')
-handler = Handler()
+solver_pool = ProcessPoolExecutor()  # worker processes start on first use and are shared by all tables
+server = TableServer(solver_pool)  # the game itself, this module only carries out its actions on Flask-SocketIO
+store = TableStore(os.environ.get('BRIDGE_DB', 'tables.db'))
+atexit.register(store.close)  # commits the last queued actions on shutdown
+server.table_logs.update(store.load())
+
+
+def on_event(event: str):
+    """
+    socketio.on that also times the handler and counts its errors
+    """
+    def register(handler):
+        arity = len(signature(handler).parameters)
+
+        @wraps(handler)
+        def timed_handler(*args):
+            with timed(event):
+                # Flask-SocketIO passes extra arguments (auth, disconnect reason) that the handler may not take
+                return handler(*args[:arity])
+
+        return socketio.on(event)(timed_handler)
+    return register
+
+
+def count_emits(send_packet):
+    @wraps(send_packet)
+    def counted(eio_sid, packet):
+        count_packet(packet)
+        return send_packet(eio_sid, packet)
+    return counted
+
+
+socketio.server.eio.send_packet = count_emits(socketio.server.eio.send_packet)
+
+
+def perform(actions):
+    for action in actions:
+        if isinstance(action, Emit):
+            args = () if action.data is None else (action.data,)
+            socketio.emit(action.event, *args, to=action.to, skip_sid=action.skip_sid)
+        elif isinstance(action, MoveRoom):
+            if action.leave is not None:
+                leave_room(action.leave, sid=action.sid)
+            if action.enter is not None:
+                join_room(action.enter, sid=action.sid)
+        else:
+            socketio.start_background_task(send_par, action.handler, action.table_id, action.par_job)
 
 
 @app.route('/')
@@ -15,147 +71,79 @@ def index():
     return render_template('test_temp.html')
 
 
-@socketio.on('connect')
+@app.route('/metrics')
+def metrics():
+    # Prometheus text format, only for scrapers on this machine
+    if request.remote_addr not in LOCAL_ADDRESSES:
+        abort(403)
+    return Response(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@on_event('connect')
 def handle_connect():
     sid = request.sid
-    if not handler.game_running:
-        emit('available_roles', handler.available_dirs(), broadcast=True)
-    '''elif handler.get_game_status_str() == 'AUCTION':
-        emit('bidding_phase', room=sid)
-        emit('update_auction', handler.auction_status(), room=sid)
-        update_player_auction_single(sid)
-    elif handler.get_game_status_str() == 'PLAY':
-        emit('play_phase', room=sid)
-        emit('update_play', handler.play_status(), room=sid)
-        update_player_play_single(sid)
-    elif handler.get_game_status_str() == 'DISPLAY_SCORE':
-        emit('score_phase', room=sid)
-        emit('update_score', handler.score_status(), room=sid)
-    elif handler.get_game_status_str() == 'GAME_OVER':
-        emit('game_finished', room=sid)
-        emit('update_game_over', handler.game_over_status(), room=sid)'''
-
-
-@socketio.on('disconnect')
+    # The client picks its table with ?table=<id>
+    table_id = request.args.get('table') or DEFAULT_TABLE
+    handler, new_table = server.join(sid, table_id, request.args.get('wire') == 'binary')
+    if new_table and not server.restore(table_id, handler):
+        server.new_rubber(table_id, handler, store.open_log(table_id))
+    perform(server.connected(sid))
+
+
+@on_event('disconnect')
 def handle_disconnect():
-    sid = request.sid
-    was_running = handler.game_running
-    if handler.remove_player(sid) and was_running:
-        emit('game_paused', broadcast=True)
-        emit('lobby_phase', broadcast=True)
-    emit('update_lobby', handler.get_status(), broadcast=True)  # outside the if for potential spectator handling
+    perform(server.disconnect(request.sid))
 
 
-@socketio.on('choose_role')
+@on_event('choose_role')
 def choose_role(role: str):
-    sid = request.sid
-    if not handler.add_player(sid, role):
-        emit('action_failed', f'Role {role} is taken. Select a different role.')
-        return
-    emit('role_assigned', role)
-    emit('update_lobby', handler.get_status(), broadcast=True)
-    emit('available_roles', handler.available_dirs(), broadcast=True)
+    perform(server.choose_role(request.sid, role))
 
 
-@socketio.on('toggle_ready')
+@on_event('toggle_ready')
 def toggle_ready():
-    sid = request.sid
-    handler.toggle_ready(sid)
-    emit('update_lobby', handler.get_status(), broadcast=True)
-
-    if handler.game_running:
-        if handler.get_game_status_str() == 'DEAL_CARDS':
-            handler.deal_cards()
-
-        if handler.get_game_status_str() == 'AUCTION':
-            emit('bidding_phase', broadcast=True)
-            emit('update_auction', handler.auction_status(), broadcast=True)
-            update_player_auction()
-        elif handler.get_game_status_str() == 'PLAY':
-            emit('play_phase', broadcast=True)
-            # emit('update_play', handler.play_status(), broadcast=True) when implementing spectators, this should be modified to update their play screen correctly
-            update_player_play()
-        elif handler.get_game_status_str() == 'DISPLAY_SCORE':
-            emit('score_phase', broadcast=True)
-            emit('update_score', handler.score_status(), broadcast=True)
-        elif handler.get_game_status_str() == 'GAME_OVER':
-            emit('game_finished', broadcast=True)
-            emit('update_game_over', handler.game_over_status(), broadcast=True)
-
-
-@socketio.on('make_bid')
+    perform(server.toggle_ready(request.sid))
+
+
+@on_event('make_bid')
 def make_bid(bid):
-    sid = request.sid
-    if not handler.make_bid(sid, bid):
-        emit('action_failed', "Can't bid. Not your turn or wrong phase.")
-        return
-    emit('update_auction', handler.auction_status(), broadcast=True)
-    update_player_auction()
-    if handler.get_game_status_str() == 'PLAY':
-        emit('play_phase', broadcast=True)
-        # emit('update_play', handler.play_status(), broadcast=True)
-        update_player_play()
-
-
-@socketio.on('play_card')
+    perform(server.make_bid(request.sid, bid))
+
+
+@on_event('play_card')
 def play_card(card):
-    handler.play_card(card)
+    perform(server.play_card(request.sid, card))
 
-    if handler.get_game_status_str() == 'DISPLAY_SCORE':
-        emit('score_phase', broadcast=True)
-        emit('update_score', handler.score_status(), broadcast=True)
-        return
-    elif handler.get_game_status_str() == 'GAME_OVER':
-        emit('game_finished', broadcast=True)
-        emit('update_game_over', handler.game_over_status(), broadcast=True)
-        return
 
-    # emit('update_play', handler.play_status(), broadcast=True)
-    update_player_play()
+@on_event('request_resync')
+def request_resync():
+    perform(server.request_resync(request.sid))
 
 
-@socketio.on('end_scores')
+@on_event('end_scores')
 def end_scores():
-    handler.end_scores()
-    emit('bidding_phase', broadcast=True)
-    emit('update_auction', handler.auction_status(), broadcast=True)
-    update_player_auction()
-
-
-def update_player_auction(sid=None):
-    if sid:
-        emit('player_update_auction', handler.get_player_hands()[sid], room=sid)
-    else:
-        for sid in handler.player_dict:
-            emit('player_update_auction', handler.get_player_hands()[sid], room=sid)
-
-
-def update_player_play(sid=None):
-    hand_status = handler.player_hand_update()
-    visible_hands = handler.get_visible_hands_per_sid()
-    play_status = handler.play_status()
-    dummy_controller = handler.get_dummy_controller_sid()
-
-    if sid:
-        update_player_play_emit(sid, hand_status, visible_hands, play_status, dummy_controller)
-    else:
-        for sid in handler.player_dict:
-            update_player_play_emit(sid, hand_status, visible_hands, play_status, dummy_controller)
-
-
-def update_player_play_emit(sid, hand_status, visible_hands, play_status, dummy_controller):
-    emit('update_play', {
-        'turn': hand_status['player_turns'][sid],
-        'trick_count': play_status['trick_count'],
-        'trick': play_status['trick'],
-        'last_full_trick': play_status['last_full_trick'],
-        'direction_hands': visible_hands[sid],
-        'legal_hand': hand_status['legal_hand'],
-        'vis_dir': handler.get_visible_dir(),
-        'contract': play_status['contract'],
-        'dummy_controller_sid': dummy_controller,
-        'current_playing_direction': play_status['current_playing_direction'],
-    }, room=sid)
+    perform(server.end_scores(request.sid))
+
+
+def send_par(handler, table_id, par_job):
+    # Solving runs in the shared process pool, here we only wait without blocking other events
+    if par_job is None:
+        return  # par is turned off
+    while not handler.par_ready(par_job):
+        socketio.sleep(0.5)
+    update = par_update(handler, table_id, par_job)
+    if update is not None:
+        perform([update])
+
+
+def release_delayed_views():
+    while True:
+        socketio.sleep(SPECTATOR_TICK)
+        perform(server.spectator_views())
+
+
+if server.spectators.delay:
+    socketio.start_background_task(release_delayed_views)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,273 @@
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from random import Random
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core import BiddingSuit, calculate_score
+from core.deal_enums import Direction, GameStatus
+from core.play_utils import evaluate_trick_winner
+from game_logic import Auction, Game
+from simulator import play_rubber, random_policies
+
+"""
+Benchmarks of the hot paths of the game engine.
+
+Every benchmark builds a fixed, seeded workload once and times a function that runs it; the result is the time per
+operation (one deal, one legal-bid query, one trick, ...). Each benchmark is repeated several times and both the best
+and the median repeat are kept: the best is the least disturbed by the rest of the machine and is what comparisons use.
+
+    python -m benchmarks.bench --output results.json
+    python -m benchmarks.bench --compare results.json --threshold 0.1
+
+With --compare the run is checked against a stored result file: a benchmark slower than the baseline by more than the
+threshold is reported as a regression and the command exits with status 1.
+"""
+
+BENCHMARKS: Dict[str, Callable[[], Tuple[Callable[[], None], int]]] = {}
+DEFAULT_REPEAT = 7
+MIN_REPEAT_TIME = 0.2  # seconds, the number of runs per repeat is raised until one repeat lasts this long
+
+
+def benchmark(name: str):
+    """
+    Register a benchmark. The decorated function builds the workload and returns (run, operations): a function to
+    time and the number of operations it performs
+    """
+    def register(function: Callable[[], Tuple[Callable[[], None], int]]):
+        BENCHMARKS[name] = function
+        return function
+    return register
+
+
+def _game_in_auction(rng: Random) -> Game:
+    game = Game(rng)
+    game.deal_cards()
+    return game
+
+
+def _game_in_play(rng: Random, cards_played: int) -> Game:
+    game = _game_in_auction(rng)
+    for bid in ["1S", "PASS", "PASS", "PASS"]:
+        game.bid(bid)
+    for _ in range(cards_played):
+        game.play_card(rng.choice(game.get_legal_cards_to_play()))
+    return game
+
+
+@benchmark("deal_cards")
+def _deal_cards():
+    games = [Game(Random(seed)) for seed in range(100)]
+
+    def run():
+        for game in games:
+            game.game_status = GameStatus.DEAL_CARDS
+            game.deal_cards()
+
+    return run, len(games)
+
+
+@benchmark("get_legal_bids")
+def _get_legal_bids():
+    rng = Random(1)
+    games = []
+    for _ in range(50):
+        game = _game_in_auction(rng)
+        # A few opening calls so that doubles and higher bids are in play
+        for bid in rng.choice([[], ["1H"], ["1C", "X"], ["PASS", "2S", "X", "XX"], ["1NT", "PASS", "3NT"]]):
+            game.bid(bid)
+        games.append(game)
+
+    def run():
+        for game in games:
+            game.get_legal_bids()
+
+    return run, len(games)
+
+
+@benchmark("get_legal_cards_to_play")
+def _get_legal_cards_to_play():
+    rng = Random(2)
+    games = [_game_in_play(rng, rng.randrange(0, 40)) for _ in range(50)]
+
+    def run():
+        for game in games:
+            game.get_legal_cards_to_play()
+
+    return run, len(games)
+
+
+@benchmark("evaluate_trick_winner")
+def _evaluate_trick_winner():
+    rng = Random(3)
+    tricks = []
+    for _ in range(200):
+        game = _game_in_play(rng, 0)
+        trick = [(player.direction, rng.choice(player.hand.cards)) for player in game.players]
+        tricks.append((trick, rng.choice(list(BiddingSuit))))
+
+    def run():
+        for trick, trump in tricks:
+            evaluate_trick_winner(trick, trump)
+
+    return run, len(tricks)
+
+
+@benchmark("calculate_score")
+def _calculate_score():
+    contracts = [(level, suit, doubled, tricks, vulnerable)
+                 for level in range(1, 8) for suit in BiddingSuit for doubled in range(3)
+                 for tricks in range(14) for vulnerable in (False, True)]
+
+    def run():
+        for contract in contracts:
+            calculate_score(*contract)
+
+    return run, len(contracts)
+
+
+@benchmark("auction_bids")
+def _auction_bids():
+    sequences = [["1C", "1H", "1S", "2D", "3NT", "X", "XX", "PASS", "PASS", "PASS"], ["PASS"] * 4,
+                 ["1NT", "PASS", "2C", "PASS", "2S", "PASS", "4S", "PASS", "PASS", "PASS"]]
+
+    def run():
+        for sequence in sequences:
+            auction = Auction()
+            direction = Direction.NORTH
+            for bid in sequence:
+                auction.bid(direction, bid)
+                auction.auction_end()
+                direction = direction.next()
+
+    return run, sum(len(sequence) for sequence in sequences)
+
+
+@benchmark("full_rubber")
+def _full_rubber():
+    def run():
+        for seed in range(5):
+            play_rubber(random_policies, Random(f"bench:{seed}"))
+
+    return run, 5
+
+
+def run_benchmark(name: str, repeat: int = DEFAULT_REPEAT) -> Dict[str, float]:
+    """
+    :return: best and median time per operation in nanoseconds, with the number of runs per repeat
+    """
+    run, operations = BENCHMARKS[name]()
+    run()  # warm-up
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            run()
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_REPEAT_TIME:
+            break
+        number = max(number * 2, int(number * MIN_REPEAT_TIME / max(elapsed, 1e-9)) + 1)
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            run()
+        times.append((time.perf_counter() - start) / (number * operations) * 1e9)
+    return {
+        "best_ns": min(times),
+        "median_ns": statistics.median(times),
+        "stdev_ns": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "runs": number,
+        "operations": operations,
+        "repeat": repeat,
+    }
+
+
+def run_all(names: Optional[List[str]] = None, repeat: int = DEFAULT_REPEAT) -> dict:
+    results = {}
+    for name in names or BENCHMARKS:
+        results[name] = run_benchmark(name, repeat)
+        print(f"{name:<26} {_format_ns(results[name]['best_ns'])}/op", file=sys.stderr)
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> List[str]:
+    """
+    :param threshold: allowed slowdown, 0.1 for 10%
+    :return: names of the benchmarks slower than the baseline by more than the threshold
+    """
+    regressions = []
+    print(f"{'benchmark':<26} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            print(f"{name:<26} {'-':>12} {_format_ns(result['best_ns']):>12}      new")
+            continue
+        change = result["best_ns"] / base["best_ns"] - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        elif change < -threshold:
+            flag = "  faster"
+        print(f"{name:<26} {_format_ns(base['best_ns']):>12} {_format_ns(result['best_ns']):>12} "
+              f"{change:>+8.1%}{flag}")
+    return regressions
+
+
+def _format_ns(value: float) -> str:
+    for unit, scale in (("s", 1e9), ("ms", 1e6), ("us", 1e3)):
+        if value >= scale:
+            return f"{value / scale:.2f} {unit}"
+    return f"{value:.0f} ns"
+
+
+def main(args: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the game engine's hot paths")
+    parser.add_argument("names", nargs="*", help="benchmarks to run (default: all)")
+    parser.add_argument("--list", action="store_true", help="list the benchmarks and exit")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="timed repeats per benchmark")
+    parser.add_argument("--output", help="save the results as JSON")
+    parser.add_argument("--compare", help="JSON results of a baseline run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="slowdown reported as a regression (0.1 = 10%%)")
+    options = parser.parse_args(args)
+
+    if options.list:
+        print("\n".join(BENCHMARKS))
+        return 0
+    unknown = [name for name in options.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    current = run_all(options.names, options.repeat)
+    if options.output:
+        with open(options.output, "w") as file:
+            json.dump(current, file, indent=2)
+    if options.compare:
+        with open(options.compare) as file:
+            baseline = json.load(file)
+        regressions = compare(current, baseline, options.threshold)
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
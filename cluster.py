@@ -0,0 +1,413 @@
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import zlib
+from typing import AsyncIterator, Callable, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from engineio import json
+from socketio.async_pubsub_manager import AsyncPubSubManager
+
+from rooms import DEFAULT_TABLE
+from spectators import room_table
+
+"""
+Several server processes on one host, each owning a shard of the tables.
+
+    python cluster.py --workers 4 --port 5000
+
+Every worker runs app_async.py on its own port and owns the tables whose id hashes to its shard (shard_of). Router
+listens on the public port and sends every connection to the worker owning its table: the Socket.IO client puts
+?table=<id> in the address of every request, the long-polling ones and the WebSocket upgrade alike, so the router
+only reads the request line and then copies bytes both ways. A table lives in one process, its actions and room
+broadcasts never leave it.
+
+Messages that do cross processes (an emit to everybody, to a room spanning tables, or to a table from a process that
+does not own it) go through a message bus: BusManager is the python-socketio client manager of every worker, it
+delivers emits to the worker's own connections and publishes the rest on the bus, the other workers deliver them to
+theirs. MessageBus is the interface; LocalBus connects servers in one process (tests), SocketBus connects processes
+through BusHub, a fan-out server on a loopback port run by cluster.py.
+
+The router answers /metrics itself (the request names no table): it scrapes every worker's loopback port and joins
+their metrics with a shard label.
+
+Each worker keeps its own SQLite file (tables-<shard>.db for tables.db), which holds exactly the tables of its shard;
+restart the cluster with the same number of workers to resume the rubbers in progress.
+"""
+
+_LENGTH_BYTES = 4  # bus frames: big-endian payload length, then the payload
+_CHUNK = 64 * 1024
+LOCAL_PATHS = ('/metrics',)  # refused by the router to non-local clients, the workers only see the router's address
+LOCAL_ADDRESSES = ('127.0.0.1', '::1')
+METRICS_TIMEOUT = 5.0  # seconds the router waits for the metrics of a worker
+
+
+def shard_of(table_id: str, shards: int) -> int:
+    """
+    Shard owning a table; stable across processes and restarts, unlike hash()
+    """
+    return zlib.crc32(table_id.encode()) % shards
+
+
+class MessageBus:
+    """
+    Publish/subscribe channel between the workers: every published message reaches every subscriber, the publisher
+    included
+    """
+
+    async def publish(self, message: bytes) -> None:
+        raise NotImplementedError
+
+    def listen(self) -> AsyncIterator[bytes]:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class LocalBus(MessageBus):
+    def __init__(self):
+        """
+        Bus between servers in one process and event loop, all of them given the same LocalBus
+        """
+        self._queues: List[asyncio.Queue] = []
+
+    async def publish(self, message: bytes) -> None:
+        for queue in self._queues:
+            queue.put_nowait(message)
+
+    async def listen(self) -> AsyncIterator[bytes]:
+        queue = asyncio.Queue()
+        self._queues.append(queue)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._queues.remove(queue)
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> bytes:
+    header = await reader.readexactly(_LENGTH_BYTES)
+    return await reader.readexactly(int.from_bytes(header, 'big'))
+
+
+def _frame(message: bytes) -> bytes:
+    return len(message).to_bytes(_LENGTH_BYTES, 'big') + message
+
+
+class BusHub:
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        """
+        Fan-out server of SocketBus: every frame received from a connection is sent to all connections
+        :param port: 0 picks a free port, see address once started
+        """
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._writers: Set[asyncio.StreamWriter] = set()
+
+    @property
+    def address(self) -> str:
+        return f"{self.host}:{self.port}"
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._writers):
+                writer.close()
+            await self._server.wait_closed()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._writers.add(writer)
+        try:
+            while True:
+                frame = _frame(await _read_frame(reader))
+                for subscriber in list(self._writers):
+                    subscriber.write(frame)
+                await asyncio.gather(*(subscriber.drain() for subscriber in list(self._writers)),
+                                     return_exceptions=True)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+
+class SocketBus(MessageBus):
+    def __init__(self, address: str):
+        """
+        Bus endpoint connected to a BusHub
+        :param address: host:port of the hub
+        """
+        self.host, port = address.rsplit(':', 1)
+        self.port = int(port)
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._connecting = asyncio.Lock()
+
+    async def _connect(self) -> None:
+        async with self._connecting:
+            if self._writer is None:
+                self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+
+    async def publish(self, message: bytes) -> None:
+        await self._connect()
+        self._writer.write(_frame(message))
+        await self._writer.drain()
+
+    async def listen(self) -> AsyncIterator[bytes]:
+        await self._connect()
+        try:
+            while True:
+                yield await _read_frame(self._reader)
+        except asyncio.IncompleteReadError:
+            return  # the hub is gone
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+
+class BusManager(AsyncPubSubManager):
+    name = 'bridge-bus'
+
+    def __init__(self, bus: MessageBus, owns: Callable[[str], bool], channel: str = 'socketio'):
+        """
+        Client manager sharing emits between workers through a MessageBus
+        :param owns: tells whether a table id belongs to this worker
+        """
+        super().__init__(channel=channel)
+        self.bus = bus
+        self.owns = owns
+
+    async def emit(self, event, data, namespace=None, room=None, skip_sid=None, callback=None, to=None, **kwargs):
+        # A table's connections are all in the worker owning it, as is a connection's own room: no need for the bus
+        room = to or room
+        if room is not None and self._is_local(room, namespace or '/'):
+            kwargs['ignore_queue'] = True
+        return await super().emit(event, data, namespace=namespace, room=room, skip_sid=skip_sid, callback=callback,
+                                  **kwargs)
+
+    def _is_local(self, room: str, namespace: str) -> bool:
+        if self.is_connected(room, namespace):
+            return True
+        # An id of a connection in another worker is never a room here, whatever shard it hashes to. A table's
+        # spectator room lives with the table
+        return room in self.rooms.get(namespace, {}) and self.owns(room_table(room))
+
+    async def _publish(self, data) -> None:
+        await self.bus.publish(json.dumps(data).encode())
+
+    async def _listen(self) -> AsyncIterator[bytes]:
+        async for message in self.bus.listen():
+            yield message
+
+
+class Shard:
+    def __init__(self, index: int, count: int, bus_address: str):
+        self.index = index
+        self.count = count
+        self.bus_address = bus_address
+
+    @classmethod
+    def from_env(cls) -> Optional['Shard']:
+        """
+        The shard of this worker as set by cluster.py, None for a server running alone
+        """
+        if 'BRIDGE_SHARD' not in os.environ:
+            return None
+        return cls(int(os.environ['BRIDGE_SHARD']), int(os.environ['BRIDGE_SHARDS']), os.environ['BRIDGE_BUS'])
+
+    def env(self) -> dict:
+        return {'BRIDGE_SHARD': str(self.index), 'BRIDGE_SHARDS': str(self.count), 'BRIDGE_BUS': self.bus_address}
+
+    def owns(self, table_id: str) -> bool:
+        return shard_of(table_id, self.count) == self.index
+
+    def manager(self) -> BusManager:
+        return BusManager(SocketBus(self.bus_address), self.owns)
+
+
+def _http_error(status: str) -> bytes:
+    return f"HTTP/1.1 {status}\r\nContent-Length: 0\r\nConnection: close\r\n\r\n".encode()
+
+
+def _with_shard(sample: str, shard: int) -> str:
+    name, _, value = sample.rpartition(' ')
+    if name.endswith('}'):
+        return f'{name[:-1]},shard="{shard}"}} {value}'
+    return f'{name}{{shard="{shard}"}} {value}'
+
+
+def merge_metrics(texts: List[Optional[str]]) -> str:
+    """
+    Join the Prometheus text of every worker into one exposition: every sample gets a shard label, the samples of a
+    metric from all workers follow its HELP and TYPE lines once, and bridge_shard_up tells which workers answered
+    :param texts: the /metrics body of every worker in shard order, None for a worker that did not answer
+    """
+    headers = {}  # metric name -> its HELP and TYPE lines, in order of appearance
+    samples = {}  # metric name -> its sample lines from all workers
+    for shard, text in enumerate(texts):
+        name = None
+        for line in (text or '').splitlines():
+            if line.startswith('# HELP ') or line.startswith('# TYPE '):
+                name = line.split(' ', 3)[2]
+                header = headers.setdefault(name, [])
+                if line not in header:
+                    header.append(line)
+                samples.setdefault(name, [])
+            elif line and not line.startswith('#') and name is not None:
+                # histogram samples (_bucket, _sum, _count) follow the TYPE line of their metric
+                samples[name].append(_with_shard(line, shard))
+    lines = ['# HELP bridge_shard_up Whether the worker of the shard answered the scrape',
+             '# TYPE bridge_shard_up gauge']
+    lines += [f'bridge_shard_up{{shard="{shard}"}} {int(text is not None)}' for shard, text in enumerate(texts)]
+    for name, header in headers.items():
+        lines += header + samples[name]
+    return '\n'.join(lines) + '\n'
+
+
+async def _fetch_metrics(host: str, port: int) -> Optional[str]:
+    """
+    :return: the /metrics body of a worker, None when it cannot be had
+    """
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), METRICS_TIMEOUT)
+        try:
+            writer.write(f"GET /metrics HTTP/1.1\r\nHost: {host}:{port}\r\nConnection: close\r\n\r\n".encode())
+            response = await asyncio.wait_for(reader.read(), METRICS_TIMEOUT)
+        finally:
+            writer.close()
+    except (OSError, asyncio.TimeoutError):
+        return None
+    head, _, body = response.partition(b'\r\n\r\n')
+    if head.split(b' ', 2)[1:2] != [b'200']:
+        return None
+    return body.decode('utf-8', 'replace')
+
+
+async def _pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        while True:
+            data = await reader.read(_CHUNK)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+class Router:
+    def __init__(self, workers: List[Tuple[str, int]]):
+        """
+        TCP proxy sending every HTTP request or WebSocket to the worker owning its table
+        :param workers: (host, port) of every worker, in shard order
+        """
+        self.workers = workers
+
+    def route(self, table_id: str) -> Tuple[str, int]:
+        return self.workers[shard_of(table_id, len(self.workers))]
+
+    async def metrics(self) -> str:
+        """
+        The metrics of the whole cluster: a /metrics request carries no table, so the router answers it itself
+        """
+        return merge_metrics(await asyncio.gather(*(_fetch_metrics(*worker) for worker in self.workers)))
+
+    async def serve(self, host: str, port: int) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self.handle, host, port)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            target = lines[0].split(' ')[1]
+        except IndexError:
+            writer.write(_http_error('400 Bad Request'))
+            writer.close()
+            return
+        url = urlsplit(target)
+        if url.path in LOCAL_PATHS and writer.get_extra_info('peername')[0] not in LOCAL_ADDRESSES:
+            writer.write(_http_error('403 Forbidden'))
+            writer.close()
+            return
+        if url.path == '/metrics':
+            body = (await self.metrics()).encode()
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n" +
+                         f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+            await writer.drain()
+            writer.close()
+            return
+
+        headers = [line for line in lines[1:] if line]
+        if not any(line.lower().startswith('upgrade:') for line in headers):
+            # One request per connection: the next request of a kept-alive connection may be for another table
+            headers = [line for line in headers if not line.lower().startswith('connection:')]
+            headers.append('Connection: close')
+        head = '\r\n'.join([lines[0], *headers, '', '']).encode('latin-1')
+
+        table_id = parse_qs(url.query).get('table', [''])[0] or DEFAULT_TABLE
+        try:
+            worker_reader, worker_writer = await asyncio.open_connection(*self.route(table_id))
+        except OSError:
+            writer.write(_http_error('502 Bad Gateway'))
+            writer.close()
+            return
+        worker_writer.write(head)
+        await asyncio.gather(_pipe(reader, worker_writer), _pipe(worker_reader, writer))
+
+
+def database_of(path: str, shard: int) -> str:
+    stem, extension = os.path.splitext(path)
+    return f"{stem}-{shard}{extension}"
+
+
+async def run(workers: int, host: str, port: int) -> None:
+    hub = BusHub()
+    await hub.start()
+    addresses = [('127.0.0.1', port + 1 + index) for index in range(workers)]
+    processes = []
+    for index, (worker_host, worker_port) in enumerate(addresses):
+        env = dict(os.environ, **Shard(index, workers, hub.address).env(),
+                   BRIDGE_DB=database_of(os.environ.get('BRIDGE_DB', 'tables.db'), index))
+        processes.append(subprocess.Popen([sys.executable, '-m', 'uvicorn', 'app_async:app',
+                                           '--host', worker_host, '--port', str(worker_port)], env=env))
+    server = await Router(addresses).serve(host, port)
+    print(f"Router on {host}:{port}, {workers} workers on ports {port + 1}-{port + workers}")
+    try:
+        await server.serve_forever()
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+        await hub.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Socket.IO server as several processes sharing the tables")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="worker processes (default: one per CPU)")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000, help="public port, workers use the following ones")
+    args = parser.parse_args()
+    try:
+        asyncio.run(run(args.workers, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
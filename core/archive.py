@@ -0,0 +1,142 @@
+import os
+from typing import BinaryIO, Iterable, Optional, Tuple
+
+import numpy as np
+
+from core.bitboard import DealMasks
+from core.dealer import deal_masks
+from core.deal_enums import Direction, Vulnerability
+
+"""
+Fixed-width binary archive of deals.
+
+File layout: an 8-byte header (magic b"BDAR", format version and record size as little-endian uint16) followed by
+14-byte records. Bytes 0..12 of a record hold the seat of each card, two bits per card: card c (index as in
+core.bitboard) is in byte c // 4 at bit 2 * (c % 4). Byte 13 holds the dealer (Direction.value) in bits 0-1 and
+the Vulnerability value in bits 2-3.
+
+DealArchive memory-maps the file, so board N is read straight from its offset and archives far larger than memory
+can be opened instantly. Deals are exchanged with the rest of core as seat arrays (see core.dealer) or card masks.
+"""
+
+MAGIC = b"BDAR"
+VERSION = 1
+HEADER_SIZE = 8
+SEATS_SIZE = 13
+RECORD_SIZE = SEATS_SIZE + 1
+
+RECORD_DTYPE = np.dtype([("seats", np.uint8, (SEATS_SIZE,)), ("info", np.uint8)])
+
+_SHIFTS = np.array([0, 2, 4, 6], dtype=np.uint8)
+
+
+def _header() -> bytes:
+    return MAGIC + np.array([VERSION, RECORD_SIZE], dtype="<u2").tobytes()
+
+
+def pack_seats(deals: np.ndarray) -> np.ndarray:
+    """
+    :param deals: (count, 52) array of seats
+    :return: (count, 13) uint8 array, four cards per byte
+    """
+    return (deals.reshape(-1, SEATS_SIZE, 4) << _SHIFTS).sum(axis=2, dtype=np.uint8)
+
+
+def unpack_seats(packed: np.ndarray) -> np.ndarray:
+    """
+    Inverse of pack_seats
+    """
+    return ((packed[:, :, None] >> _SHIFTS) & 3).reshape(-1, 52)
+
+
+def board_info(board_numbers: np.ndarray) -> np.ndarray:
+    """
+    :return: info bytes with the standard dealer and vulnerability of the given board numbers (1-based)
+    """
+    cycle = np.array([Vulnerability.for_board(number).value for number in range(1, 17)], dtype=np.uint8)
+    board_numbers = np.asarray(board_numbers)
+    return ((board_numbers - 1) % 4 | cycle[(board_numbers - 1) % 16] << 2).astype(np.uint8)
+
+
+class ArchiveWriter:
+    """
+    Appends deals to a new archive, one batch at a time. Use as a context manager
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self._file: Optional[BinaryIO] = None
+
+    def __enter__(self) -> 'ArchiveWriter':
+        self._file = open(self.path, "wb")
+        self._file.write(_header())
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self._file.close()
+
+    def write(self, deals: np.ndarray, info: Optional[np.ndarray] = None) -> None:
+        """
+        :param deals: (count, 52) array of seats
+        :param info: info byte of every deal; by default the dealer and vulnerability follow the board numbers
+        """
+        records = np.empty(len(deals), dtype=RECORD_DTYPE)
+        records["seats"] = pack_seats(deals)
+        if info is None:
+            info = board_info(np.arange(self.count + 1, self.count + len(deals) + 1))
+        records["info"] = info
+        records.tofile(self._file)
+        self.count += len(deals)
+
+
+def write_archive(path: str, batches: Iterable[np.ndarray]) -> int:
+    """
+    Write batches of deals (e.g. core.dealer.iter_deal_chunks) to an archive
+    :return: number of deals written
+    """
+    with ArchiveWriter(path) as writer:
+        for deals in batches:
+            writer.write(deals)
+    return writer.count
+
+
+class DealArchive:
+    """
+    Read-only, memory-mapped view of an archive
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            header = file.read(HEADER_SIZE)
+        if header[:4] != MAGIC:
+            raise ValueError(f"'{path}' is not a deal archive")
+        version, record_size = np.frombuffer(header[4:], dtype="<u2")
+        if version != VERSION or record_size != RECORD_SIZE:
+            raise ValueError(f"Unsupported deal archive version {version} in '{path}'")
+        self.path = path
+        if os.path.getsize(path) == HEADER_SIZE:
+            self.records = np.empty(0, dtype=RECORD_DTYPE)  # an empty file cannot be memory-mapped
+        else:
+            self.records = np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=HEADER_SIZE)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __getitem__(self, board: int) -> Tuple[DealMasks, Direction, Vulnerability]:
+        """
+        :param board: position of the board in the archive, starting from 0
+        :return: the deal as card masks, its dealer and vulnerability
+        """
+        record = self.records[board]
+        info = int(record["info"])
+        return deal_masks(unpack_seats(record["seats"][None])[0]), Direction(info & 3), Vulnerability(info >> 2)
+
+    def seats(self, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """
+        :return: (count, 52) array of seats of boards start..stop-1, decoded in one go
+        """
+        return unpack_seats(np.asarray(self.records["seats"][start:stop]))
+
+    def info(self, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        return np.asarray(self.records["info"][start:stop])
@@ -1,6 +1,7 @@
-from typing import Optional
+from typing import List, Optional
 
 
+from core.bitboard import iter_indices
 from core.deal_enums import SpecialBid, BiddingSuit, Direction
 
 '''
@@ -53,6 +54,16 @@ LEGAL_BIDS = [
 
 _LEGAL_BIDS_SET = set(LEGAL_BIDS)
 
+'''
+    Kod odzywki to jej indeks w LEGAL_BIDS: 0 - PASS, 1..35 - odzywki kontraktowe od 1C do 7NT
+    (rosnąco, więc wyższa odzywka ma wyższy kod), 36 - kontra, 37 - rekontra.
+    Zbiór odzywek zapisujemy jako maskę bitową, bit o numerze kodu = odzywka należy do zbioru.
+'''
+BID_CODES = {bid: code for code, bid in enumerate(LEGAL_BIDS)}
+PASS_CODE = BID_CODES["PASS"]
+DOUBLE_CODE = BID_CODES["X"]
+REDOUBLE_CODE = BID_CODES["XX"]
+
 
 
 class BridgeBid:
@@ -108,3 +119,79 @@ class BridgeBid:
             return self.suit.value > other.suit.value
         return False
 
+
+
+# Obiekty odzywek współdzielone przez wszystkie licytacje (indeks = kod), żeby nie tworzyć ich przy każdym zgłoszeniu
+BIDS = [BridgeBid.from_str(bid) for bid in LEGAL_BIDS]
+
+
+def bid_code(bid: str) -> int:
+    code = BID_CODES.get(bid.upper())
+    if code is None:
+        raise ValueError("Provide either a proper bid (level & suit) or a special action (PASS, DOUBLE, REDOUBLE).")
+    return code
+
+
+def bids_from_mask(mask: int) -> List[str]:
+    """
+    Zamienia maskę odzywek na listę napisów w kolejności LEGAL_BIDS.
+    """
+    return [LEGAL_BIDS[code] for code in iter_indices(mask)]
+
+
+def _legal_masks(contract_code: int, declaring_side: int, doubled: int) -> tuple:
+    """
+    Legalne odzywki dla strony NS i EW (indeks 0 i 1) po odzywce kontraktowej o danym kodzie.
+    """
+    higher = ((1 << DOUBLE_CODE) - 1) & ~((1 << (contract_code + 1)) - 1)  # kontraktowe wyższe od bieżącej
+    masks = [1 << PASS_CODE | higher, 1 << PASS_CODE | higher]
+    if doubled == 0:
+        masks[1 - declaring_side] |= 1 << DOUBLE_CODE
+    elif doubled == 1:
+        masks[declaring_side] |= 1 << REDOUBLE_CODE
+    return tuple(masks)
+
+
+_OPENING_MASKS = _legal_masks(0, 0, 2)
+# [kod kontraktu][strona rozgrywającego][kontra] -> maski legalnych odzywek obu stron
+_LEGAL_MASKS = [[[_legal_masks(code, side, doubled) for doubled in range(3)] for side in range(2)]
+                for code in range(DOUBLE_CODE)]
+
+
+class BiddingState:
+    __slots__ = ("contract_code", "declaring_side", "doubled", "legal_masks")
+
+    def __init__(self):
+        """
+        Stan licytacji zakodowany liczbami. Zbiory legalnych odzywek obu stron są liczone z góry, więc każde
+        zgłoszenie i każde sprawdzenie legalności to kilka operacji na liczbach, bez tworzenia obiektów.
+        Strona to direction.value % 2: 0 - NS, 1 - EW.
+        """
+        self.contract_code = 0  # kod ostatniej odzywki kontraktowej, 0 - jeszcze jej nie było
+        self.declaring_side = None  # strona, która zgłosiła ostatnią odzywkę kontraktową
+        self.doubled = 0  # 0 - bez kontry, 1 - kontra, 2 - rekontra
+        self.legal_masks = _OPENING_MASKS
+
+    def legal_mask(self, side: int) -> int:
+        return self.legal_masks[side]
+
+    def is_legal(self, code: int, side: int) -> bool:
+        return bool(self.legal_masks[side] >> code & 1)
+
+    def apply(self, code: int, side: int) -> None:
+        """
+        Zgłasza odzywkę o danym kodzie za gracza z danej strony
+        """
+        if not self.legal_masks[side] >> code & 1:
+            raise ValueError('Illegal bid')
+        if code == PASS_CODE:
+            return
+        if code == DOUBLE_CODE:
+            self.doubled = 1
+        elif code == REDOUBLE_CODE:
+            self.doubled = 2
+        else:
+            self.contract_code = code
+            self.declaring_side = side
+            self.doubled = 0
+        self.legal_masks = _LEGAL_MASKS[self.contract_code][self.declaring_side][self.doubled]
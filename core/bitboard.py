@@ -0,0 +1,95 @@
+from typing import Iterable, Iterator, Optional, Tuple
+
+from core.deal_enums import Direction, Rank, Suit
+
+"""
+Bit-level representation of hands and deals.
+
+Every card has an index 0..51 equal to suit.value * 13 + (rank - 2), so C2 is 0 and SA is 51. A hand is a 52-bit
+integer with one bit per card it holds, each suit occupying 13 consecutive bits. A whole deal is a tuple of four
+such masks indexed by Direction.value (North, East, South, West).
+"""
+
+SUIT_SIZE = 13
+SUIT_HOLDING_MASK = (1 << SUIT_SIZE) - 1
+FULL_DECK = (1 << 52) - 1
+
+RANKS = list(Rank)  # TWO .. ACE, position in the list is the rank's bit within a suit holding
+SUITS = list(Suit)
+
+SUIT_MASKS = [SUIT_HOLDING_MASK << (SUIT_SIZE * suit.value) for suit in SUITS]
+
+DealMasks = Tuple[int, int, int, int]
+
+
+def card_index(suit: Suit, rank: Rank) -> int:
+    return suit.value * SUIT_SIZE + rank.value[0] - 2
+
+
+def index_to_suit_rank(index: int) -> Tuple[Suit, Rank]:
+    return SUITS[index // SUIT_SIZE], RANKS[index % SUIT_SIZE]
+
+
+def mask_from_indices(indices: Iterable[int]) -> int:
+    mask = 0
+    for index in indices:
+        mask |= 1 << index
+    return mask
+
+
+def iter_indices(mask: int) -> Iterator[int]:
+    """
+    Yield the card indices set in a mask, lowest first
+    """
+    while mask:
+        low_bit = mask & -mask
+        yield low_bit.bit_length() - 1
+        mask ^= low_bit
+
+
+def suit_holding(mask: int, suit: Suit) -> int:
+    """
+    :return: the 13-bit holding of a suit, bit 0 being the two and bit 12 the ace
+    """
+    return (mask >> (SUIT_SIZE * suit.value)) & SUIT_HOLDING_MASK
+
+
+def suit_length(mask: int, suit: Suit) -> int:
+    return (mask & SUIT_MASKS[suit.value]).bit_count()
+
+
+def contains_suit(mask: int, suit: Suit) -> bool:
+    return mask & SUIT_MASKS[suit.value] != 0
+
+
+def legal_mask(mask: int, led_suit: Optional[Suit]) -> int:
+    """
+    :return: the subset of a hand that may legally be played to a trick led in led_suit (None when on lead)
+    """
+    if led_suit is None:
+        return mask
+    following = mask & SUIT_MASKS[led_suit.value]
+    return following if following else mask
+
+
+def deal_masks_valid(deal: DealMasks) -> bool:
+    """
+    A deal is valid when the four hands hold 13 cards each and together form the full deck
+    """
+    combined = 0
+    for mask in deal:
+        if mask.bit_count() != SUIT_SIZE or combined & mask:
+            return False
+        combined |= mask
+    return combined == FULL_DECK
+
+
+def deal_owner(deal: DealMasks, index: int) -> Optional[Direction]:
+    """
+    :return: the Direction holding the card with the given index, or None if it is not in any hand
+    """
+    bit = 1 << index
+    for direction in Direction:
+        if deal[direction.value] & bit:
+            return direction
+    return None
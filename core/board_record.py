@@ -1,7 +1,9 @@
-from typing import Optional
+from typing import Dict, List, Optional
 
 from core import BridgeBid
-from core.deal_enums import BiddingSuit, Direction, SpecialBid
+from core.bitboard import DealMasks
+from core.deal import Card, PlayerHand
+from core.deal_enums import BiddingSuit, Direction, SpecialBid, Vulnerability
 
 
 class BridgeContract:
@@ -35,6 +37,66 @@ class BridgeContract:
         contract_str = str(self.level) + self.suit.abbreviation()
         for i in range(self.doubled):
             contract_str += "X"
-        contract_str += f' {self.declarer.abbreviation()}'
+        if self.declarer is not None:
+            contract_str += f' {self.declarer.abbreviation()}'
         return contract_str
 
+
+def contract_from_bidding(dealer: Direction, bidding: List[str]) -> BridgeContract:
+    """
+    :param dealer: the player who made the first call
+    :param bidding: calls as in LEGAL_BIDS, starting with the dealer's
+    :return: the final contract, declarer being the first player of the declaring side to name its strain
+    """
+    contract = BridgeContract.empty_contract()
+    first_to_name = {}  # (side, strain) -> direction
+    direction = dealer
+    for call in bidding:
+        bid = BridgeBid.from_str(call)
+        if not bid.special:
+            first_to_name.setdefault((direction.value % 2, bid.suit), direction)
+        contract.update_from_bridge_bid(bid, direction)
+        direction = direction.next()
+    if contract.level:
+        contract.declarer = first_to_name[(contract.declarer.value % 2, contract.suit)]
+    return contract
+
+
+class BoardRecord:
+    """
+    Everything recorded about one board: the deal, the bidding, the play and the result. This is the common form the
+    hand record readers and writers (core.pbn, core.lin) convert from and to
+    """
+
+    def __init__(self, hands: Dict[Direction, PlayerHand], dealer: Direction = Direction.NORTH,
+                 vulnerability: Vulnerability = Vulnerability.NONE, board_number: Optional[int] = None):
+        self.hands = hands
+        self.dealer = dealer
+        self.vulnerability = vulnerability
+        self.board_number = board_number
+        self.players: Dict[Direction, str] = {}
+        self.bidding: List[str] = []  # calls as in LEGAL_BIDS, starting with the dealer's
+        self.contract: Optional[BridgeContract] = None
+        self.play: List[Card] = []  # cards in the order they were played
+        self.tricks: Optional[int] = None  # tricks taken by declarer
+        self.tags: Dict[str, str] = {}  # other fields of the source format, e.g. PBN Event or Site
+
+    @staticmethod
+    def from_deal(deal: DealMasks, **kwargs) -> 'BoardRecord':
+        return BoardRecord({direction: PlayerHand.from_mask(deal[direction.value]) for direction in Direction}, **kwargs)
+
+    @property
+    def deal(self) -> DealMasks:
+        return tuple(self.hands[direction].mask for direction in Direction)
+
+    def owner(self, card: Card) -> Direction:
+        for direction, hand in self.hands.items():
+            if card in hand:
+                return direction
+        raise ValueError(f"The card '{card}' is not in the deal.")
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, BoardRecord) and all(
+            getattr(self, name) == getattr(other, name)
+            for name in ("deal", "dealer", "vulnerability", "board_number", "players", "bidding", "play", "tricks")
+        ) and str(self.contract) == str(other.contract)
@@ -0,0 +1,399 @@
+import re
+from itertools import product
+from math import comb
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.bitboard import SUIT_SIZE, card_index
+from core.deal import Card
+from core.deal_enums import Direction, Suit
+from core.dealer import deal_masks_array
+from core.hand_eval import BatchEvaluation
+
+"""
+Dealing hands that match constraints.
+
+A constraint is written in a small language over the four hands and compiled into a predicate evaluated with NumPy on
+a whole batch of candidate deals in the (count, 52) seat array format of core.dealer:
+
+    N hcp 15-17 and N balanced and S spades 5+
+    (E hcp >= 12 or E controls 4+) and not W has SA
+    NS hcp 25+ and N shape 4=4=1=4 and S hearts <= 2
+
+A condition is <seats> <feature> [<comparison>]. Seats are N, E, S, W or a partnership NS / EW, whose numbers are the
+sums over both hands. Features: hcp, controls (A = 2, K = 1), losers (losing trick count), spades / hearts /
+diamonds / clubs (suit length), balanced (4333, 4432, 5332), shape <pattern> and has <card>. A shape written with "="
+(5=4=2=2) gives the exact lengths of spades, hearts, diamonds and clubs, with "-" or no separator (5-4-2-2, 5422)
+the pattern in any suits.
+Comparisons: 15-17, 5+, 5- (at most five), >= 5, > 5, <= 5, < 5, = 5 or just 5. Conditions are combined with
+and, or, not and parentheses.
+
+Generation is not plain rejection of random deals. Cards required by a top-level "has" are placed first, and the most
+restrictive top-level shape condition of a single hand (suit lengths, balanced, shape) is satisfied directly: that
+hand's suit lengths are drawn with the exact probabilities of a random deal and its cards dealt suit by suit. Only
+the remaining conditions are checked on the finished batch, so the accepted deals are still uniformly distributed
+over all deals matching the constraint.
+"""
+
+BATCH_SIZE = 1 << 14
+
+_SEATS = {"N": (0,), "E": (1,), "S": (2,), "W": (3,), "NS": (0, 2), "EW": (1, 3)}
+_SUIT_FEATURES = {"spades": Suit.SPADES, "hearts": Suit.HEARTS, "diamonds": Suit.DIAMONDS, "clubs": Suit.CLUBS}
+_SUIT_FEATURES.update({name[:-1]: suit for name, suit in list(_SUIT_FEATURES.items())})
+_BALANCED = [(4, 3, 3, 3), (4, 4, 3, 2), (5, 3, 3, 2)]
+_SHAPE_ORDER = [Suit.SPADES.value, Suit.HEARTS.value, Suit.DIAMONDS.value, Suit.CLUBS.value]
+
+# Every possible hand shape as suit lengths indexed by Suit.value
+SHAPES = np.array([shape for shape in product(range(SUIT_SIZE + 1), repeat=4) if sum(shape) == SUIT_SIZE],
+                  dtype=np.int8)
+
+
+class DealFeatures:
+    def __init__(self, seats: np.ndarray):
+        """
+        Hand features of a batch of deals, looked up in the core.hand_eval tables on first use
+        :param seats: (count, 52) array of seats
+        """
+        self.seats = seats
+        self._cache = {}
+
+    def _cached(self, key, compute):
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    @property
+    def evaluation(self) -> BatchEvaluation:
+        return self._cached("evaluation", lambda: BatchEvaluation(deal_masks_array(self.seats)))
+
+    def lengths(self, seat: int) -> np.ndarray:
+        """
+        :return: (count, 4) suit lengths indexed by Suit.value
+        """
+        return self.evaluation.suit_lengths[:, seat]
+
+    def hcp(self, seat: int) -> np.ndarray:
+        return self.evaluation.hcp[:, seat]
+
+    def controls(self, seat: int) -> np.ndarray:
+        return self.evaluation.controls[:, seat]
+
+    def losers(self, seat: int) -> np.ndarray:
+        return self.evaluation.losers[:, seat]
+
+    def owner(self, index: int) -> np.ndarray:
+        return self.seats[:, index]
+
+
+class _ShapeFeatures:
+    """
+    Stand-in for DealFeatures whose rows are all possible shapes, used to evaluate shape conditions on SHAPES
+    """
+
+    def lengths(self, seat: int) -> np.ndarray:
+        return SHAPES
+
+
+class _Compare:
+    def __init__(self, seats: Tuple[int, ...], feature: str, suit: Optional[Suit], low: int, high: int):
+        self.seats = seats
+        self.feature = feature
+        self.suit = suit
+        self.low = low
+        self.high = high
+
+    def values(self, features) -> np.ndarray:
+        if self.feature == "length":
+            return sum(features.lengths(seat)[:, self.suit.value] for seat in self.seats)
+        return sum(getattr(features, self.feature)(seat) for seat in self.seats)
+
+    def evaluate(self, features) -> np.ndarray:
+        values = self.values(features)
+        return (values >= self.low) & (values <= self.high)
+
+    @property
+    def shape_seat(self) -> Optional[int]:
+        return self.seats[0] if self.feature == "length" and len(self.seats) == 1 else None
+
+
+class _Shape:
+    def __init__(self, seat: int, patterns: List[Tuple[int, ...]], exact: bool):
+        """
+        :param patterns: accepted lengths, in spades-hearts-diamonds-clubs order if exact, else longest first
+        """
+        self.seat = seat
+        self.patterns = np.array(patterns, dtype=np.int16)
+        self.exact = exact
+
+    def evaluate(self, features) -> np.ndarray:
+        lengths = features.lengths(self.seat)
+        lengths = lengths[:, _SHAPE_ORDER] if self.exact else -np.sort(-lengths, axis=1)
+        return (lengths[:, None, :] == self.patterns[None, :, :]).all(axis=2).any(axis=1)
+
+    @property
+    def shape_seat(self) -> int:
+        return self.seat
+
+
+class _Has:
+    def __init__(self, seat: int, index: int):
+        self.seat = seat
+        self.index = index
+
+    def evaluate(self, features) -> np.ndarray:
+        return features.owner(self.index) == self.seat
+
+
+class _Not:
+    def __init__(self, part):
+        self.part = part
+
+    def evaluate(self, features) -> np.ndarray:
+        return ~self.part.evaluate(features)
+
+
+class _And:
+    def __init__(self, parts: list):
+        self.parts = parts
+
+    def evaluate(self, features) -> np.ndarray:
+        result = self.parts[0].evaluate(features)
+        for part in self.parts[1:]:
+            result = result & part.evaluate(features)
+        return result
+
+
+class _Or:
+    def __init__(self, parts: list):
+        self.parts = parts
+
+    def evaluate(self, features) -> np.ndarray:
+        result = self.parts[0].evaluate(features)
+        for part in self.parts[1:]:
+            result = result | part.evaluate(features)
+        return result
+
+
+class _Parser:
+    _COMPARISON = re.compile(r"^(?:(\d+)-(\d+)|(\d+)([+-])|(>=|<=|==|=|>|<)?(\d+))$")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = re.findall(r"\(|\)|[^\s()]+", text)
+        self.position = 0
+
+    def error(self, message: str) -> ValueError:
+        return ValueError(f"{message} in constraint '{self.text}'")
+
+    def peek(self) -> Optional[str]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self) -> str:
+        token = self.peek()
+        if token is None:
+            raise self.error("Unexpected end")
+        self.position += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            raise self.error("Empty condition")
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise self.error(f"Unexpected '{self.peek()}'")
+        return node
+
+    def parse_or(self):
+        parts = [self.parse_and()]
+        while self.peek() is not None and self.peek().lower() == "or":
+            self.take()
+            parts.append(self.parse_and())
+        return parts[0] if len(parts) == 1 else _Or(parts)
+
+    def parse_and(self):
+        parts = [self.parse_not()]
+        while self.peek() is not None and self.peek().lower() == "and":
+            self.take()
+            parts.append(self.parse_not())
+        return parts[0] if len(parts) == 1 else _And(parts)
+
+    def parse_not(self):
+        if self.peek() is not None and self.peek().lower() == "not":
+            self.take()
+            return _Not(self.parse_not())
+        if self.peek() == "(":
+            self.take()
+            node = self.parse_or()
+            if self.take() != ")":
+                raise self.error("Missing ')'")
+            return node
+        return self.parse_condition()
+
+    def parse_condition(self):
+        seat_token = self.take()
+        seats = _SEATS.get(seat_token.upper())
+        if seats is None:
+            raise self.error(f"Unknown seat '{seat_token}'")
+        feature = self.take().lower()
+
+        if feature in ("hcp", "controls", "losers") or feature in _SUIT_FEATURES:
+            low, high = self.parse_comparison()
+            if feature in _SUIT_FEATURES:
+                return _Compare(seats, "length", _SUIT_FEATURES[feature], low, high)
+            return _Compare(seats, feature, None, low, high)
+
+        if len(seats) > 1:
+            raise self.error(f"'{feature}' needs a single seat")
+        if feature == "balanced":
+            return _Shape(seats[0], _BALANCED, exact=False)
+        if feature == "shape":
+            return self.parse_shape(seats[0])
+        if feature == "has":
+            card = self.take()
+            try:
+                card = Card.from_str(card)
+            except (KeyError, ValueError):
+                raise self.error(f"Unknown card '{card}'")
+            return _Has(seats[0], card_index(card.suit, card.rank))
+        raise self.error(f"Unknown feature '{feature}'")
+
+    def parse_comparison(self) -> Tuple[int, int]:
+        token = self.take()
+        if token in (">=", "<=", "==", "=", ">", "<"):
+            token += self.take()
+        match = self._COMPARISON.match(token)
+        if not match:
+            raise self.error(f"Bad comparison '{token}'")
+        low, high, bound, direction, operator, value = match.groups()
+        if low is not None:
+            return int(low), int(high)
+        if bound is not None:
+            return (int(bound), 99) if direction == "+" else (0, int(bound))
+        value = int(value)
+        return {
+            ">=": (value, 99), ">": (value + 1, 99), "<=": (0, value), "<": (0, value - 1),
+        }.get(operator, (value, value))
+
+    def parse_shape(self, seat: int) -> _Shape:
+        token = self.take()
+        exact = "=" in token
+        parts = re.split("[=-]", token) if exact or "-" in token else list(token)
+        if len(parts) != 4 or not all(part.isdigit() for part in parts) or sum(map(int, parts)) != SUIT_SIZE:
+            raise self.error(f"Bad shape '{token}'")
+        pattern = tuple(int(part) for part in parts)
+        return _Shape(seat, [pattern if exact else tuple(sorted(pattern, reverse=True))], exact)
+
+
+def _conjuncts(node) -> list:
+    return [part for child in node.parts for part in _conjuncts(child)] if isinstance(node, _And) else [node]
+
+
+class Constraint:
+    def __init__(self, text: str):
+        """
+        :param text: the constraint, see the module docstring
+        :raises ValueError: when the text cannot be parsed or the top-level conditions contradict each other
+        """
+        self.text = text
+        self.root = _Parser(text).parse()
+        conjuncts = _conjuncts(self.root)
+
+        self.fixed_cards: Dict[int, int] = {}  # card index: seat, from top-level "has"
+        for part in conjuncts:
+            if isinstance(part, _Has):
+                if self.fixed_cards.setdefault(part.index, part.seat) != part.seat:
+                    raise ValueError(f"Card {Card.from_index(part.index)} is required in two hands in '{text}'")
+
+        self.shape_seat: Optional[int] = None  # the hand whose shape is dealt directly
+        self.shapes: Optional[np.ndarray] = None
+        self.shape_probabilities: Optional[np.ndarray] = None
+        self._plan_shapes([part for part in conjuncts if getattr(part, "shape_seat", None) is not None])
+
+    def _fixed_counts(self, seat: Optional[int]) -> np.ndarray:
+        counts = np.zeros(4, dtype=np.int16)
+        for index, owner in self.fixed_cards.items():
+            if seat is None or owner == seat:
+                counts[index // SUIT_SIZE] += 1
+        return counts
+
+    def _plan_shapes(self, shape_conditions: list) -> None:
+        fixed_all = self._fixed_counts(None)
+        best_share = 1.0
+        for seat in sorted({part.shape_seat for part in shape_conditions}):
+            allowed = _And([part for part in shape_conditions if part.shape_seat == seat]).evaluate(_ShapeFeatures())
+            fixed = self._fixed_counts(seat)
+            free = SUIT_SIZE - fixed_all
+            # Hands of each shape that contain this seat's required cards and none required elsewhere
+            weights = np.array([
+                np.prod([comb(int(free[suit]), int(shape[suit] - fixed[suit])) if shape[suit] >= fixed[suit] else 0
+                         for suit in range(4)]) if ok else 0
+                for shape, ok in zip(SHAPES, allowed)
+            ], dtype=np.float64)
+            total = comb(int(free.sum()), SUIT_SIZE - int(fixed.sum()))
+            if not weights.sum():
+                raise ValueError(f"No hand of {Direction(seat).name} fits the shape conditions in '{self.text}'")
+            share = weights.sum() / total
+            if share < best_share:
+                best_share = share
+                self.shape_seat = seat
+                self.shapes = SHAPES[weights > 0]
+                self.shape_probabilities = weights[weights > 0] / weights.sum()
+
+    def __call__(self, seats: np.ndarray) -> np.ndarray:
+        """
+        :param seats: (count, 52) array of seats
+        :return: boolean array telling which deals match
+        """
+        return self.root.evaluate(DealFeatures(seats))
+
+    def candidates(self, rng: np.random.Generator, count: int) -> np.ndarray:
+        """
+        :return: (count, 52) random deals that already satisfy the fixed cards and the planned shape
+        """
+        seats = np.full((count, 52), 255, dtype=np.uint8)
+        for index, seat in self.fixed_cards.items():
+            seats[:, index] = seat
+
+        needed = [SUIT_SIZE - int(self._fixed_counts(seat).sum()) for seat in range(4)]
+        if self.shape_seat is not None:
+            chosen = self.shapes[rng.choice(len(self.shapes), size=count, p=self.shape_probabilities)]
+            to_deal = chosen - self._fixed_counts(self.shape_seat)
+            for suit in range(4):
+                free = np.array([index for index in range(suit * SUIT_SIZE, (suit + 1) * SUIT_SIZE)
+                                 if index not in self.fixed_cards])
+                # A random ordering of the free cards of the suit, the first ones go to the planned hand
+                order = rng.random((count, len(free))).argsort(axis=1).argsort(axis=1)
+                seats[:, free] = np.where(order < to_deal[:, suit:suit + 1], self.shape_seat, 255)
+            needed[self.shape_seat] = 0
+
+        rest = np.repeat(np.arange(4, dtype=np.uint8), needed)
+        unassigned = seats == 255
+        seats[unassigned] = rng.permuted(np.tile(rest, (count, 1)), axis=1).ravel()
+        return seats
+
+
+def constrained_deals(constraint, count: int, seed: Optional[int] = None, batch_size: int = BATCH_SIZE,
+                      max_candidates: Optional[int] = None) -> np.ndarray:
+    """
+    :param constraint: a Constraint or its text
+    :param count: number of deals wanted
+    :param seed: seed of the reproducible stream; None draws fresh entropy
+    :param max_candidates: give up after examining this many candidate deals
+    :return: (count, 52) uint8 array of seats of deals matching the constraint
+    :raises ValueError: when max_candidates is reached first
+    """
+    if not isinstance(constraint, Constraint):
+        constraint = Constraint(constraint)
+    rng = np.random.default_rng(seed)
+    accepted = []
+    found = examined = 0
+    while found < count:
+        if max_candidates is not None and examined >= max_candidates:
+            raise ValueError(f"Only {found} of {count} deals found in {examined} candidates for '{constraint.text}'")
+        batch = constraint.candidates(rng, batch_size)
+        batch = batch[constraint(batch)]
+        accepted.append(batch[:count - found])
+        found += len(accepted[-1])
+        examined += batch_size
+    return np.concatenate(accepted) if accepted else np.empty((0, 52), dtype=np.uint8)
@@ -0,0 +1,1236 @@
+from operator import itemgetter
+from time import monotonic
+from typing import Dict, List, Optional, Tuple
+
+from core.bitboard import SUIT_HOLDING_MASK, SUIT_SIZE, DealMasks
+from core.deal_enums import BiddingSuit, Direction
+
+"""
+Double dummy solver: the number of tricks each side takes when all four hands are known and everybody plays
+perfectly.
+
+The search answers the boolean question "can North-South take at least `target` of the remaining tricks" with an
+alpha-beta search over single cards, and narrows the target with a binary search. The position is kept as one 13-bit
+rank holding per suit and player (bit n is rank n + 2).
+
+At every trick boundary the search first tries to decide the question without playing a card: tricks the side on
+lead can cash straight away (quick tricks), and a trick the other side cannot be stopped from taking (later tricks).
+Only then are the leads searched, most promising first. The move ordering scores every card from the holdings around
+the table (who holds the top cards, who can ruff, who is still to play) and favours the lead that refuted the same
+question at this depth before. Within a hand, cards that form a sequence among the cards still in play are
+equivalent and only one of them is searched; after a small card of a suit has failed, smaller cards of that suit are
+skipped too, since nothing below the lowest card that decided the search can change the outcome.
+
+Results are stored at trick boundaries in a partition-search transposition table. Together with its result every
+search returns the set of cards whose ranks actually decided it: the card that won a trick by rank, the top cards the
+quick and later tricks relied on, and when every card of a hand failed, the sequences standing behind the relevant
+cards it tried. A stored bound therefore applies to every position with the same leader and suit lengths in which
+the same players hold the top cards of each suit down to the lowest of those relevant cards.
+"""
+
+_NT = -1
+
+_weight = itemgetter(0)
+
+# (ordering weight, suit, rank, ranks of the sequence the card stands for)
+_Move = Tuple[int, int, int, int]
+
+
+def _top(holding: int) -> int:
+    """
+    :return: the highest rank bit of the holding, -1 for an empty holding
+    """
+    return holding.bit_length() - 1
+
+
+def _bottom(holding: int) -> int:
+    """
+    :return: the lowest rank bit of the holding, -1 for an empty holding
+    """
+    return (holding & -holding).bit_length() - 1
+
+
+class DoubleDummySolver:
+    """
+    Solver for a single strain. The transposition table only depends on the strain, so one solver can be reused for
+    several leaders or several deals with the same trumps
+    """
+
+    def __init__(self, strain: BiddingSuit):
+        self.trump = _NT if strain == BiddingSuit.NO_TRUMP else strain.to_suit().value
+        self.nodes = 0
+        # monotonic() time after which a search gives up with TimeoutError, None to search without a limit
+        self.deadline: Optional[float] = None
+        # leader and suit lengths of every hand (packed as in _trick) -> a tree with two levels per suit, clubs
+        # first: the number of top cards of the suit the entries below compare, then their owners; the leaves are
+        # [lower, upper, lead]
+        self._tt: Dict[int, dict] = {}
+        self._suit_cache: Dict[Tuple[int, int, int, int], tuple] = {}
+        # (holding, cards in play) -> the holding split into sequences
+        self._sequence_cache: Dict[Tuple[int, int], tuple] = {}
+        # rank holdings by suit and seat, changed in place while searching
+        self._holdings: List[List[int]] = []
+        # per number of tricks left: the lead that last refuted a search, the lead stored with the last table hit
+        self._killer_leads: List[int] = []
+        self._stored_leads: List[int] = []
+
+    def solve(self, deal: DealMasks, leader: Direction) -> int:
+        """
+        :param deal: four card masks indexed by Direction.value, all of the same length (a deal at a trick boundary)
+        :param leader: the player on lead to the next trick
+        :return: number of the remaining tricks taken by the leader's side with best play
+        """
+        tricks_left = deal[0].bit_count()
+        if any(mask.bit_count() != tricks_left for mask in deal):
+            raise ValueError("All hands must hold the same number of cards")
+        if (deal[0] & deal[1]) | (deal[0] & deal[2]) | (deal[0] & deal[3]) | \
+                (deal[1] & deal[2]) | (deal[1] & deal[3]) | (deal[2] & deal[3]):
+            raise ValueError("A card cannot be held by two players")
+
+        self._holdings = [[(mask >> (SUIT_SIZE * suit)) & SUIT_HOLDING_MASK for mask in deal] for suit in range(4)]
+        low, high = 0, tricks_left
+        while low < high:
+            target = (low + high + 1) // 2
+            self._killer_leads = [-1] * 14
+            self._stored_leads = [-1] * 14
+            if self._trick(leader.value, tricks_left, target)[0]:
+                low = target
+            else:
+                high = target - 1
+
+        return low if leader.value % 2 == 0 else tricks_left - low
+
+    def clear(self) -> None:
+        self._tt.clear()
+        self._suit_cache.clear()
+        self._sequence_cache.clear()
+
+    def _trick(self, leader: int, tricks_left: int, target: int) -> Tuple[bool, int]:
+        """
+        Search the position at a trick boundary
+        :param target: tricks North-South still need
+        :return: whether North-South can take `target` of the remaining tricks, and the mask of cards whose ranks
+                 the answer depends on
+        """
+        self.nodes += 1
+        if not self.nodes & 0x3FF and self.deadline is not None and monotonic() > self.deadline:
+            raise TimeoutError("The double dummy search ran out of time")
+        if target <= 0:
+            return True, 0
+        if target > tricks_left:
+            return False, 0
+        if tricks_left == 1:
+            return self._last_trick(leader, target)
+
+        holdings = self._holdings
+        suit_cache = self._suit_cache
+        suits = []
+        for holding in holdings:
+            key = tuple(holding)
+            description = suit_cache.get(key)
+            if description is None:
+                description = suit_cache[key] = _describe_suit(key)
+            suits.append(description)
+
+        bucket_key = leader | suits[0][12] << 2 | suits[1][12] << 18 | suits[2][12] << 34 | suits[3][12] << 50
+        bucket = self._tt.get(bucket_key)
+        if bucket is None:
+            bucket = self._tt[bucket_key] = {}
+        if tricks_left >= 5:
+            stored = self._lookup(bucket, suits, tricks_left, target)
+            if stored is not None:
+                return stored
+
+        ns_leads = leader & 1 == 0
+        need = target if ns_leads else tricks_left + 1 - target
+        outcome, relevant = self._quick_tricks(leader, suits, need, tricks_left + 1 - need)
+        if outcome:
+            return ns_leads == (outcome > 0), relevant
+        decided, relevant = self._later_tricks(leader, suits, need, tricks_left)
+        if decided:
+            return not ns_leads, relevant
+
+        if tricks_left < 5:
+            stored = self._lookup(bucket, suits, tricks_left, target)
+            if stored is not None:
+                return stored
+
+        relevant = 0
+        best = -1
+        lowest_win = [-1, -1, -1, -1]
+        previous_suit = previous_rank = -1
+        leads = self._leads(leader, suits, tricks_left)
+        for _, suit, rank, _ in leads:
+            if previous_suit >= 0 and lowest_win[previous_suit] < 0:
+                _raise_lowest_win(lowest_win, previous_suit, previous_rank, relevant)
+            previous_suit, previous_rank = suit, rank
+            if rank < lowest_win[suit]:
+                continue
+            index = SUIT_SIZE * suit + rank
+            holding = holdings[suit]
+            holding[leader] ^= 1 << rank
+            result, child_relevant = self._follow(leader, 1, tricks_left, target, suit, rank, 0, suit, rank, 1 << index,
+                                                  suits)
+            holding[leader] ^= 1 << rank
+            if result == ns_leads:
+                self._killer_leads[tricks_left] = best = index
+                relevant = child_relevant
+                break
+            relevant |= child_relevant
+        else:
+            result = not ns_leads
+            relevant = _with_sequences(relevant, leads)
+
+        depths, owners = _relevant_tops(relevant, suits)
+        node = bucket
+        for depth, owner in zip(depths[:3], owners[:3]):
+            node = node.setdefault(depth, {}).setdefault(owner, {})
+        entries = node.setdefault(depths[3], {})
+        bounds = entries.get(owners[3])
+        if bounds is None:
+            bounds = entries[owners[3]] = [0, tricks_left, best]
+        elif best >= 0:
+            bounds[2] = best
+        if result:
+            bounds[0] = max(bounds[0], target)
+        else:
+            bounds[1] = min(bounds[1], target - 1)
+        return result, relevant
+
+    def _lookup(self, bucket: dict, suits: List[tuple], tricks_left: int, target: int) -> Optional[Tuple[bool, int]]:
+        """
+        :return: the stored answer for the position, if the table holds a bound that decides it
+        """
+        owners_0, owners_1, owners_2, owners_3 = suits[0][10], suits[1][10], suits[2][10], suits[3][10]
+        # a branch is left as soon as the owners of one suit differ
+        for depth_0, level_0 in bucket.items():
+            node_0 = level_0.get(owners_0[depth_0])
+            if node_0 is None:
+                continue
+            for depth_1, level_1 in node_0.items():
+                node_1 = level_1.get(owners_1[depth_1])
+                if node_1 is None:
+                    continue
+                for depth_2, level_2 in node_1.items():
+                    node_2 = level_2.get(owners_2[depth_2])
+                    if node_2 is None:
+                        continue
+                    for depth_3, level_3 in node_2.items():
+                        bounds = level_3.get(owners_3[depth_3])
+                        if bounds is not None and not bounds[0] < target <= bounds[1]:
+                            if bounds[2] >= 0:
+                                self._stored_leads[tricks_left] = bounds[2]
+                            return bounds[0] >= target, _top_cards(suits, (depth_0, depth_1, depth_2, depth_3))
+        return None
+
+    def _last_trick(self, leader: int, target: int) -> Tuple[bool, int]:
+        """
+        Every player has one card left: the highest trump or the highest card of the suit led takes the trick
+        """
+        holdings = self._holdings
+        trump = self.trump
+        for suit in (trump,) if trump >= 0 else ():
+            holding = holdings[suit]
+            if holding[0] | holding[1] | holding[2] | holding[3]:
+                break
+        else:
+            suit = 0
+            while not holdings[suit][leader]:
+                suit += 1
+        holding = holdings[suit]
+        seat = max(range(4), key=lambda player: holding[player])
+        relevant = 0
+        if (holding[0] | holding[1] | holding[2] | holding[3]).bit_count() > 1:
+            relevant = holding[seat] << (SUIT_SIZE * suit)
+        return (seat & 1 == 0) == (target <= 1), relevant
+
+    def _quick_tricks(self, hand: int, suits: List[tuple], need: int, other_need: int) -> Tuple[int, int]:
+        """
+        Count the tricks the side on lead can cash without giving up the lead: winners in the leader's hand, then
+        partner's winners reached with a card of a suit in which partner holds the top card
+        :param need: tricks the side on lead needs for the question to be decided in its favour
+        :param other_need: tricks the other side needs
+        :return: 1 when the side on lead takes `need` tricks, -1 when the other side is sure of `other_need` tricks,
+                 otherwise 0; and the mask of cards the answer depends on
+        """
+        trump = self.trump
+        holdings = self._holdings
+        lho, partner, rho = (hand + 1) & 3, hand ^ 2, (hand + 3) & 3
+        trumps = holdings[trump] if trump >= 0 else (0, 0, 0, 0)
+
+        entry_suit = -1
+        entry_card = 0
+        for suit in range(4):
+            if suit == trump:
+                continue
+            description = suits[suit]
+            holding = holdings[suit]
+            lengths = description[2]
+            lho_can_ruff = not holding[lho] and trumps[lho]
+            rho_can_ruff = not holding[rho] and trumps[rho]
+            if description[3] == partner:
+                if holding[hand] and not lho_can_ruff and not rho_can_ruff:
+                    entry_suit, entry_card = suit, description[4]
+                    break
+            elif description[5] == partner and description[3] == hand and lengths[hand] >= 2 and \
+                    lengths[partner] >= 2 and not lho_can_ruff and not rho_can_ruff:
+                entry_suit, entry_card = suit, description[6]
+                break
+        if trump >= 0 and entry_suit < 0 and trumps[hand] and suits[trump][3] == partner:
+            entry_suit, entry_card = trump, suits[trump][4]
+        entry = 1 << (SUIT_SIZE * entry_suit + entry_card) if entry_suit >= 0 else 0
+
+        if trump >= 0:
+            lho_trumps = suits[trump][2][lho]
+            rho_trumps = suits[trump][2][rho]
+            order = [trump] + [suit for suit in range(4) if suit != trump]
+        else:
+            lho_trumps = rho_trumps = 0
+            order = range(4)
+
+        tricks = 0
+        relevant = 0
+        ruff_counted = False
+        for suit in order:
+            description = suits[suit]
+            lengths = description[2]
+            own, partner_count, lho_count, rho_count = lengths[hand], lengths[partner], lengths[lho], lengths[rho]
+            side_suit = trump >= 0 and suit != trump
+            no_ruffs = lho_trumps == 0 and rho_trumps == 0
+            shift = SUIT_SIZE * suit
+            opponents = lho_count or rho_count
+
+            if not opponents and not partner_count:
+                # only the leader holds the suit
+                if own and (not side_suit or no_ruffs):
+                    tricks += own
+                    if tricks >= need:
+                        return 1, relevant
+                continue
+
+            if not opponents:
+                if suit == trump:
+                    # trumps nobody else can beat: each of them takes a trick, one more if partner can ruff
+                    longer = max(own, partner_count)
+                    if own >= partner_count and _has_ruff(suits, hand, partner, trump):
+                        longer += 1
+                    if longer >= need:
+                        return 1, relevant
+                elif (not side_suit or no_ruffs) and min(own, partner_count) >= need:
+                    return 1, relevant
+                if entry and not own:
+                    if not side_suit or no_ruffs:
+                        tricks += partner_count
+                        relevant |= entry
+                        if tricks >= need:
+                            return 1, relevant
+                    continue
+                if entry and suit == trump:
+                    longer = max(own, partner_count)
+                    if own <= partner_count and _has_ruff(suits, partner, hand, trump):
+                        longer += 1
+                    if longer >= need:
+                        return 1, relevant | entry
+
+            top_seat = description[3]
+            if top_seat < 0:
+                continue
+            if top_seat == hand:
+                if side_suit:
+                    tricks, state, relevant = self._cash_side_suit(description, hand, partner, lho, rho, shift,
+                                                                   lho_trumps, rho_trumps, tricks, need, relevant)
+                else:
+                    keeps_trumps = suit == trump and (not entry or suit != entry_suit)
+                    tricks, state, relevant, drawn = self._cash_suit(description, hand, partner, lho, rho, shift,
+                                                                     tricks, need, relevant)
+                    if keeps_trumps:
+                        lho_trumps = max(0, lho_trumps - drawn)
+                        rho_trumps = max(0, rho_trumps - drawn)
+                if state == 1:
+                    return 1, relevant
+                if state == 2:
+                    continue
+            elif top_seat == partner and entry:
+                tricks, state, relevant = self._cash_partner_suit(description, hand, partner, lho, rho, shift, side_suit,
+                                                                  lho_trumps, rho_trumps, suit == entry_suit, entry,
+                                                                  tricks, need, relevant)
+                if state == 1:
+                    return 1, relevant
+                if state == 2:
+                    continue
+
+            if side_suit and own and not ruff_counted and \
+                    (not tricks or (top_seat != hand and top_seat != partner and
+                                    suits[trump][3] != hand and suits[trump][3] != partner)) and \
+                    not partner_count and trumps[partner]:
+                # partner ruffs the lead
+                if (rho_count or not trumps[rho]) and (lho_count or not trumps[lho]):
+                    ruff_counted = True
+                    if need <= 1:
+                        return 1, relevant
+                    continue
+                over = 0
+                if not rho_count and not lho_count:
+                    over = trumps[lho] | trumps[rho]
+                elif not lho_count:
+                    over = trumps[lho]
+                elif not rho_count:
+                    over = trumps[rho]
+                if over < trumps[partner]:
+                    ruff_counted = True
+                    relevant |= 1 << (SUIT_SIZE * trump + _top(trumps[partner]))
+                    if need <= 1:
+                        return 1, relevant
+                continue
+
+            if tricks >= need:
+                return 1, relevant
+
+        if not tricks and (trump < 0 or suits[trump][3] < 0):
+            # whatever the leader leads, an opponent holds the top card of that suit
+            relevant = 0
+            for suit in range(4):
+                description = suits[suit]
+                if description[3] >= 0 and description[2][hand]:
+                    relevant |= 1 << (SUIT_SIZE * suit + description[4])
+            if other_need <= 1:
+                return -1, relevant
+        return 0, relevant
+
+    @staticmethod
+    def _cash_side_suit(description: tuple, hand: int, partner: int, lho: int, rho: int, shift: int,
+                        lho_trumps: int, rho_trumps: int, tricks: int, need: int,
+                        relevant: int) -> Tuple[int, int, int]:
+        """
+        Cash the leader's top cards of a side suit in a trump contract
+        :return: the new trick count, 1 when it reaches `need`, 2 when the suit is finished, otherwise 0, and the
+                 new relevant cards
+        """
+        lengths = description[2]
+        own, partner_count, lho_count, rho_count = lengths[hand], lengths[partner], lengths[lho], lengths[rho]
+        if (lho_count or not lho_trumps) and (rho_count or not rho_trumps):
+            relevant |= 1 << (shift + description[4])
+            tricks += 1
+            if tricks >= need:
+                return tricks, 1, relevant
+            if lho_count <= 1 and rho_count <= 1 and partner_count <= 1 and not lho_trumps and not rho_trumps:
+                tricks += own - 1
+                return tricks, 1 if tricks >= need else 2, relevant
+        if lho_trumps or rho_trumps:
+            return tricks, 0, relevant
+        if description[5] == hand:
+            relevant |= 1 << (shift + description[6])
+            tricks += 1
+            if tricks >= need:
+                return tricks, 1, relevant
+            if lho_count <= 2 and rho_count <= 2 and partner_count <= 2:
+                tricks += own - 2
+                return tricks, 1 if tricks >= need else 2, relevant
+        elif description[5] == partner and own > 1 and partner_count > 1:
+            relevant |= 1 << (shift + description[6])
+            tricks += 1
+            if tricks >= need:
+                return tricks, 1, relevant
+            if lho_count <= 2 and rho_count <= 2 and (partner_count <= 2 or own <= 2):
+                tricks += max(own - 2, partner_count - 2)
+                return tricks, 1 if tricks >= need else 2, relevant
+        return tricks, 0, relevant
+
+    @staticmethod
+    def _cash_suit(description: tuple, hand: int, partner: int, lho: int, rho: int, shift: int, tricks: int,
+                   need: int, relevant: int) -> Tuple[int, int, int, int]:
+        """
+        Cash the leader's top cards of a suit nobody can ruff (any suit in no trump, the trump suit otherwise)
+        :return: the same as _cash_side_suit, and the number of rounds cashed
+        """
+        lengths = description[2]
+        own, partner_count, lho_count, rho_count = lengths[hand], lengths[partner], lengths[lho], lengths[rho]
+        relevant |= 1 << (shift + description[4])
+        tricks += 1
+        if tricks >= need:
+            return tricks, 1, relevant, 1
+        if lho_count <= 1 and rho_count <= 1 and partner_count <= 1:
+            tricks += own - 1
+            return tricks, 1 if tricks >= need else 2, relevant, 1
+        if description[5] == hand:
+            relevant |= 1 << (shift + description[6])
+            tricks += 1
+            if tricks >= need:
+                return tricks, 1, relevant, 2
+            if lho_count <= 2 and rho_count <= 2 and partner_count <= 2:
+                tricks += own - 2
+                return tricks, 1 if tricks >= need else 2, relevant, 2
+            return tricks, 0, relevant, 2
+        if description[5] == partner and own > 1 and partner_count > 1:
+            relevant |= 1 << (shift + description[6])
+            tricks += 1
+            if tricks >= need:
+                return tricks, 1, relevant, 2
+            if lho_count <= 2 and rho_count <= 2 and (partner_count <= 2 or own <= 2):
+                tricks += max(own - 2, partner_count - 2)
+                return tricks, 1 if tricks >= need else 2, relevant, 2
+            return tricks, 0, relevant, 2
+        return tricks, 0, relevant, 1
+
+    @staticmethod
+    def _cash_partner_suit(description: tuple, hand: int, partner: int, lho: int, rho: int, shift: int,
+                           side_suit: bool, lho_trumps: int, rho_trumps: int, is_entry_suit: bool, entry: int,
+                           tricks: int, need: int, relevant: int) -> Tuple[int, int, int]:
+        """
+        Cash partner's top cards of a suit after crossing to partner with `entry`
+        :return: the same as _cash_side_suit
+        """
+        lengths = description[2]
+        own, partner_count, lho_count, rho_count = lengths[hand], lengths[partner], lengths[lho], lengths[rho]
+        no_ruffs = not lho_trumps and not rho_trumps
+        if not side_suit or ((lho_count or not lho_trumps) and (rho_count or not rho_trumps)):
+            relevant |= 1 << (shift + description[4]) | entry
+            tricks += 1
+            if tricks >= need:
+                return tricks, 1, relevant
+            if lho_count <= 1 and rho_count <= 1 and own <= 1 and (not side_suit or no_ruffs):
+                tricks += partner_count - 1
+                return tricks, 1 if tricks >= need else 2, relevant
+        if side_suit and not no_ruffs:
+            if not (is_entry_suit and description[5] == lho and (lho_count >= 2 or not lho_trumps) and
+                    (rho_count >= 2 or not rho_trumps)):
+                return tricks, 0, relevant
+        if description[5] == partner and no_ruffs:
+            relevant |= 1 << (shift + description[6]) | entry
+            tricks += 1
+            if tricks >= need:
+                return tricks, 1, relevant
+            if lho_count <= 2 and rho_count <= 2 and own <= 2:
+                tricks += partner_count - 2
+                return tricks, 1 if tricks >= need else 2, relevant
+        elif description[5] == hand and partner_count > 1 and own > 1 and no_ruffs:
+            relevant |= 1 << (shift + description[6]) | entry
+            tricks += 1
+            if tricks >= need:
+                return tricks, 1, relevant
+            if lho_count <= 2 and rho_count <= 2 and (own <= 2 or partner_count <= 2):
+                tricks += max(partner_count - 2, own - 2)
+                return tricks, 1 if tricks >= need else 2, relevant
+        elif is_entry_suit and description[5] == lho and description[7] == partner and \
+                (not side_suit or ((lho_count >= 2 or not lho_trumps) and (rho_count >= 2 or not rho_trumps))):
+            # a finesse against the second highest card
+            relevant |= 1 << (shift + description[8]) | entry
+            tricks += 1
+            if tricks >= need:
+                return tricks, 1, relevant
+            if own <= 2 and lho_count <= 2 and rho_count <= 2 and (not side_suit or no_ruffs):
+                tricks += partner_count - 2
+                if tricks >= need:
+                    return tricks, 1, relevant
+        return tricks, 0, relevant
+
+    def _later_tricks(self, hand: int, suits: List[tuple], need: int, tricks_left: int) -> Tuple[bool, int]:
+        """
+        Decide the question against the side on lead when the other side is sure of the tricks it needs: its top
+        trumps when the side on lead has none, a top trump or a guarded second trump sitting over the top one, or in
+        no trump the top card of a suit both hands of the side on lead will have to give up
+        :return: whether the side on lead fails, and the mask of cards that depends on
+        """
+        trump = self.trump
+        other_need = tricks_left + 1 - need
+        side = hand & 1
+        if trump < 0 or suits[trump][3] < 0:
+            if other_need != 1:
+                return False, 0
+            total = 0
+            for description in suits:
+                top_seat = description[3]
+                if top_seat >= 0 and top_seat & 1 == side:
+                    total += max(description[2][top_seat], description[2][top_seat ^ 2])
+            if not 0 < total < need:
+                return False, 0
+            relevant = 0
+            for suit in range(4):
+                description = suits[suit]
+                top_seat = description[3]
+                if top_seat >= 0 and top_seat & 1 != side and description[0] > description[2][top_seat]:
+                    relevant |= 1 << (SUIT_SIZE * suit + description[4])
+            return True, relevant
+
+        description = suits[trump]
+        lengths = description[2]
+        shift = SUIT_SIZE * trump
+        second_seat = description[5]
+        if description[3] & 1 != side:
+            if not lengths[hand] and not lengths[hand ^ 2]:
+                # every trump left belongs to the other side
+                return max(lengths[hand ^ 1], lengths[hand ^ 3]) >= other_need, 0
+            if other_need == 1:
+                return True, 1 << (shift + description[4])
+            if other_need == 2 and second_seat >= 0 and second_seat & 1 != side and \
+                    (lengths[second_seat] > 1 or lengths[second_seat ^ 2] > 1):
+                return True, 1 << (shift + description[6])
+            return False, 0
+        if other_need != 1 or second_seat < 0 or second_seat & 1 == side or lengths[second_seat] <= 1:
+            return False, 0
+        if description[3] == (second_seat + 3) & 3:
+            return True, 1 << (shift + description[6])
+        if description[7] >= 0 and description[7] & 1 != side:
+            return True, 1 << (shift + description[8])
+        return False, 0
+
+    def _sequences(self, holding: int, in_play: int) -> tuple:
+        """
+        :return: (rank, sequence) pairs for the cards of a holding worth searching, from the top down: the sequence
+                 holds the rank and the lower cards of the holding that are equivalent to it among the cards in play
+        """
+        key = (holding, in_play)
+        sequences = self._sequence_cache.get(key)
+        if sequences is None:
+            sequences = []
+            while holding:
+                sequence = 1 << (holding.bit_length() - 1)
+                rank = sequence.bit_length() - 1
+                holding ^= sequence
+                below = in_play & (sequence - 1)
+                while below:
+                    card = 1 << (below.bit_length() - 1)
+                    if not holding & card:
+                        break
+                    sequence |= card
+                    holding ^= card
+                    below ^= card
+                sequences.append((rank, sequence))
+            sequences = self._sequence_cache[key] = tuple(sequences)
+        return sequences
+
+    def _leads(self, hand: int, suits: List[tuple], tricks_left: int) -> List[_Move]:
+        """
+        Opening leads of a trick, most promising first: cashing winners, leading towards partner's winners and giving
+        partner a ruff come before leads an opponent can ruff or that run into a top card sitting over the suit. The
+        lead that refuted the same question at this depth before, and the one stored with the last table hit, get a
+        bonus
+        """
+        trump = self.trump
+        holdings = self._holdings
+        lho, partner, rho = (hand + 1) & 3, hand ^ 2, (hand + 3) & 3
+        killer = self._killer_leads[tricks_left]
+        stored = self._stored_leads[tricks_left]
+        ruffs = trump >= 0 and suits[trump][3] >= 0
+        if ruffs:
+            trumps = holdings[trump]
+            trump_lengths = suits[trump][2]
+
+        scored = []
+        for suit in range(4):
+            holding = holdings[suit]
+            own = holding[hand]
+            if not own:
+                continue
+            _, _, lengths, top_seat, top_rank, second_seat, second_rank, third_seat, _, in_play, _, _, _ = suits[suit]
+            lho_count, rho_count, partner_count = lengths[lho], lengths[rho], lengths[partner]
+            spread = ((lho_count or tricks_left + 1) + (rho_count or tricks_left + 1)) << 7
+            singleton_top = (lho_count == 1 and top_seat == lho) or (rho_count == 1 and top_seat == rho)
+            partner_wins = holding[partner] > (holding[lho] | holding[rho])
+            second_round = 0
+            if second_seat == partner and third_seat == partner:
+                second_round = 1
+            elif partner_count > 1 and (second_seat == hand and third_seat == partner or
+                                        second_seat == partner and third_seat == hand):
+                second_round = 2
+            shift = SUIT_SIZE * suit
+
+            if ruffs:
+                side_suit = suit != trump
+                bonus = -(spread // 13)
+                if side_suit and (not lho_count and trump_lengths[lho] or not rho_count and trump_lengths[rho]):
+                    bonus -= 12
+                if side_suit and not partner_count and trump_lengths[partner] and rho_count:
+                    bonus += 17
+                if top_seat == rho or second_seat == rho:
+                    if rho_count != 1:
+                        bonus -= 12
+                elif top_seat == lho and second_seat == partner and partner_count != 1:
+                    bonus += 27
+                if side_suit and lengths[hand] == 1 and trump_lengths[hand] and partner_count > 1 and \
+                        top_seat == partner:
+                    bonus += 19
+
+                # whether the lead takes the trick, for the top card and for the other cards of the suit
+                if not side_suit:
+                    top_wins, other_wins = True, partner_wins
+                else:
+                    lho_ruffs = not lho_count and trump_lengths[lho]
+                    rho_ruffs = not rho_count and trump_lengths[rho]
+                    if partner_count or not trump_lengths[partner]:
+                        top_wins = not lho_ruffs and not rho_ruffs
+                    else:
+                        top_wins = (lho_count or trumps[partner] > trumps[lho]) and \
+                                   (rho_count or trumps[partner] > trumps[rho])
+                    if partner_wins:
+                        other_wins = not lho_ruffs and not rho_ruffs
+                    elif not partner_count and trump_lengths[partner]:
+                        if lho_ruffs and rho_ruffs:
+                            other_wins = trumps[partner] > (trumps[lho] | trumps[rho])
+                        elif lho_ruffs:
+                            other_wins = trumps[partner] > trumps[lho]
+                        elif rho_ruffs:
+                            other_wins = trumps[partner] > trumps[rho]
+                        else:
+                            other_wins = True
+                    else:
+                        other_wins = False
+                losing_bonus = bonus + (0, 20, 13)[second_round]
+
+                for rank, sequence in self._sequences(own, in_play):
+                    relative = (in_play >> rank).bit_count()
+                    index = shift + rank
+                    if top_wins if rank == top_rank else other_wins:
+                        if singleton_top:
+                            weight = bonus + 35 + relative
+                        elif top_seat == hand:
+                            if second_seat == partner:
+                                weight = bonus + 48 + relative
+                            elif rank == top_rank:
+                                weight = bonus + 31
+                            else:
+                                weight = bonus - 3 + relative
+                        elif top_seat == partner:
+                            weight = bonus + (42 if second_seat == hand else 28) + relative
+                        elif sequence & (sequence - 1):
+                            weight = bonus + (40 if rank == second_rank else 22 + relative)
+                        else:
+                            weight = bonus + 11 + relative
+                        if index == killer:
+                            weight += 55
+                        elif index == stored:
+                            weight += 18
+                    else:
+                        if singleton_top:
+                            weight = losing_bonus + relative + 2
+                        elif top_seat == hand:
+                            if second_seat == partner:
+                                weight = losing_bonus + 33 + relative
+                            elif rank == top_rank:
+                                weight = losing_bonus + 38
+                            else:
+                                weight = losing_bonus - 14 + relative
+                        elif top_seat == partner:
+                            weight = losing_bonus + 34 + relative
+                        elif sequence & (sequence - 1) and rank == second_rank:
+                            weight = losing_bonus + 35
+                        else:
+                            weight = losing_bonus + 15 - rank
+                        if index == killer:
+                            weight += 18
+                    scored.append((weight, suit, rank, sequence))
+                continue
+
+            base = -(spread // 19) - (0 if partner_count else 9)
+            winning = base
+            if second_seat == rho:
+                if rho_count != 1:
+                    winning -= 1
+            elif second_seat == lho:
+                winning += 22 if lho_count != 1 else 16
+            if (second_seat != lho or lho_count == 1) and (second_seat != rho or rho_count == 1):
+                winning += 45
+            else:
+                winning += 18
+            losing = base
+            if top_seat == rho or second_seat == rho:
+                if rho_count != 1:
+                    losing -= 10
+            elif top_seat == lho and second_seat == partner and partner_count != 1:
+                losing += 31
+            losing += (0, 35, 25)[second_round]
+
+            for rank, sequence in self._sequences(own, in_play):
+                relative = (in_play >> rank).bit_count()
+                index = shift + rank
+                if rank == top_rank or partner_wins:
+                    weight = winning + relative
+                    if index == killer:
+                        weight += 126
+                    elif index == stored:
+                        weight += 32
+                else:
+                    if singleton_top:
+                        weight = losing + 28 + relative
+                    elif top_seat == hand:
+                        weight = losing - 17 + relative
+                    elif not sequence & (sequence - 1):
+                        weight = losing + 12 + relative
+                    elif rank == second_rank:
+                        weight = losing + 48
+                    else:
+                        weight = losing + 29 - relative
+                    if index == killer:
+                        weight += 47
+                    elif index == stored:
+                        weight += 19
+                scored.append((weight, suit, rank, sequence))
+
+        scored.sort(key=_weight, reverse=True)
+        return scored
+
+    def _follow(self, leader: int, position: int, tricks_left: int, target: int, lead_suit: int, lead_rank: int,
+                win_position: int, win_suit: int, win_rank: int, trick_cards: int,
+                suits: List[tuple]) -> Tuple[bool, int]:
+        """
+        Search the cards of the 2nd, 3rd and 4th player to a trick
+        :param win_position: position in the trick of the card winning it so far; win_suit and win_rank describe that
+                             card
+        :param trick_cards: mask of the cards played to the trick so far
+        :param suits: the suit descriptions at the start of the trick
+        :return: the same pair as _trick
+        """
+        seat = (leader + position) & 3
+        ns_to_move = seat & 1 == 0
+        if position == 1:
+            relevant = self._second_hand_tricks(seat, tricks_left, target, lead_suit, lead_rank, suits)
+            if relevant >= 0:
+                return ns_to_move, relevant
+
+        trump = self.trump
+        holdings = self._holdings
+        relevant = 0
+        lowest_win = [-1, -1, -1, -1]
+        previous_suit = previous_rank = -1
+        moves = self._follows(leader, position, seat, tricks_left, lead_suit, lead_rank, win_position, win_suit,
+                              win_rank, suits)
+        for _, suit, rank, sequence in moves:
+            if previous_suit >= 0 and lowest_win[previous_suit] < 0:
+                _raise_lowest_win(lowest_win, previous_suit, previous_rank, relevant)
+            previous_suit, previous_rank = suit, rank
+            if rank < lowest_win[suit]:
+                continue
+
+            if suit == win_suit and rank > win_rank or suit == trump and win_suit != trump:
+                next_position, next_suit, next_rank = position, suit, rank
+            else:
+                next_position, next_suit, next_rank = win_position, win_suit, win_rank
+            card = 1 << (SUIT_SIZE * suit + rank)
+            holding = holdings[suit]
+            holding[seat] ^= 1 << rank
+            if position == 3:
+                winner = (leader + next_position) & 3
+                result, child_relevant = self._trick(winner, tricks_left - 1, target - (winner & 1 == 0))
+                # the winner's rank only matters when another card of its suit was played to the trick
+                if ((trick_cards | card) >> (SUIT_SIZE * next_suit) & SUIT_HOLDING_MASK).bit_count() > 1:
+                    child_relevant |= 1 << (SUIT_SIZE * next_suit + next_rank)
+            else:
+                result, child_relevant = self._follow(leader, position + 1, tricks_left, target, lead_suit, lead_rank,
+                                                      next_position, next_suit, next_rank, trick_cards | card, suits)
+            holding[seat] ^= 1 << rank
+
+            if result == ns_to_move:
+                return result, child_relevant
+            relevant |= child_relevant
+        return not ns_to_move, _with_sequences(relevant, moves)
+
+    def _second_hand_tricks(self, seat: int, tricks_left: int, target: int, lead_suit: int, lead_rank: int,
+                            suits: List[tuple]) -> int:
+        """
+        Quick tricks for the side of the second player: the current trick when that side holds the best card of the
+        suit led or can ruff it, and in no trump further top cards the hand winning it can cash afterwards
+        :return: the mask of cards the answer depends on when those tricks decide the question, otherwise -1
+        """
+        trump = self.trump
+        holdings = self._holdings
+        led = holdings[lead_suit]
+        partner, third = seat ^ 2, (seat + 1) & 3
+        ours = led[seat] | led[partner]
+        relevant = 0
+        if trump >= 0 and lead_suit != trump and \
+                (not led[seat] and holdings[trump][seat] or not led[partner] and holdings[trump][partner]):
+            if not led[third] and holdings[trump][third]:
+                return -1
+        elif ours > (1 << lead_rank | led[third]):
+            if trump >= 0 and lead_suit != trump and not led[third] and holdings[trump][third]:
+                return -1
+            relevant = 1 << (SUIT_SIZE * lead_suit + ours.bit_length() - 1)
+        else:
+            return -1
+
+        need = target if seat & 1 == 0 else tricks_left + 1 - target
+        if need <= 1:
+            return relevant
+        if trump >= 0:
+            return -1
+
+        tricks = 1
+        winner = seat if led[seat] > led[partner] else partner
+        description = suits[lead_suit]
+        if description[3] == winner and description[5] == winner:
+            tricks += 1
+            relevant |= 1 << (SUIT_SIZE * lead_suit + description[6])
+            if tricks >= need:
+                return relevant
+        for suit in range(4):
+            holding = holdings[suit]
+            if suit == lead_suit or not holding[winner]:
+                continue
+            if not holding[winner ^ 1] and not holding[winner ^ 2] and not holding[winner ^ 3]:
+                tricks += holding[winner].bit_count()
+            elif suits[suit][3] == winner:
+                tricks += 1
+                relevant |= 1 << (SUIT_SIZE * suit + suits[suit][4])
+            else:
+                continue
+            if tricks >= need:
+                return relevant
+        return -1
+
+    def _follows(self, leader: int, position: int, seat: int, tricks_left: int, lead_suit: int, lead_rank: int,
+                 win_position: int, win_suit: int, win_rank: int, suits: List[tuple]) -> List[_Move]:
+        """
+        Cards for the 2nd, 3rd and 4th player, most promising first: winning the trick as cheaply as possible when it
+        is not already partner's, forcing out a high card otherwise, and discarding from long suits
+        """
+        trump = self.trump
+        holdings = self._holdings
+        ruffs = trump >= 0 and suits[trump][3] >= 0
+        led = holdings[lead_suit]
+        own = led[seat]
+        third, fourth = leader ^ 2, (leader + 3) & 3
+        lead = lead_rank + 2
+        winning = win_rank + 2
+        # the other scores follow DDS conventions, where ranks run from 2 to 14 and 0 stands for no card
+        scored = []
+
+        if own:
+            sequences = self._sequences(own, suits[lead_suit][9])
+            if len(sequences) == 1:
+                rank, sequence = sequences[0]
+                return [(0, lead_suit, rank, sequence)]
+            in_play = led[0] | led[1] | led[2] | led[3]
+            if position == 1:
+                third_cards, fourth_cards = led[third], led[fourth]
+                max_third = third_cards.bit_length() + 1 if third_cards else 0
+                min_third = (third_cards & -third_cards).bit_length() + 1 if third_cards else 0
+                max_fourth = fourth_cards.bit_length() + 1 if fourth_cards else 0
+                min_fourth = (fourth_cards & -fourth_cards).bit_length() + 1 if fourth_cards else 0
+                if ruffs:
+                    trumps = holdings[trump]
+                    for rank, sequence in sequences:
+                        value = rank + 2
+                        if lead_suit == trump:
+                            wins = max_fourth > lead and max_fourth > max_third or value > lead and value > max_third
+                        elif value > lead and value > max_third:
+                            wins = max_third or not trumps[third] or \
+                                   not max_fourth and trumps[fourth] > trumps[third]
+                        elif max_fourth > lead and max_fourth > max_third:
+                            wins = max_third or not trumps[third]
+                        elif lead > max_fourth and lead > max_third and lead > value:
+                            wins = not max_fourth and trumps[fourth] and \
+                                   (max_third or not trumps[third] or trumps[fourth] > trumps[third])
+                        else:
+                            wins = not max_fourth and trumps[fourth]
+                        if wins:
+                            if min_third > value:
+                                weight = 40 + (in_play >> rank).bit_count()
+                            elif max_fourth > lead and led[leader] > fourth_cards:
+                                weight = 41 + (in_play >> rank).bit_count()
+                            elif value > lead:
+                                if value < max_fourth:
+                                    weight = 78 - value
+                                elif value > max_third:
+                                    weight = 73 - value
+                                elif sequence & (sequence - 1):
+                                    weight = 62 - value
+                                else:
+                                    weight = 49 - value
+                            elif max_fourth:
+                                weight = 47 - value
+                            else:
+                                weight = 40 - value
+                        elif value < min_third or value < min_fourth:
+                            weight = -9 + (in_play >> rank).bit_count()
+                        elif value < lead:
+                            weight = -16 + (in_play >> rank).bit_count()
+                        elif sequence & (sequence - 1):
+                            weight = 22 - value
+                        else:
+                            weight = 10 - value
+                        scored.append((weight, lead_suit, rank, sequence))
+                elif max_fourth > lead and max_fourth > max_third:
+                    # partner beats both opponents
+                    return [(0, lead_suit, rank, sequence) for rank, sequence in reversed(sequences)]
+                else:
+                    for rank, sequence in sequences:
+                        value = rank + 2
+                        if value > lead and value > max_third:
+                            weight = 81 - value
+                        elif min_third > value or min_fourth > value:
+                            weight = -3 + (in_play >> rank).bit_count()
+                        elif value < lead:
+                            weight = -11 + (in_play >> rank).bit_count()
+                        elif sequence & (sequence - 1):
+                            weight = 10 + (in_play >> rank).bit_count()
+                        else:
+                            weight = 13 - value
+                        scored.append((weight, lead_suit, rank, sequence))
+
+            elif position == 2:
+                fourth_cards = led[fourth]
+                max_fourth = fourth_cards.bit_length() + 1 if fourth_cards else 0
+                min_fourth = (fourth_cards & -fourth_cards).bit_length() + 1 if fourth_cards else 0
+                max_own = sequences[0][0] + 2
+                force = -1
+                if win_position == 0 and lead > max_fourth or max_own < min_fourth or max_own < winning or \
+                        ruffs and lead_suit != trump and (win_suit == trump or win_position == 0 and not max_fourth):
+                    # partner wins the trick already, or our cards are too low to matter
+                    return [(0, lead_suit, rank, sequence) for rank, sequence in reversed(sequences)]
+                if ruffs and lead_suit != trump and win_position == 1 and not max_fourth:
+                    # the fourth hand ruffs or discards: beat the second hand
+                    bonus, over = 20, 0
+                elif ruffs and max_own > max_fourth:
+                    bonus, over = 58, max_fourth
+                else:
+                    bonus, over = 60, max_fourth
+                    if max_fourth > max_own and max_fourth > winning:
+                        force = self._rank_forces_ace(fourth_cards, sequences, suits[lead_suit][9], win_position,
+                                                      winning)
+                for number, (rank, sequence) in enumerate(sequences):
+                    value = rank + 2
+                    weight = bonus - value if value > winning and value > over else -value
+                    if number == force:
+                        weight += 20
+                    scored.append((weight, lead_suit, rank, sequence))
+
+            else:
+                moves = [(0, lead_suit, rank, sequence) for rank, sequence in reversed(sequences)]
+                if win_position == 1 or lead_suit != trump and win_suit == trump:
+                    return moves
+                # the cheapest card that wins the trick, then the lowest cards
+                losing = 0
+                while moves[losing][2] < win_rank:
+                    losing += 1
+                    if losing == len(moves):
+                        return moves
+                return moves[losing:] + moves[:losing]
+
+        else:
+            lead_bit = 1 << lead_rank
+            trumps = holdings[trump] if ruffs else None
+            for suit in range(4):
+                cards = holdings[suit][seat]
+                if not cards:
+                    continue
+                description = suits[suit]
+                count = cards.bit_count()
+                guarded_second = count == 2 and description[5] == seat
+                bare_top = count == 1 and description[3] == seat
+                sequences = self._sequences(cards, description[9])
+
+                if position == 1:
+                    partner_wins = led[fourth] > (led[third] | lead_bit)
+                    if not ruffs:
+                        if partner_wins:
+                            bonus = (count << 6) // 23 - (2 if guarded_second else 3 if bare_top else 0)
+                        else:
+                            bonus = (count << 6) // 33 - (6 if guarded_second else 8 if bare_top else 0)
+                        scored.extend((bonus - rank - 2, suit, rank, sequence) for rank, sequence in sequences)
+                        continue
+                    if lead_suit == trump:
+                        if partner_wins:
+                            bonus = (count << 6) // 44
+                        else:
+                            bonus = (count << 6) // 36 - (4 if guarded_second else 0)
+                    elif suit != trump:
+                        if led[third] and (partner_wins or not led[fourth] and trumps[fourth]) or \
+                                not led[third] and (not led[fourth] and trumps[fourth] > trumps[third] or
+                                                    not trumps[third] and led[fourth] > lead_bit):
+                            bonus = 60 + (count << 6) // 44
+                        else:
+                            bonus = -2 + (count << 6) // 36 - (4 if guarded_second else 0)
+                    elif led[third] or not led[fourth] and trumps[fourth] > trumps[third]:
+                        bonus = 24 + (count << 6) // 44
+                    else:
+                        for rank, sequence in sequences:
+                            if 1 << rank > trumps[third]:
+                                weight = 24 + (count << 6) // 44 - rank - 2
+                            else:
+                                weight = 15 + (count << 6) // 36 - (4 if guarded_second else 0) - rank - 2
+                            scored.append((weight, suit, rank, sequence))
+                        continue
+                    scored.extend((bonus - rank - 2, suit, rank, sequence) for rank, sequence in sequences)
+
+                elif position == 2:
+                    if not ruffs:
+                        bonus = (count << 6) // 24 - (4 if guarded_second or bare_top else 0)
+                        scored.extend((bonus - rank - 2, suit, rank, sequence) for rank, sequence in sequences)
+                        continue
+                    fourth_cards = led[fourth]
+                    max_fourth = fourth_cards.bit_length() + 1 if fourth_cards else 0
+                    if lead_suit == trump or suit != trump:
+                        bonus = (count << 6) // 40
+                    elif win_position == 0 and lead > max_fourth and (max_fourth or not trumps[fourth]):
+                        # do not ruff partner's sure winner
+                        bonus = -50
+                    else:
+                        bonus = (count << 6) // 50
+                        in_play = trumps[0] | trumps[1] | trumps[2] | trumps[3]
+                        for rank, sequence in sequences:
+                            value = rank + 2
+                            if win_suit == trump and value < winning:
+                                # no underruff
+                                weight = -32 + (in_play >> rank).bit_count() + (count << 6) // 40
+                            elif win_position == 0:
+                                if max_fourth:
+                                    weight = (36 if suits[lead_suit][5] == leader else 48) - value + bonus
+                                elif 1 << rank > trumps[fourth]:
+                                    weight = 48 - value + bonus
+                                else:
+                                    weight = -12 - value + bonus
+                            elif max_fourth:
+                                weight = 72 - value + bonus
+                            elif 1 << rank > trumps[fourth]:
+                                weight = 48 - value + bonus
+                            else:
+                                weight = 36 - value + bonus
+                            scored.append((weight, suit, rank, sequence))
+                        continue
+                    scored.extend((bonus - rank - 2, suit, rank, sequence) for rank, sequence in sequences)
+
+                else:
+                    if not ruffs:
+                        bonus = (count << 6) // 27 - (6 if guarded_second else 8 if bare_top else 0)
+                        scored.extend((bonus - rank - 2, suit, rank, sequence) for rank, sequence in sequences)
+                        continue
+                    bonus = (count << 6) // 24 - (2 if guarded_second else 0)
+                    if lead_suit != trump and suit == trump and win_position != 1:
+                        # ruff, or overruff when an opponent has ruffed
+                        in_play = trumps[0] | trumps[1] | trumps[2] | trumps[3]
+                        for rank, sequence in sequences:
+                            relative = (in_play >> rank).bit_count()
+                            if win_suit != trump or rank > win_rank:
+                                weight = 33 + relative
+                            else:
+                                weight = -13 + relative
+                            scored.append((weight, suit, rank, sequence))
+                        continue
+                    if lead_suit != trump:
+                        bonus += (2 if suit == trump else 25) if win_position == 1 else 14
+                    scored.extend((bonus - rank - 2, suit, rank, sequence) for rank, sequence in sequences)
+
+        scored.sort(key=_weight, reverse=True)
+        return scored
+
+    def _rank_forces_ace(self, fourth_cards: int, sequences: tuple, in_play: int, win_position: int,
+                         winning: int) -> int:
+        """
+        :return: the position in `sequences` of the cheapest card of the third hand that forces out the top card of
+                 the fourth hand, or beats the second hand, -1 when there is none
+        """
+        fourth_sequences = self._sequences(fourth_cards, in_play)
+        if len(fourth_sequences) < 2:
+            return -1
+        second = fourth_sequences[1][0] + 2
+        if second > winning:
+            bound = second
+        elif win_position == 1:
+            bound = winning
+        else:
+            return -1
+        count = 0
+        while count < len(sequences) and sequences[count][0] + 2 > bound:
+            count += 1
+        return count - 1
+
+
+def _with_sequences(relevant: int, moves: List[_Move]) -> int:
+    """
+    After every move failed: a card whose rank decided the search stood for its whole sequence, the other cards of
+    which were never tried, so they decide the search too
+    """
+    for _, suit, rank, sequence in moves:
+        shift = SUIT_SIZE * suit
+        if relevant >> (shift + rank) & 1:
+            relevant |= sequence << shift
+    return relevant
+
+
+def _raise_lowest_win(lowest_win: List[int], suit: int, rank: int, relevant: int) -> None:
+    """
+    After a card of `suit` failed, the lowest card of the suit the failure depended on bounds the cards still worth
+    trying: a smaller card than the one that failed cannot do better
+    """
+    ranks = (relevant >> (SUIT_SIZE * suit)) & SUIT_HOLDING_MASK
+    low = _bottom(ranks) if ranks else SUIT_SIZE
+    if rank < low:
+        lowest_win[suit] = low
+
+
+def _describe_suit(holdings: Tuple[int, int, int, int]) -> tuple:
+    """
+    :return: number of cards left in the suit, the seat holding each of them from the top down (two bits per card),
+             the suit length of every hand, the seat and rank of the three highest cards (-1 when missing), the cards
+             in play, per number n of top cards the owners of the top n cards and the mask of their ranks, and the
+             suit lengths packed four bits per hand
+    """
+    in_play = remaining = holdings[0] | holdings[1] | holdings[2] | holdings[3]
+    count = remaining.bit_count()
+    owners = 0
+    tops = []
+    prefixes = [0]
+    top_masks = [0]
+    while remaining:
+        rank = remaining.bit_length() - 1
+        bit = 1 << rank
+        remaining ^= bit
+        seat = 0
+        while not holdings[seat] & bit:
+            seat += 1
+        owners = owners << 2 | seat
+        prefixes.append(owners)
+        top_masks.append(top_masks[-1] | bit)
+        if len(tops) < 6:
+            tops += (seat, rank)
+    tops += (-1, -1) * (3 - len(tops) // 2)
+    lengths = tuple(holding.bit_count() for holding in holdings)
+    return (count, owners, lengths, *tops, in_play, tuple(prefixes), tuple(top_masks),
+            lengths[0] | lengths[1] << 4 | lengths[2] << 8 | lengths[3] << 12)
+
+
+def _has_ruff(suits: List[tuple], hand: int, ruffer: int, trump: int) -> bool:
+    """
+    :return: whether `hand` holds a side suit `ruffer` is void in
+    """
+    return any(suit != trump and suits[suit][2][hand] and not suits[suit][2][ruffer] for suit in range(4))
+
+
+def _relevant_tops(relevant: int, suits: List[tuple]) -> Tuple[tuple, tuple]:
+    """
+    Translate a mask of relevant cards into, per suit, how many of the top remaining cards must be held by the same
+    players for a stored result to apply, and the owners of those cards
+    """
+    depths = []
+    owners = []
+    for suit in range(4):
+        suit_relevant = (relevant >> (SUIT_SIZE * suit)) & SUIT_HOLDING_MASK
+        description = suits[suit]
+        depth = (description[9] >> _bottom(suit_relevant)).bit_count() if suit_relevant else 0
+        depths.append(depth)
+        owners.append(description[10][depth])
+    return tuple(depths), tuple(owners)
+
+
+def _top_cards(suits: List[tuple], depths: tuple) -> int:
+    """
+    :return: the mask of the top `depths[suit]` remaining cards of every suit
+    """
+    return suits[0][11][depths[0]] | suits[1][11][depths[1]] << SUIT_SIZE | \
+        suits[2][11][depths[2]] << 2 * SUIT_SIZE | suits[3][11][depths[3]] << 3 * SUIT_SIZE
+
+
+def solve(deal: DealMasks, strain: BiddingSuit, leader: Direction) -> int:
+    """
+    :return: number of tricks taken by the side on lead with best play from both sides
+    """
+    return DoubleDummySolver(strain).solve(deal, leader)
+
+
+def declarer_tricks(deal: DealMasks, strain: BiddingSuit, declarer: Direction,
+                    solver: Optional[DoubleDummySolver] = None) -> int:
+    """
+    :return: number of tricks declarer takes with best play; the opening lead is made by declarer's left-hand opponent
+    """
+    solver = solver or DoubleDummySolver(strain)
+    return deal[0].bit_count() - solver.solve(deal, declarer.next())
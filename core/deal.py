@@ -1,9 +1,12 @@
 from __future__ import annotations
 
 from functools import total_ordering
-from typing import Dict, Iterable, List
+from typing import Dict, Iterable, List, Optional, Tuple
 
+from core.bitboard import (SUIT_MASKS, card_index, contains_suit, index_to_suit_rank, iter_indices, legal_mask,
+                           mask_from_indices, suit_holding)
 from core.deal_enums import Direction, Rank, Suit
+from core.hand_eval import HandEvaluation
 
 """
 Classes to represent each component of a bridge deal
@@ -14,23 +17,44 @@ Classes to represent each component of a bridge deal
 class Card:
     """
     A single card in a hand or deal of bridge
+
+    There are exactly 52 Card objects, built once when the module is imported. Card(suit, rank), Card.from_str and
+    Card.from_index all return one of them, so cards are immutable and can be compared by identity
     """
 
-    def __init__(self, suit: Suit, rank: Rank):
-        self.suit = suit
-        self.rank = rank
-        self.image_path = f"assets/PNG-cards/{self.suit.name[0]}{self.rank.value[1]}.png"  # Przykład: "assets/PNG-cards/SA.png"
+    __slots__ = ("suit", "rank", "index", "image_path")
+
+    def __new__(cls, suit: Suit, rank: Rank) -> Card:
+        return _CARDS[card_index(suit, rank)]
+
+    @classmethod
+    def _build(cls, suit: Suit, rank: Rank) -> Card:
+        card = object.__new__(cls)
+        object.__setattr__(card, "suit", suit)
+        object.__setattr__(card, "rank", rank)
+        object.__setattr__(card, "index", card_index(suit, rank))
+        object.__setattr__(card, "image_path", f"assets/PNG-cards/{suit.name[0]}{rank.value[1]}.png")  # Przykład: "assets/PNG-cards/SA.png"
+        return card
+
+    def __setattr__(self, name, value) -> None:
+        raise AttributeError("Card is immutable")
+
+    def __delattr__(self, name) -> None:
+        raise AttributeError("Card is immutable")
+
+    def __reduce__(self):
+        return Card.from_index, (self.index,)
 
     def __eq__(self, other) -> bool:
-        return self.rank == other.rank and self.suit == other.suit
+        return self is other
 
     def __hash__(self) -> int:
-        return hash((self.suit, self.rank))
+        return self.index
 
     def __lt__(self, other) -> bool:
-        return (self.suit, self.rank) < (other.suit, other.rank)
+        return self.index < other.index
 
-    def __str__(self) -> bool:
+    def __str__(self) -> str:
         return self.suit.name[0] + self.rank.value[1]
 
     def __repr__(self) -> str:
@@ -38,22 +62,51 @@ class Card:
 
     @classmethod
     def from_str(cls, card_str) -> Card:
-        return Card(Suit.from_str(card_str[0]), Rank.from_str(card_str[1]))
+        return _CARDS_BY_STR[card_str.upper()]
+
+    @classmethod
+    def from_index(cls, index: int) -> Card:
+        return _CARDS[index]
+
+
+# Lookup tables of the 52 cards, by index (see core.bitboard) and by strings such as "SA" or "H2"
+_CARDS: List[Card] = [Card._build(*index_to_suit_rank(index)) for index in range(52)]
+_CARDS_BY_STR: Dict[str, Card] = {str(card): card for card in _CARDS}
+_CARDS_BY_STR.update({card.suit.name[0] + "10": card for card in _CARDS if card.rank == Rank.TEN})
 
 CUSTOM_SUIT_ORDER = [Suit.DIAMONDS, Suit.CLUBS, Suit.HEARTS, Suit.SPADES]
 
+
+def _cards_in_display_order(mask: int) -> List[Card]:
+    cards = []
+    for suit in reversed(CUSTOM_SUIT_ORDER):
+        cards.extend(_CARDS[index] for index in reversed(list(iter_indices(mask & SUIT_MASKS[suit.value]))))
+    return cards
+
+
 class PlayerHand:
     """
     A single player's 13 cards in a bridge deal
+
+    The hand is stored as a 52-bit mask (see core.bitboard); suits and cards are views built from it on demand
     """
 
+    _evaluation: Optional[HandEvaluation] = None
+    _evaluated_mask: Optional[int] = None
+
     def __init__(self, suits: Dict[Suit, List[Rank]]):
-        self.suits = suits
-        assert 13 == sum([len(ranks) for suit, ranks in self.suits.items()])
-        self.cards = []
-        for suit in reversed(CUSTOM_SUIT_ORDER):
-            for rank in self.suits[suit]:
-                self.cards.append(Card(suit, rank))
+        self.mask = mask_from_indices(card_index(suit, rank) for suit, ranks in suits.items() for rank in ranks)
+        assert 13 == self.mask.bit_count()
+
+    @staticmethod
+    def from_mask(mask: int) -> PlayerHand:
+        """
+        Build a PlayerHand straight from a card mask. Unlike the constructor this does not require 13 cards, so it can
+        describe a hand part way through the play
+        """
+        hand = PlayerHand.__new__(PlayerHand)
+        hand.mask = mask
+        return hand
 
     @staticmethod
     def from_string_lists(spades: List[str], hearts: List[str], diamonds: List[str], clubs: List[str]) -> PlayerHand:
@@ -72,19 +125,92 @@ class PlayerHand:
 
     @staticmethod
     def from_cards(cards: Iterable[Card]) -> PlayerHand:
-        suits = {
-            Suit.CLUBS: sorted([card.rank for card in cards if card.suit == Suit.CLUBS], reverse=True),
-            Suit.DIAMONDS: sorted([card.rank for card in cards if card.suit == Suit.DIAMONDS], reverse=True),
-            Suit.HEARTS: sorted([card.rank for card in cards if card.suit == Suit.HEARTS], reverse=True),
-            Suit.SPADES: sorted([card.rank for card in cards if card.suit == Suit.SPADES], reverse=True),
-        }
-        return PlayerHand(suits)
+        hand = PlayerHand.from_mask(mask_from_indices(card.index for card in cards))
+        assert 13 == hand.mask.bit_count()
+        return hand
+
+    @property
+    def suits(self) -> Dict[Suit, List[Rank]]:
+        """
+        Ranks held in each suit, highest first
+        """
+        suits = {}
+        for suit in reversed(CUSTOM_SUIT_ORDER):
+            holding = suit_holding(self.mask, suit)
+            suits[suit] = [index_to_suit_rank(index)[1] for index in reversed(list(iter_indices(holding)))]
+        return suits
+
+    @property
+    def cards(self) -> List[Card]:
+        """
+        Cards in display order: suits as in reversed CUSTOM_SUIT_ORDER, highest rank first within each suit
+        """
+        return _cards_in_display_order(self.mask)
+
+    @property
+    def evaluation(self) -> HandEvaluation:
+        """
+        Metrics of the hand (see core.hand_eval), computed on first use and again only after the hand has changed
+        """
+        if self._evaluated_mask != self.mask:
+            self._evaluation = HandEvaluation(self.mask)
+            self._evaluated_mask = self.mask
+        return self._evaluation
+
+    @property
+    def hcp(self) -> int:
+        return self.evaluation.hcp
+
+    @property
+    def suit_lengths(self) -> Tuple[int, ...]:
+        """
+        Length of every suit, indexed by Suit.value
+        """
+        return self.evaluation.suit_lengths
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        """
+        Suit lengths longest first, e.g. (5, 3, 3, 2)
+        """
+        return self.evaluation.shape
+
+    @property
+    def losers(self) -> int:
+        """
+        Losing trick count
+        """
+        return self.evaluation.losers
+
+    @property
+    def controls(self) -> int:
+        return self.evaluation.controls
+
+    @property
+    def quick_tricks(self) -> float:
+        return self.evaluation.quick_tricks
 
     def contains_suit(self, suit: Suit) -> bool:
-        for card in self.cards:
-            if card.suit == suit:
-                return True
-        return False
+        return contains_suit(self.mask, suit)
+
+    def legal_cards(self, led_suit: Optional[Suit]) -> List[Card]:
+        """
+        :param led_suit: suit led to the current trick, None if this hand is on lead
+        :return: cards that may legally be played, in display order
+        """
+        return _cards_in_display_order(legal_mask(self.mask, led_suit))
+
+    def remove(self, card: Card) -> None:
+        bit = 1 << card.index
+        if not self.mask & bit:
+            raise ValueError(f"The card '{card}' is not in the hand.")
+        self.mask ^= bit
+
+    def __contains__(self, card: Card) -> bool:
+        return self.mask >> card.index & 1 == 1
+
+    def __len__(self) -> int:
+        return self.mask.bit_count()
 
     def __repr__(self):
         suit_arrays = [[], [], [], []]
@@ -94,8 +220,8 @@ class PlayerHand:
         return f"PlayerHand({repr_str})"
 
     def __eq__(self, other) -> bool:
-        return self.suits == other.suits
+        return self.mask == other.mask
 
     def __hash__(self) -> int:
-        return hash(set(self.cards))
+        return hash(self.mask)
 
@@ -162,4 +162,26 @@ class GameStatus(Enum):
     GAME_OVER = 'Game over'
 
     def __str__(self) -> str:
-        return self.name
\ No newline at end of file
+        return self.name
+
+class Vulnerability(Enum):
+    NONE = 0
+    NORTH_SOUTH = 1
+    EAST_WEST = 2
+    BOTH = 3
+
+    # Vulnerability of boards 1..16, repeating every 16 boards
+    __board_cycle__ = [NONE, NORTH_SOUTH, EAST_WEST, BOTH, NORTH_SOUTH, EAST_WEST, BOTH, NONE,
+                       EAST_WEST, BOTH, NONE, NORTH_SOUTH, BOTH, NONE, NORTH_SOUTH, EAST_WEST]
+
+    @classmethod
+    def for_board(cls, board_number: int) -> Vulnerability:
+        return Vulnerability(cls.__board_cycle__[(board_number - 1) % 16])
+
+    def is_vulnerable(self, direction: Direction) -> bool:
+        if direction in (Direction.NORTH, Direction.SOUTH):
+            return self in (Vulnerability.NORTH_SOUTH, Vulnerability.BOTH)
+        return self in (Vulnerability.EAST_WEST, Vulnerability.BOTH)
+
+    def __repr__(self) -> str:
+        return self.name
@@ -0,0 +1,120 @@
+import argparse
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from core.bitboard import DealMasks
+
+"""
+Bulk generation of random deals.
+
+A batch of deals is a (count, 52) uint8 array: row i is deal i and column c holds the seat (Direction.value) that got
+the card with index c (see core.bitboard). Every row is an independent random permutation of thirteen 0s, 1s, 2s and
+3s, produced for a whole batch at once by NumPy.
+
+The stream is reproducible: a seed is split with numpy's SeedSequence into one child per CHUNK_SIZE deals, so the same
+seed gives the same deals whether the chunks are generated in one process or spread over several.
+
+Command line: python -m core.dealer --count 1000000 --seed 42 --processes 4 --output deals.npy (or deals.bda to
+stream the deals into a core.archive file)
+"""
+
+CHUNK_SIZE = 1 << 16
+
+_SEATS = np.repeat(np.arange(4, dtype=np.uint8), 13)
+
+
+def deal_chunk(seed_sequence: np.random.SeedSequence, count: int) -> np.ndarray:
+    """
+    :return: (count, 52) array of seats, see module docstring
+    """
+    rng = np.random.default_rng(seed_sequence)
+    return rng.permuted(np.tile(_SEATS, (count, 1)), axis=1)
+
+
+def _chunk_plan(count: int, seed: Optional[int]) -> List[Tuple[np.random.SeedSequence, int]]:
+    root = np.random.SeedSequence(seed)
+    chunks = -(-count // CHUNK_SIZE)
+    return [
+        (child, min(CHUNK_SIZE, count - index * CHUNK_SIZE))
+        for index, child in enumerate(root.spawn(chunks))
+    ]
+
+
+def iter_deal_chunks(count: int, seed: Optional[int] = None, processes: int = 1) -> Iterator[np.ndarray]:
+    """
+    Generate `count` deals lazily, CHUNK_SIZE at a time, without holding them all in memory
+    :param processes: number of worker processes; at most two chunks per process are generated ahead of the consumer
+    """
+    plan = _chunk_plan(count, seed)
+    if processes <= 1 or len(plan) <= 1:
+        for seed_sequence, size in plan:
+            yield deal_chunk(seed_sequence, size)
+        return
+    with ProcessPoolExecutor(processes) as pool:
+        pending = deque()
+        for seed_sequence, size in plan:
+            if len(pending) == 2 * processes:
+                yield pending.popleft().result()
+            pending.append(pool.submit(deal_chunk, seed_sequence, size))
+        while pending:
+            yield pending.popleft().result()
+
+
+def generate_deals(count: int, seed: Optional[int] = None, processes: int = 1) -> np.ndarray:
+    """
+    :param count: number of deals
+    :param seed: seed of the stream; None draws fresh entropy
+    :param processes: number of worker processes the chunks are shared between
+    :return: (count, 52) uint8 array of seats
+    """
+    deals = np.empty((count, 52), dtype=np.uint8)
+    for index, chunk in enumerate(iter_deal_chunks(count, seed, processes)):
+        deals[index * CHUNK_SIZE:index * CHUNK_SIZE + len(chunk)] = chunk
+    return deals
+
+
+def deal_masks_array(deals: np.ndarray) -> np.ndarray:
+    """
+    :param deals: (count, 52) array of seats
+    :return: (count, 4) uint64 array with the card mask of every hand
+    """
+    # Pack each seat's 52 card flags into the low 7 bytes of a little-endian 64-bit word
+    packed = np.zeros((len(deals), 4, 8), dtype=np.uint8)
+    for seat in range(4):
+        packed[:, seat, :7] = np.packbits(deals == seat, axis=1, bitorder="little")
+    return packed.view("<u8").reshape(len(deals), 4).astype(np.uint64, copy=False)
+
+
+def deal_masks(seats: np.ndarray) -> DealMasks:
+    """
+    :param seats: one row of a batch
+    :return: the deal as four Python int masks
+    """
+    return tuple(int(mask) for mask in deal_masks_array(seats.reshape(1, 52))[0])
+
+
+def main(args: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Generate random bridge deals in bulk")
+    parser.add_argument("--count", type=int, required=True, help="number of deals")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the reproducible stream")
+    parser.add_argument("--processes", type=int, default=1, help="worker processes")
+    parser.add_argument("--output", required=True,
+                        help="output file: .npy for a (count, 52) uint8 array of seats, .bda for a deal archive")
+    options = parser.parse_args(args)
+
+    start = time.perf_counter()
+    if options.output.endswith(".bda"):
+        from core.archive import write_archive
+        write_archive(options.output, iter_deal_chunks(options.count, options.seed, options.processes))
+    else:
+        np.save(options.output, generate_deals(options.count, options.seed, options.processes))
+    elapsed = time.perf_counter() - start
+    print(f"Generated {options.count} deals in {elapsed:.2f}s ({options.count / elapsed:,.0f} deals/s)")
+
+
+if __name__ == "__main__":
+    main()
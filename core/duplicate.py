@@ -0,0 +1,254 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from core.board_record import BoardRecord, BridgeContract
+from core.deal_enums import Vulnerability
+from core.score_table import STRAIN_CODES, score_batch
+
+"""
+Duplicate scoring: matchpoints, cross-IMPs and Butler IMPs.
+
+The results of a session are an array scores[board, table] of North-South scores, with played[board, table] telling
+which cells hold a result; raw scores come from play_utils.calculate_score through core.score_table. Every board is
+scored against the other results of the same board, for all boards at once:
+
+    matchpoints   2 for every result beaten, 1 for every tie (top = 2 * (results - 1)); with neuberg=True boards
+                  played fewer times than the others are scaled to the same top
+    cross-IMPs    IMPs against every other result of the board, averaged over the comparisons
+    Butler        IMPs against the board's datum, the average of its results without the highest and the lowest
+                  ones (drop of each), rounded to 10
+
+The functions return the North-South result of each cell (0 where nothing was played); East-West get the complement
+(top - matchpoints) or the negated IMPs. DuplicateSession keeps the results of a session together with who sat where
+and turns them into pair totals and a ranking, so changing one result and re-ranking is a few array operations.
+"""
+
+IMP_THRESHOLDS = np.array([20, 50, 90, 130, 170, 220, 270, 320, 370, 430, 500, 600, 750, 900, 1100, 1300, 1500, 1750,
+                           2000, 2250, 2500, 3000, 3500, 4000])
+
+_ROW_STRIDE = 1 << 20  # larger than the spread of any board's scores, keeps every board's sorted scores apart
+
+
+def imps(difference) -> np.ndarray:
+    """
+    :param difference: score differences (array-like)
+    :return: IMPs of each difference, with its sign
+    """
+    difference = np.asarray(difference)
+    return np.sign(difference) * np.searchsorted(IMP_THRESHOLDS, np.abs(difference), side='right')
+
+
+def ns_scores(levels, strains, doubled, tricks, declarers, vulnerability) -> np.ndarray:
+    """
+    North-South scores of many results, array-likes broadcast against each other
+    :param levels: contract levels 0..7 (0 = passed out)
+    :param strains: strain codes, see core.score_table.strain_codes
+    :param doubled: 0=undoubled, 1=doubled, 2=redoubled
+    :param tricks: tricks taken by declarer
+    :param declarers: Direction.value of declarer
+    :param vulnerability: Vulnerability.value of the board
+    """
+    declarers = np.asarray(declarers)
+    vulnerability = np.asarray(vulnerability)
+    ew = declarers % 2 == 1
+    # Vulnerability.value: bit 0 NS vulnerable, bit 1 EW vulnerable
+    vulnerable = np.where(ew, vulnerability >> 1, vulnerability) & 1
+    scores = score_batch(levels, strains, doubled, tricks, vulnerable)
+    return np.where(ew, -scores, scores)
+
+
+def _played(scores: np.ndarray, played: Optional[np.ndarray]) -> np.ndarray:
+    return np.ones(scores.shape, dtype=bool) if played is None else np.asarray(played, dtype=bool)
+
+
+def matchpoints(scores, played=None, neuberg: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    :param scores: [board, table] North-South scores
+    :param played: [board, table] which scores are results, all of them by default
+    :param neuberg: scale boards with fewer results than the most played board to its top
+    :return: North-South matchpoints [board, table] and the top of each board
+    """
+    scores = np.asarray(scores, dtype=np.int64)
+    played = _played(scores, played)
+    boards, tables = scores.shape
+    counts = played.sum(axis=1)
+
+    # All boards are sorted in one go: each board's scores are moved to their own range, results not played go to
+    # the end of it, and one searchsorted counts the results below and equal to each score
+    offsets = (np.arange(boards, dtype=np.int64) * _ROW_STRIDE)[:, None]
+    keys = np.where(played, scores + offsets, offsets + _ROW_STRIDE // 2)
+    ordered = np.sort(keys, axis=None)
+    below = np.searchsorted(ordered, keys, side='left') - np.arange(boards)[:, None] * tables
+    equal = np.searchsorted(ordered, keys, side='right') - np.searchsorted(ordered, keys, side='left')
+    points = (2 * below + equal - 1).astype(np.float64)
+
+    top = np.maximum(2 * (counts - 1), 0).astype(np.float64)
+    if neuberg and boards:
+        expected = counts.max()
+        scaled = counts > 0
+        factor = np.where(scaled, expected / np.maximum(counts, 1), 1.0)[:, None]
+        points = (points + 1) * factor - 1
+        top = np.where(scaled, 2.0 * (expected - 1), 0.0)
+    return np.where(played, points, 0.0), top
+
+
+def cross_imps(scores, played=None) -> np.ndarray:
+    """
+    :return: North-South IMPs [board, table] against every other result of the board, divided by their number
+    """
+    scores = np.asarray(scores, dtype=np.int64)
+    played = _played(scores, played)
+    pairs = played[:, :, None] & played[:, None, :]
+    total = np.where(pairs, imps(scores[:, :, None] - scores[:, None, :]), 0).sum(axis=2)
+    others = played.sum(axis=1, keepdims=True) - 1
+    return np.where(played & (others > 0), total / np.maximum(others, 1), 0.0)
+
+
+def butler_datums(scores, played=None, drop: int = 1) -> np.ndarray:
+    """
+    :param drop: results left out of the datum at each end, when the board has enough of them
+    :return: the datum of each board, the mean of its results without the drop highest and lowest, rounded to 10
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    played = _played(scores, played)
+    counts = played.sum(axis=1)
+    ordered = np.sort(np.where(played, scores, np.inf), axis=1)  # results first, in order
+    drop = np.where(counts > 2 * drop, drop, 0)[:, None]
+    position = np.arange(scores.shape[1])[None, :]
+    kept = (position >= drop) & (position < counts[:, None] - drop)
+    kept_count = np.maximum(kept.sum(axis=1), 1)
+    mean = np.where(kept, ordered, 0.0).sum(axis=1) / kept_count
+    # Rounded half away from zero, as datums are
+    return np.sign(mean) * np.floor(np.abs(mean) / 10 + 0.5) * 10
+
+
+def butler_imps(scores, played=None, drop: int = 1) -> np.ndarray:
+    """
+    :return: North-South IMPs [board, table] against the board's datum
+    """
+    scores = np.asarray(scores, dtype=np.int64)
+    played = _played(scores, played)
+    datums = butler_datums(scores, played, drop).astype(np.int64)
+    return np.where(played, imps(scores - datums[:, None]), 0)
+
+
+def ranking(totals: np.ndarray, pairs: Optional[List[int]] = None) -> List[Tuple[int, int, float]]:
+    """
+    :param totals: total of every pair, indexed by pair number
+    :param pairs: pairs to rank, all of them by default
+    :return: (place, pair, total) best first; tied pairs share the place
+    """
+    if pairs is None:
+        pairs = range(len(totals))
+    order = sorted(pairs, key=lambda pair: -totals[pair])
+    result = []
+    for index, pair in enumerate(order):
+        place = result[-1][0] if result and totals[pair] == result[-1][2] else index + 1
+        result.append((place, pair, float(totals[pair])))
+    return result
+
+
+class DuplicateSession:
+    METHODS = ('matchpoints', 'cross_imps', 'butler')
+
+    def __init__(self, ns_pairs, ew_pairs, first_board: int = 1):
+        """
+        :param ns_pairs: [board, table] number of the pair sitting North-South when the board is played at the table,
+                         -1 where it is not played there; with ew_pairs this is what a movement produces
+        :param ew_pairs: [board, table] the same for East-West
+        :param first_board: number of board 0, for its vulnerability
+        """
+        self.ns_pairs = np.asarray(ns_pairs, dtype=np.int64)
+        self.ew_pairs = np.asarray(ew_pairs, dtype=np.int64)
+        if self.ns_pairs.shape != self.ew_pairs.shape:
+            raise ValueError("ns_pairs and ew_pairs must have the same shape")
+        self.first_board = first_board
+        self.scores = np.zeros(self.ns_pairs.shape, dtype=np.int64)
+        self.played = np.zeros(self.ns_pairs.shape, dtype=bool)
+        self.pair_count = int(max(self.ns_pairs.max(initial=-1), self.ew_pairs.max(initial=-1))) + 1
+
+    @property
+    def boards(self) -> int:
+        return self.scores.shape[0]
+
+    @property
+    def tables(self) -> int:
+        return self.scores.shape[1]
+
+    def vulnerability(self, board: int) -> Vulnerability:
+        return Vulnerability.for_board(self.first_board + board)
+
+    def set_score(self, board: int, table: int, ns_score: int) -> None:
+        if self.ns_pairs[board, table] < 0:
+            raise ValueError(f"Board {self.first_board + board} is not played at table {table}")
+        self.scores[board, table] = ns_score
+        self.played[board, table] = True
+
+    def set_result(self, board: int, table: int, contract: Optional[BridgeContract], tricks: int = 0) -> None:
+        """
+        :param contract: the final contract, None or an empty contract for a passed-out board
+        :param tricks: tricks taken by declarer
+        """
+        if contract is None or not contract.level:
+            self.set_score(board, table, 0)
+            return
+        score = ns_scores(contract.level, STRAIN_CODES[contract.suit], contract.doubled, tricks,
+                          contract.declarer.value, self.vulnerability(board).value)
+        self.set_score(board, table, int(score))
+
+    def set_record(self, table: int, record: BoardRecord) -> None:
+        """
+        Enter the result of a hand record (e.g. from core.pbn) with a board number, contract and tricks
+        """
+        if record.board_number is None:
+            raise ValueError("The record has no board number")
+        self.set_result(record.board_number - self.first_board, table, record.contract, record.tricks or 0)
+
+    def clear_result(self, board: int, table: int) -> None:
+        self.played[board, table] = False
+        self.scores[board, table] = 0
+
+    def ns_points(self, method: str = 'matchpoints') -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :return: North-South and East-West points [board, table] of the method
+        """
+        if method == 'matchpoints':
+            points, top = matchpoints(self.scores, self.played)
+            return points, np.where(self.played, top[:, None] - points, 0.0)
+        if method == 'cross_imps':
+            points = cross_imps(self.scores, self.played)
+        elif method == 'butler':
+            points = butler_imps(self.scores, self.played).astype(np.float64)
+        else:
+            raise ValueError(f"Unknown scoring method '{method}', expected one of {self.METHODS}")
+        return points, -points
+
+    def pair_totals(self, method: str = 'matchpoints') -> np.ndarray:
+        """
+        :return: total of every pair over the boards it played, indexed by pair number
+        """
+        ns, ew = self.ns_points(method)
+        played = self.played
+        totals = np.bincount(self.ns_pairs[played], weights=ns[played], minlength=self.pair_count)
+        totals += np.bincount(self.ew_pairs[played], weights=ew[played], minlength=self.pair_count)
+        return totals
+
+    def percentages(self) -> np.ndarray:
+        """
+        :return: matchpoint percentage of every pair, of the tops of the boards it played
+        """
+        points, top = matchpoints(self.scores, self.played)
+        played = self.played
+        tops = np.broadcast_to(top[:, None], played.shape)[played]
+        possible = np.bincount(self.ns_pairs[played], weights=tops, minlength=self.pair_count) + \
+            np.bincount(self.ew_pairs[played], weights=tops, minlength=self.pair_count)
+        totals = self.pair_totals('matchpoints')
+        return np.where(possible > 0, 100 * totals / np.maximum(possible, 1), 0.0)
+
+    def ranking(self, method: str = 'matchpoints') -> List[Tuple[int, int, float]]:
+        """
+        :return: (place, pair, total) of every pair of the movement, best first
+        """
+        seated = np.union1d(self.ns_pairs[self.ns_pairs >= 0], self.ew_pairs[self.ew_pairs >= 0])
+        return ranking(self.pair_totals(method), seated.tolist())
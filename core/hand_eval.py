@@ -0,0 +1,122 @@
+from functools import cached_property
+from typing import Tuple
+
+import numpy as np
+
+from core.bitboard import SUIT_HOLDING_MASK, SUIT_SIZE
+
+"""
+Hand evaluation by table lookup.
+
+Every metric here is a sum over the four suits of a value that depends only on the suit's 13-bit holding (bit 0 the
+two, bit 12 the ace, see core.bitboard). The per-suit values of all 8192 holdings are computed once at import, so
+evaluating a hand is four shifts and a few list lookups, and evaluating a batch of deals is a single NumPy gather.
+
+    hcp           A 4, K 3, Q 2, J 1
+    controls      A 2, K 1
+    losers        losing trick count: a suit has min(length, 3) losers less the A, K and Q among its top
+                  min(length, 3) ranks, so a singleton king is one loser and Qx two
+    quick tricks  AK 2, AQ 1.5, A 1, KQ 1, Kx 0.5
+"""
+
+HOLDINGS = 1 << SUIT_SIZE
+
+_ACE, _KING, _QUEEN, _JACK = (1 << 12), (1 << 11), (1 << 10), (1 << 9)
+
+
+def _suit_values(holding: int) -> Tuple[int, int, int, int, float]:
+    """
+    :return: length, hcp, controls, losers and quick tricks of one suit holding
+    """
+    length = holding.bit_count()
+    ace, king, queen = bool(holding & _ACE), bool(holding & _KING), bool(holding & _QUEEN)
+    hcp = 4 * ace + 3 * king + 2 * queen + bool(holding & _JACK)
+    controls = 2 * ace + king
+    counted = min(length, 3)
+    losers = counted - sum((ace, king, queen)[:counted])
+    if ace:
+        quick_tricks = 2.0 if king else 1.5 if queen else 1.0
+    elif king:
+        quick_tricks = 1.0 if queen else 0.5 if length > 1 else 0.0
+    else:
+        quick_tricks = 0.0
+    return length, hcp, controls, losers, quick_tricks
+
+
+_VALUES = [_suit_values(holding) for holding in range(HOLDINGS)]
+
+LENGTH_TABLE = np.array([values[0] for values in _VALUES], dtype=np.int8)
+HCP_TABLE = np.array([values[1] for values in _VALUES], dtype=np.int8)
+CONTROLS_TABLE = np.array([values[2] for values in _VALUES], dtype=np.int8)
+LOSERS_TABLE = np.array([values[3] for values in _VALUES], dtype=np.int8)
+QUICK_TRICKS_TABLE = np.array([values[4] for values in _VALUES], dtype=np.float32)
+for _table in (LENGTH_TABLE, HCP_TABLE, CONTROLS_TABLE, LOSERS_TABLE, QUICK_TRICKS_TABLE):
+    _table.flags.writeable = False
+
+# Plain lists are faster than NumPy for one lookup at a time
+_HCP = HCP_TABLE.tolist()
+_CONTROLS = CONTROLS_TABLE.tolist()
+_LOSERS = LOSERS_TABLE.tolist()
+_QUICK_TRICKS = QUICK_TRICKS_TABLE.tolist()
+
+_SHIFTS = [SUIT_SIZE * suit for suit in range(4)]
+
+
+class HandEvaluation:
+    __slots__ = ("suit_lengths", "shape", "hcp", "controls", "losers", "quick_tricks")
+
+    def __init__(self, mask: int):
+        """
+        Metrics of the hand with the given card mask
+        """
+        holdings = [(mask >> shift) & SUIT_HOLDING_MASK for shift in _SHIFTS]
+        self.suit_lengths = tuple(holding.bit_count() for holding in holdings)  # indexed by Suit.value
+        self.shape = tuple(sorted(self.suit_lengths, reverse=True))  # longest first, e.g. (4, 4, 3, 2)
+        self.hcp = sum(_HCP[holding] for holding in holdings)
+        self.controls = sum(_CONTROLS[holding] for holding in holdings)
+        self.losers = sum(_LOSERS[holding] for holding in holdings)
+        self.quick_tricks = sum(_QUICK_TRICKS[holding] for holding in holdings)
+
+    def __repr__(self):
+        return (f"HandEvaluation(hcp={self.hcp}, lengths={self.suit_lengths}, losers={self.losers}, "
+                f"controls={self.controls}, quick_tricks={self.quick_tricks})")
+
+
+class BatchEvaluation:
+    def __init__(self, masks: np.ndarray):
+        """
+        Metrics of every hand of a batch of deals, each an array indexed [deal, seat] computed on first use
+        :param masks: (count, 4) uint64 card masks, e.g. from core.dealer.deal_masks_array
+        """
+        shifts = np.array(_SHIFTS, dtype=np.uint64)
+        self.holdings = ((masks[:, :, None] >> shifts) & np.uint64(SUIT_HOLDING_MASK)).astype(np.intp)
+
+    @cached_property
+    def suit_lengths(self) -> np.ndarray:
+        """
+        [deal, seat, Suit.value] suit length
+        """
+        return LENGTH_TABLE[self.holdings]
+
+    @cached_property
+    def shape(self) -> np.ndarray:
+        """
+        [deal, seat, i] length of the i-th longest suit
+        """
+        return -np.sort(-self.suit_lengths, axis=2)
+
+    @cached_property
+    def hcp(self) -> np.ndarray:
+        return HCP_TABLE[self.holdings].sum(axis=2, dtype=np.int16)
+
+    @cached_property
+    def controls(self) -> np.ndarray:
+        return CONTROLS_TABLE[self.holdings].sum(axis=2, dtype=np.int16)
+
+    @cached_property
+    def losers(self) -> np.ndarray:
+        return LOSERS_TABLE[self.holdings].sum(axis=2, dtype=np.int16)
+
+    @cached_property
+    def quick_tricks(self) -> np.ndarray:
+        return QUICK_TRICKS_TABLE[self.holdings].sum(axis=2)
@@ -0,0 +1,180 @@
+from typing import Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from core.bitboard import FULL_DECK, card_index
+from core.board_record import BoardRecord, contract_from_bidding
+from core.deal import Card, PlayerHand
+from core.deal_enums import Direction, Rank, Suit, Vulnerability
+from core.play_utils import evaluate_trick_winner
+
+"""
+Reading and writing hand records in BBO's LIN format.
+
+A LIN record is a sequence of "key|value|" pairs: md (dealer and hands), sv (vulnerability), ah (board name),
+pn (player names), mb (calls), pc (played cards) and mc (claimed tricks); anything else is ignored. A new board starts
+at a qx pair or at a second md. read_lin consumes the pairs as a stream across lines, so both one-board-per-line hand
+viewer files and multi-line vugraph files are read one record at a time in constant memory.
+"""
+
+# LIN lists seats from South clockwise and numbers the dealer the same way starting from 1
+_LIN_SEATS = [Direction.SOUTH, Direction.WEST, Direction.NORTH, Direction.EAST]
+_LIN_SUITS = [Suit.SPADES, Suit.HEARTS, Suit.DIAMONDS, Suit.CLUBS]
+_VULNERABILITY_FROM_LIN = {
+    "o": Vulnerability.NONE, "0": Vulnerability.NONE, "-": Vulnerability.NONE,
+    "n": Vulnerability.NORTH_SOUTH, "e": Vulnerability.EAST_WEST, "b": Vulnerability.BOTH,
+}
+_VULNERABILITY_TO_LIN = {
+    Vulnerability.NONE: "o", Vulnerability.NORTH_SOUTH: "n", Vulnerability.EAST_WEST: "e", Vulnerability.BOTH: "b",
+}
+_CALLS_FROM_LIN = {"P": "PASS", "D": "X", "R": "XX"}
+_CALLS_TO_LIN = {"PASS": "p", "X": "d", "XX": "r"}
+
+
+def hand_from_lin(text: str) -> PlayerHand:
+    """
+    :param text: a hand such as "SAK2HQJ5DT98C7643"
+    """
+    mask = 0
+    suit = None
+    for char in text.upper():
+        if char in "SHDC":
+            suit = Suit.from_str(char)
+        else:
+            mask |= 1 << card_index(suit, Rank.from_str(char))
+    return PlayerHand.from_mask(mask)
+
+
+def hand_to_lin(hand: PlayerHand) -> str:
+    suits = hand.suits
+    return "".join(suit.abbreviation() + "".join(rank.abbreviation() for rank in suits[suit]) for suit in _LIN_SUITS)
+
+
+def _call_from_lin(value: str) -> str:
+    call = value.rstrip("!").upper()
+    call = _CALLS_FROM_LIN.get(call, call)
+    return call + "T" if call.endswith("N") else call
+
+
+def _call_to_lin(call: str) -> str:
+    return _CALLS_TO_LIN.get(call, call[:2])
+
+
+def _lin_pairs(lines: Iterable[str]) -> Iterator[Tuple[str, str]]:
+    pending_key = None
+    for line in lines:
+        tokens = line.strip().split("|")
+        if tokens and tokens[-1] == "":
+            tokens.pop()
+        for token in tokens:
+            if pending_key is None:
+                pending_key = token.strip().lower()
+            else:
+                yield pending_key, token
+                pending_key = None
+
+
+def _declarer_tricks(record: BoardRecord) -> Optional[int]:
+    """
+    Count declarer's tricks from a complete play record
+    """
+    if len(record.play) != 52 or not record.contract or not record.contract.level:
+        return None
+    tricks = 0
+    for start in range(0, 52, 4):
+        trick = [(record.owner(card), card) for card in record.play[start:start + 4]]
+        winner = evaluate_trick_winner(trick, record.contract.suit)
+        winning_direction = next(direction for direction, card in trick if card == winner)
+        tricks += winning_direction.value % 2 == record.contract.declarer.value % 2
+    return tricks
+
+
+def _record_from_lin(pairs: List[Tuple[str, str]], players: List[str]) -> BoardRecord:
+    values = {}
+    bidding, play = [], []
+    for key, value in pairs:
+        if key == "mb":
+            bidding.append(_call_from_lin(value))
+        elif key == "pc":
+            play.append(Card.from_str(value))
+        else:
+            values.setdefault(key, value)
+
+    md = values.get("md", "")
+    dealer = _LIN_SEATS[int(md[0]) - 1] if md[:1].isdigit() else Direction.NORTH
+    hand_texts = md[1:].split(",") if md else []
+    hands = {seat: hand_from_lin(text) for seat, text in zip(_LIN_SEATS, hand_texts)}
+    for seat in _LIN_SEATS:
+        hands.setdefault(seat, PlayerHand.from_mask(0))
+    missing = [seat for seat in _LIN_SEATS if not hands[seat].mask]
+    if len(missing) == 1 and all(len(hand) == 13 for hand in hands.values() if hand.mask):
+        # The fourth hand is usually left out: it holds the remaining cards
+        hands[missing[0]] = PlayerHand.from_mask(FULL_DECK ^ sum(hand.mask for hand in hands.values()))
+
+    board_name = values.get("ah", "")
+    record = BoardRecord(
+        hands,
+        dealer=dealer,
+        vulnerability=_VULNERABILITY_FROM_LIN.get(values.get("sv", "o").lower(), Vulnerability.NONE),
+        board_number=int(board_name.split()[-1]) if board_name.split() and board_name.split()[-1].isdigit() else None,
+    )
+    record.players = {seat: name for seat, name in zip(_LIN_SEATS, players) if name}
+    record.bidding = bidding
+    record.contract = contract_from_bidding(dealer, bidding) if bidding else None
+    record.play = play
+    record.tricks = int(values["mc"]) if values.get("mc", "").isdigit() else _declarer_tricks(record)
+    return record
+
+
+def read_lin(lines: Iterable[str]) -> Iterator[BoardRecord]:
+    """
+    :param lines: lines of a LIN file, e.g. the open file object
+    :return: generator of the boards in the file, one BoardRecord each
+    """
+    pairs: List[Tuple[str, str]] = []
+    players: List[str] = []
+    has_deal = False
+    for key, value in _lin_pairs(lines):
+        if key in ("qx", "pn") or (key == "md" and has_deal):
+            if has_deal:
+                yield _record_from_lin(pairs, players)
+            pairs, has_deal = [], False
+        if key == "pn":
+            # Player names stay in force for the following boards of a vugraph file
+            players = value.split(",")
+            continue
+        has_deal = has_deal or key == "md"
+        pairs.append((key, value))
+    if has_deal:
+        yield _record_from_lin(pairs, players)
+
+
+def format_lin(record: BoardRecord) -> str:
+    """
+    :return: the record as a single LIN line
+    """
+    parts = []
+    if record.players:
+        parts.append(("pn", ",".join(record.players.get(seat, "") for seat in _LIN_SEATS)))
+    dealer = _LIN_SEATS.index(record.dealer) + 1
+    parts.append(("md", f"{dealer}" + ",".join(hand_to_lin(record.hands[seat]) for seat in _LIN_SEATS)))
+    parts.append(("rh", ""))
+    if record.board_number is not None:
+        parts.append(("ah", f"Board {record.board_number}"))
+    parts.append(("sv", _VULNERABILITY_TO_LIN[record.vulnerability]))
+    parts.extend(("mb", _call_to_lin(call)) for call in record.bidding)
+    parts.extend(("pc", str(card)) for card in record.play)
+    if record.tricks is not None and len(record.play) < 52:
+        parts.append(("mc", str(record.tricks)))
+    return "".join(f"{key}|{value}|" for key, value in parts)
+
+
+def write_lin(records: Iterable[BoardRecord], stream: TextIO) -> int:
+    """
+    Write records to an open text stream, one line per board
+    :return: number of records written
+    """
+    count = 0
+    for record in records:
+        stream.write(format_lin(record))
+        stream.write("\n")
+        count += 1
+    return count
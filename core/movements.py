@@ -0,0 +1,253 @@
+import math
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from core.duplicate import imps
+
+"""
+Movements: who plays which boards against whom, at which table, in every round of a duplicate event.
+
+A Movement holds three [round, table] arrays: the North-South pair, the East-West pair (pairs are numbered from 0,
+-1 for nobody: the table sits out) and the board set played there. Board set s is boards s * boards_per_round ..
+(s + 1) * boards_per_round - 1, counted from 0. board_pairs() turns the movement into the [board, slot] pair arrays
+scored by core.duplicate.DuplicateSession, slot being the n-th time the board is played.
+
+    mitchell    NS pairs stay and EW pairs move up a table every round; with an odd number of tables the boards
+                move down a table, with an even number (where they would come back to EW pairs that played them) all
+                tables play the same board set in a round
+    howell      every pair meets every other pair (round-robin by the circle method); all tables play the same board
+                set in a round
+    team Swiss  teams are paired round by round by their score so far, never twice against the same team; a match is
+                two tables playing the same boards with the teams' pairs in opposite seats
+
+A board set shared by several tables in the same round only needs the deals to be dealt once per table, which is
+free here: deals for all the boards are generated up front and kept in a deal archive (core.archive), board b being
+record b.
+"""
+
+
+class Movement:
+    def __init__(self, name: str, ns: np.ndarray, ew: np.ndarray, board_sets: np.ndarray, boards_per_round: int):
+        """
+        :param ns: [round, table] North-South pair, -1 where the table is empty
+        :param ew: [round, table] East-West pair, -1 where the table is empty
+        :param board_sets: [round, table] board set played
+        """
+        self.name = name
+        self.ns = np.asarray(ns, dtype=np.int64)
+        self.ew = np.asarray(ew, dtype=np.int64)
+        self.board_sets = np.asarray(board_sets, dtype=np.int64)
+        self.boards_per_round = boards_per_round
+        self.rounds, self.tables = self.ns.shape
+        self.board_set_count = int(self.board_sets.max(initial=-1)) + 1
+        self.pair_count = int(max(self.ns.max(initial=-1), self.ew.max(initial=-1))) + 1
+
+        # slot[round, table]: how many times the board set was played at earlier cells, in round then table order
+        self.slots = np.zeros(self.ns.shape, dtype=np.int64)
+        seen: Dict[int, int] = {}
+        for round_ in range(self.rounds):
+            for table in range(self.tables):
+                if self.is_played(round_, table):
+                    board_set = int(self.board_sets[round_, table])
+                    self.slots[round_, table] = seen.get(board_set, 0)
+                    seen[board_set] = self.slots[round_, table] + 1
+        self.slot_count = max(seen.values(), default=0)
+
+    @property
+    def boards(self) -> int:
+        return self.board_set_count * self.boards_per_round
+
+    def is_played(self, round_: int, table: int) -> bool:
+        return self.ns[round_, table] >= 0 and self.ew[round_, table] >= 0
+
+    def boards_at(self, round_: int, table: int) -> range:
+        """
+        :return: boards (from 0) played at the table in the round
+        """
+        start = int(self.board_sets[round_, table]) * self.boards_per_round
+        return range(start, start + self.boards_per_round)
+
+    def result_cell(self, round_: int, table: int, board: int) -> Tuple[int, int]:
+        """
+        :return: [board, slot] cell of DuplicateSession holding the result of the board played at the table
+        """
+        if board not in self.boards_at(round_, table):
+            raise ValueError(f"Board {board} is not played at table {table} in round {round_}")
+        return board, int(self.slots[round_, table])
+
+    def board_pairs(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :return: [board, slot] North-South and East-West pairs, for core.duplicate.DuplicateSession
+        """
+        ns = np.full((self.boards, self.slot_count), -1, dtype=np.int64)
+        ew = np.full((self.boards, self.slot_count), -1, dtype=np.int64)
+        rounds, tables = np.nonzero((self.ns >= 0) & (self.ew >= 0))
+        for offset in range(self.boards_per_round):
+            boards = self.board_sets[rounds, tables] * self.boards_per_round + offset
+            ns[boards, self.slots[rounds, tables]] = self.ns[rounds, tables]
+            ew[boards, self.slots[rounds, tables]] = self.ew[rounds, tables]
+        return ns, ew
+
+    def table_ids(self, prefix: str) -> List[str]:
+        """
+        Table ids (and Socket.IO rooms) of the event's tables in rooms.TableManager
+        """
+        return [f"{prefix}-{table + 1}" for table in range(self.tables)]
+
+    def __repr__(self):
+        return (f"Movement({self.name}, {self.tables} tables, {self.rounds} rounds, "
+                f"{self.boards} boards, {self.pair_count} pairs)")
+
+
+def mitchell(tables: int, rounds: Optional[int] = None, boards_per_round: int = 2) -> Movement:
+    """
+    NS pairs 0 .. tables - 1 sit at their table, EW pairs tables .. 2 * tables - 1 start at table pair - tables
+    :param rounds: at most (and by default) one round per table
+    """
+    rounds = tables if rounds is None else rounds
+    if not 0 < rounds <= tables:
+        raise ValueError(f"A Mitchell with {tables} tables has 1 to {tables} rounds")
+    round_index = np.arange(rounds)[:, None]
+    table_index = np.arange(tables)[None, :]
+    ns = np.broadcast_to(table_index, (rounds, tables))
+    ew = tables + (table_index - round_index) % tables
+    if tables % 2:
+        board_sets = (table_index + round_index) % tables
+    else:
+        board_sets = np.broadcast_to(round_index, (rounds, tables))
+    return Movement("Mitchell", ns, ew, board_sets, boards_per_round)
+
+
+def howell(pairs: int, rounds: Optional[int] = None, boards_per_round: int = 2) -> Movement:
+    """
+    Round-robin of all pairs; with an odd number of pairs one of them sits out every round
+    :param rounds: at most (and by default) enough for every pair to meet every other
+    """
+    if pairs < 3:
+        raise ValueError("A Howell needs at least 3 pairs")
+    seats = pairs + pairs % 2  # a phantom pair, pairs - 1 + 1, makes the number even
+    cycle = seats - 1
+    rounds = cycle if rounds is None else rounds
+    if not 0 < rounds <= cycle:
+        raise ValueError(f"A Howell for {pairs} pairs has 1 to {cycle} rounds")
+    tables = seats // 2
+    ns = np.empty((rounds, tables), dtype=np.int64)
+    ew = np.empty((rounds, tables), dtype=np.int64)
+    for round_ in range(rounds):
+        # The last seat is fixed and meets pair round_; the others face each other around the circle
+        matches = [(seats - 1, round_)] + [((round_ + k) % cycle, (round_ - k) % cycle) for k in range(1, tables)]
+        for table, (first, second) in enumerate(matches):
+            if (table + round_) % 2:
+                first, second = second, first  # pairs change direction from round to round
+            ns[round_, table], ew[round_, table] = first, second
+    if pairs % 2:
+        phantom = (ns == seats - 1) | (ew == seats - 1)
+        ns[phantom] = ew[phantom] = -1
+    board_sets = np.broadcast_to(np.arange(rounds)[:, None], (rounds, tables))
+    return Movement("Howell", ns, ew, board_sets, boards_per_round)
+
+
+def team_pairs(team: int) -> Tuple[int, int]:
+    """
+    :return: numbers of the two pairs of a team in a team movement
+    """
+    return 2 * team, 2 * team + 1
+
+
+def team_round(matches: Sequence[Tuple[int, int]], boards_per_round: int) -> Movement:
+    """
+    One round of a team event, every match at two tables playing the same boards
+    :param matches: (home, away) teams of every match, e.g. from swiss_pairings
+    """
+    ns = np.empty((1, 2 * len(matches)), dtype=np.int64)
+    ew = np.empty((1, 2 * len(matches)), dtype=np.int64)
+    for match, (home, away) in enumerate(matches):
+        (home_1, home_2), (away_1, away_2) = team_pairs(home), team_pairs(away)
+        ns[0, 2 * match], ew[0, 2 * match] = home_1, away_1
+        ns[0, 2 * match + 1], ew[0, 2 * match + 1] = away_2, home_2
+    return Movement("Teams", ns, ew, np.zeros(ns.shape, dtype=np.int64), boards_per_round)
+
+
+def match_imps(scores: np.ndarray) -> np.ndarray:
+    """
+    :param scores: [board, table] North-South scores of a team_round
+    :return: IMPs won by the home team of every match
+    """
+    scores = np.asarray(scores)
+    return imps(scores[:, 0::2] - scores[:, 1::2]).sum(axis=0)
+
+
+_GOLDEN = (math.sqrt(5) - 1) / 2
+_MAX_BACKTRACKS = 100_000  # beyond this swiss_pairings gives up avoiding rematches
+
+
+def victory_points(imps_won, boards: int, scale: int = 20) -> np.ndarray:
+    """
+    WBF continuous victory point scale
+    :param imps_won: IMP margins of the home teams (array-like)
+    :return: victory points of the home teams, with two decimals; the away teams get scale - points
+    """
+    margin = np.abs(np.asarray(imps_won, dtype=np.float64))
+    blowout = 15 * math.sqrt(boards)
+    half = scale / 2
+    points = half + half * (1 - _GOLDEN ** (3 * np.minimum(margin, blowout) / blowout)) / (1 - _GOLDEN ** 3)
+    points = np.minimum(np.round(points, 2), scale)
+    return np.where(np.asarray(imps_won) >= 0, points, scale - points)
+
+
+def swiss_pairings(scores: Sequence[float], played: Iterable[FrozenSet[int]] = (),
+                   byes: Iterable[int] = ()) -> Tuple[List[Tuple[int, int]], Optional[int]]:
+    """
+    Pair teams with teams of about the same score that they have not played yet
+    :param scores: score of every team so far
+    :param played: pairs of teams that have already met
+    :param byes: teams that already had a bye
+    :return: (higher, lower) matches in order of score, and the team with the bye (None for an even number of teams)
+    """
+    teams = len(scores)
+    met: List[Set[int]] = [set() for _ in range(teams)]
+    for first, second in played:
+        met[first].add(second)
+        met[second].add(first)
+    order = sorted(range(teams), key=lambda team: (-scores[team], team))
+
+    bye = None
+    if teams % 2:
+        had_bye = set(byes)
+        bye = next((team for team in reversed(order) if team not in had_bye), order[-1])
+        order.remove(bye)
+
+    matches = _pair_in_order(order, met)
+    if matches is None:
+        # Every team has met every possible opponent: rematches are allowed, still by score
+        matches = [(order[index], order[index + 1]) for index in range(0, len(order), 2)]
+    return matches, bye
+
+
+def _pair_in_order(order: List[int], met: List[Set[int]]) -> Optional[List[Tuple[int, int]]]:
+    """
+    Top-down pairing: the best unpaired team gets the closest team below it it has not met, backtracking when a
+    choice leaves the teams further down unpairable. Iterative, so hundreds of teams do not hit the recursion limit
+    :return: the matches, None if there is no pairing without rematches (or it was not found in _MAX_BACKTRACKS steps)
+    """
+    unpaired = list(order)
+    matches: List[Tuple[int, int]] = []
+    choices: List[Tuple[List[int], int]] = []  # (unpaired before the match, index of the opponent taken)
+    start, backtracks = 1, 0
+    while unpaired:
+        first = unpaired[0]
+        opponent = next((index for index in range(start, len(unpaired)) if unpaired[index] not in met[first]), None)
+        if opponent is not None:
+            choices.append((unpaired, opponent))
+            matches.append((first, unpaired[opponent]))
+            unpaired = unpaired[1:opponent] + unpaired[opponent + 1:]
+            start = 1
+            continue
+        backtracks += 1
+        if not choices or backtracks > _MAX_BACKTRACKS:
+            return None
+        unpaired, previous = choices.pop()
+        matches.pop()
+        start = previous + 1
+    return matches
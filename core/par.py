@@ -0,0 +1,179 @@
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from threading import RLock
+from time import monotonic
+from typing import Dict, List, Optional, Tuple
+
+from core.bitboard import DealMasks
+from core.board_record import BridgeContract
+from core.dds import DoubleDummySolver, declarer_tricks
+from core.deal_enums import BiddingSuit, Direction
+from core.play_utils import calculate_score
+
+"""
+Double dummy table and par score of a deal.
+
+The table holds the number of tricks every declarer takes in every strain (5 x 4 cells). The cells are independent
+double dummy solves, so dd_table runs them in parallel in a process pool. Servers solving a table per deal use
+submit_dd_table instead: one job per strain, the four declarers of a strain sharing a solver's transposition table, all
+five stopping at one deadline. A hard deal costs at most five workers for a bounded time, and the table's future can be
+cancelled as a whole.
+
+Par is the result of the deal when both sides bid perfectly knowing the table: a side bids its best contract, the
+opponents sacrifice over it if going down doubled costs them less, and so on until neither side gains by bidding on.
+Every score comes from play_utils.calculate_score.
+"""
+
+DDTable = Dict[BiddingSuit, Dict[Direction, int]]
+
+# Every contract from 1C to 7NT in bidding order
+_CONTRACTS = [(level, strain) for level in range(1, 8) for strain in BiddingSuit]
+
+
+def _solve_cell(deal: DealMasks, strain: BiddingSuit, declarer: Direction) -> int:
+    return declarer_tricks(deal, strain, declarer)
+
+
+def _solve_strain(deal: DealMasks, strain: BiddingSuit, deadline: Optional[float]) -> Dict[Direction, int]:
+    solver = DoubleDummySolver(strain)
+    solver.deadline = deadline
+    return {declarer: declarer_tricks(deal, strain, declarer, solver) for declarer in Direction}
+
+
+def solve_dd_table(deal: DealMasks, time_limit: Optional[float] = None) -> DDTable:
+    """
+    Solve the whole table in the calling process, one solver per strain so the declarers share its transposition table
+    :param time_limit: seconds the table may take, TimeoutError is raised once they run out
+    """
+    deadline = None if time_limit is None else monotonic() + time_limit
+    return {strain: _solve_strain(deal, strain, deadline) for strain in BiddingSuit}
+
+
+class _TableFuture(Future):
+    """
+    Future of a table solved as one job per strain. It is done once every strain job is: a failed or cancelled strain
+    cancels the queued ones (the running ones stop at the shared deadline), so the table holds no worker once it is done
+    """
+
+    def __init__(self, parts: Dict[BiddingSuit, Future]):
+        super().__init__()
+        self._parts = parts
+        self._lock = RLock()
+        for part in parts.values():
+            part.add_done_callback(self._part_done)
+
+    def cancel(self) -> bool:
+        for part in self._parts.values():
+            part.cancel()
+        return self.cancelled()
+
+    def _part_done(self, part: Future) -> None:
+        if part.cancelled() or part.exception() is not None:
+            for sibling in self._parts.values():
+                sibling.cancel()
+        with self._lock:
+            if self.done() or not all(sibling.done() for sibling in self._parts.values()):
+                return
+            errors = [sibling.exception() for sibling in self._parts.values() if not sibling.cancelled()]
+            errors = [error for error in errors if error is not None]
+            if errors:
+                self.set_exception(errors[0])
+            elif any(sibling.cancelled() for sibling in self._parts.values()):
+                super().cancel()
+            else:
+                self.set_result({strain: part.result() for strain, part in self._parts.items()})
+
+
+def submit_dd_table(deal: DealMasks, executor: Executor, time_limit: Optional[float] = None) -> Future:
+    """
+    Submit the table as one job per strain sharing a deadline, so one deal holds at most five workers of the executor
+    :return: future of the table, failing with TimeoutError when it could not be solved within `time_limit` seconds
+    """
+    deadline = None if time_limit is None else monotonic() + time_limit
+    return _TableFuture({strain: executor.submit(_solve_strain, deal, strain, deadline) for strain in BiddingSuit})
+
+
+def dd_table(deal: DealMasks, executor: Optional[Executor] = None) -> DDTable:
+    """
+    :param deal: four card masks indexed by Direction.value
+    :param executor: pool to solve the cells in; a process pool over all cores is created when not given
+    :return: tricks taken by each declarer in each strain
+    """
+    if executor is None:
+        with ProcessPoolExecutor() as pool:
+            return dd_table(deal, pool)
+    futures = {
+        (strain, declarer): executor.submit(_solve_cell, deal, strain, declarer)
+        for strain in BiddingSuit
+        for declarer in Direction
+    }
+    table = {strain: {} for strain in BiddingSuit}
+    for (strain, declarer), future in futures.items():
+        table[strain][declarer] = future.result()
+    return table
+
+
+def par_contract(table: DDTable, vulnerable_ns: bool, vulnerable_ew: bool,
+                 dealer: Direction = Direction.NORTH) -> Tuple[BridgeContract, int]:
+    """
+    :param table: double dummy table of the deal
+    :param dealer: decides which side bids first when both sides could declare the same contract
+    :return: par contract (doubled when it goes down) and its score from North-South's point of view
+    """
+    sides = [(Direction.NORTH, Direction.SOUTH), (Direction.EAST, Direction.WEST)]
+    vulnerable = [vulnerable_ns, vulnerable_ew]
+
+    # Best declarer of each side in each strain and the score of every contract for that side
+    declarers = [{}, {}]
+    scores: List[List[int]] = [[], []]
+    for side, seats in enumerate(sides):
+        for strain in BiddingSuit:
+            first, second = sorted(seats, key=lambda seat: (seat.value - dealer.value) % 4)
+            declarers[side][strain] = second if table[strain][second] > table[strain][first] else first
+        for level, strain in _CONTRACTS:
+            tricks = table[strain][declarers[side][strain]]
+            doubled = 0 if tricks >= level + 6 else 1
+            scores[side].append(calculate_score(level, strain, doubled, tricks, vulnerable[side]))
+
+    # outcome[side][j]: score of `side` when it holds contract j and both sides keep bidding perfectly.
+    # overbid[side][j]: the contract the opponents bid over j, or None when they let it stand
+    count = len(_CONTRACTS)
+    outcome = [[0] * count, [0] * count]
+    overbid: List[List[Optional[int]]] = [[None] * count, [None] * count]
+    best_overbid = [None, None]  # per side: the best contract above j for that side to bid
+    for j in reversed(range(count)):
+        for side in (0, 1):
+            outcome[side][j] = scores[side][j]
+            opponent_bid = best_overbid[1 - side]
+            if opponent_bid is not None and -outcome[1 - side][opponent_bid] < outcome[side][j]:
+                outcome[side][j] = -outcome[1 - side][opponent_bid]
+                overbid[side][j] = opponent_bid
+        for side in (0, 1):
+            if best_overbid[side] is None or outcome[side][j] >= outcome[side][best_overbid[side]]:
+                best_overbid[side] = j
+
+    first_side = dealer.value % 2
+    second_side = 1 - first_side
+    second_value = max(outcome[second_side][best_overbid[second_side]], 0)
+    if outcome[first_side][best_overbid[first_side]] >= -second_value:
+        side = first_side
+    elif second_value > 0:
+        side = second_side
+    else:
+        return BridgeContract.empty_contract(), 0
+
+    contract = best_overbid[side]
+    while overbid[side][contract] is not None:
+        contract = overbid[side][contract]
+        side = 1 - side
+
+    level, strain = _CONTRACTS[contract]
+    declarer = declarers[side][strain]
+    tricks = table[strain][declarer]
+    doubled = 0 if tricks >= level + 6 else 1
+    score = scores[side][contract]
+    return BridgeContract(level, strain, doubled, declarer), score if side == 0 else -score
+
+
+def par(deal: DealMasks, vulnerable_ns: bool, vulnerable_ew: bool, dealer: Direction = Direction.NORTH,
+        executor: Optional[Executor] = None) -> Tuple[BridgeContract, int]:
+    return par_contract(dd_table(deal, executor), vulnerable_ns, vulnerable_ew, dealer)
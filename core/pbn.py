@@ -0,0 +1,249 @@
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO
+
+from core.bitboard import card_index, mask_from_indices
+from core.board_record import BoardRecord, BridgeContract, contract_from_bidding
+from core.deal import Card, PlayerHand
+from core.deal_enums import BiddingSuit, Direction, Rank, Suit, Vulnerability
+from core.play_utils import evaluate_trick_winner
+
+"""
+Reading and writing hand records in PBN (Portable Bridge Notation).
+
+Both directions stream: read_pbn takes any iterable of lines (an open file) and yields one BoardRecord per game as
+soon as its closing blank line is read, write_pbn writes records one at a time. Memory use does not depend on the
+size of the file.
+
+Supported: the tags of the export format (Board, Dealer, Vulnerable, Deal, Declarer, Contract, Result, player names,
+any other tag is kept in BoardRecord.tags), the Auction section with notes, NAGs and "AP", the Play section, the "#"
+shorthand for a value repeated from the previous game, and % / ; / { } comments, also after the calls and cards of a section line.
+"""
+
+_TAG = re.compile(r'\[(\w+)\s+"(.*)"\]')
+_COMMENT = re.compile(r'\{[^}]*(?:\}|$)|;[^\n]*')
+_PBN_SUITS = [Suit.SPADES, Suit.HEARTS, Suit.DIAMONDS, Suit.CLUBS]
+_PLAYER_TAGS = {"North": Direction.NORTH, "East": Direction.EAST, "South": Direction.SOUTH, "West": Direction.WEST}
+_VULNERABILITY_FROM_PBN = {
+    "NONE": Vulnerability.NONE, "LOVE": Vulnerability.NONE, "-": Vulnerability.NONE,
+    "NS": Vulnerability.NORTH_SOUTH, "EW": Vulnerability.EAST_WEST,
+    "ALL": Vulnerability.BOTH, "BOTH": Vulnerability.BOTH,
+}
+_VULNERABILITY_TO_PBN = {
+    Vulnerability.NONE: "None", Vulnerability.NORTH_SOUTH: "NS", Vulnerability.EAST_WEST: "EW", Vulnerability.BOTH: "All",
+}
+# Tags written before the ones BoardRecord models, in the order of the PBN export format
+_LEADING_TAGS = ["Event", "Site", "Date"]
+_MODELLED_TAGS = {"Board", "Dealer", "Vulnerable", "Deal", "Declarer", "Contract", "Result", "Auction", "Play",
+                  *_PLAYER_TAGS}
+
+
+def hand_from_pbn(text: str) -> PlayerHand:
+    """
+    :param text: holdings in spades, hearts, diamonds, clubs order separated by dots, e.g. "AK2.QJ5.T98.7643"
+    """
+    if text == "-":
+        return PlayerHand.from_mask(0)
+    return PlayerHand.from_mask(mask_from_indices(
+        card_index(suit, Rank.from_str(rank))
+        for suit, holding in zip(_PBN_SUITS, text.split("."))
+        for rank in holding
+    ))
+
+
+def hand_to_pbn(hand: PlayerHand) -> str:
+    suits = hand.suits
+    return ".".join("".join(rank.abbreviation() for rank in suits[suit]) for suit in _PBN_SUITS)
+
+
+def _call_from_pbn(token: str) -> str:
+    call = token.upper()
+    if call == "PASS":
+        return "PASS"
+    if call.endswith("N"):
+        call += "T"
+    return call
+
+
+def _contract_from_pbn(text: str, declarer: Optional[str]) -> BridgeContract:
+    if text.upper() == "PASS":
+        return BridgeContract.empty_contract()
+    strain = text[1:].upper().rstrip("X")
+    return BridgeContract(int(text[0]), BiddingSuit.from_str(strain), text.upper().count("X"),
+                          Direction.from_str(declarer) if declarer else None)
+
+
+def _contract_to_pbn(contract: BridgeContract) -> str:
+    if contract.level == 0:
+        return "Pass"
+    return f"{contract.level}{contract.suit.abbreviation()}{'X' * contract.doubled}"
+
+
+def _section_tokens(lines: List[str]) -> Iterator[str]:
+    """
+    Tokens of an Auction or Play section without comments, notes, NAGs and suffix annotations; stops at "*"
+    """
+    # A { } comment may start after the calls of a line and end on a later one
+    for token in _COMMENT.sub(" ", "\n".join(lines)).split():
+        if token == "*":
+            return
+        if token.startswith("=") or token.startswith("$"):
+            continue
+        yield token.rstrip("!?")
+
+
+def _auction_over(bidding: List[str]) -> bool:
+    if any(call not in ("PASS", "X", "XX") for call in bidding):
+        return bidding[-3:] == ["PASS"] * 3
+    return len(bidding) >= 4
+
+
+def _auction_from_pbn(tokens: Iterator[str]) -> List[str]:
+    bidding = []
+    for token in tokens:
+        if token == "-":
+            continue
+        if token.upper() == "AP":  # all pass
+            while not _auction_over(bidding):
+                bidding.append("PASS")
+            continue
+        bidding.append(_call_from_pbn(token))
+    return bidding
+
+
+def _play_from_pbn(tokens: Iterator[str], first_leader: Direction, trump: Optional[BiddingSuit]) -> List[Card]:
+    """
+    In PBN every line of the Play section is a trick with the cards in a fixed seat order starting from the opening
+    leader; this puts them back into the order they were played
+    """
+    play = []
+    tokens = list(tokens)
+    leader = first_leader
+    for start in range(0, len(tokens), 4):
+        columns = tokens[start:start + 4]
+        trick = []
+        for offset in range(4):
+            seat = leader.offset(offset)
+            column = (seat.value - first_leader.value) % 4
+            if column < len(columns) and columns[column] != "-":
+                trick.append((seat, Card.from_str(columns[column])))
+        play.extend(card for _, card in trick)
+        if len(trick) < 4 or trump is None:
+            break
+        winner = evaluate_trick_winner(trick, trump)
+        leader = next(seat for seat, card in trick if card == winner)
+    return play
+
+
+def _record_from_pbn(tags: Dict[str, str], sections: Dict[str, List[str]]) -> BoardRecord:
+    deal = tags.get("Deal", "N:- - - -")
+    first_seat = Direction.from_str(deal[0])
+    hands = {first_seat.offset(offset): hand_from_pbn(text) for offset, text in enumerate(deal[2:].split())}
+    record = BoardRecord(
+        hands,
+        dealer=Direction.from_str(tags["Dealer"]) if tags.get("Dealer") else Direction.NORTH,
+        vulnerability=_VULNERABILITY_FROM_PBN[tags.get("Vulnerable", "None").upper()],
+        board_number=int(tags["Board"]) if tags.get("Board", "").isdigit() else None,
+    )
+    record.players = {direction: tags[name] for name, direction in _PLAYER_TAGS.items() if tags.get(name)}
+    record.bidding = _auction_from_pbn(_section_tokens(sections.get("Auction", [])))
+    if tags.get("Contract"):
+        record.contract = _contract_from_pbn(tags["Contract"], tags.get("Declarer"))
+    elif record.bidding:
+        record.contract = contract_from_bidding(record.dealer, record.bidding)
+    if tags.get("Result", "").isdigit():
+        record.tricks = int(tags["Result"])
+    if tags.get("Play") and tags["Play"] != "-":
+        trump = record.contract.suit if record.contract and record.contract.level else None
+        record.play = _play_from_pbn(_section_tokens(sections.get("Play", [])), Direction.from_str(tags["Play"]), trump)
+    record.tags = {name: value for name, value in tags.items() if name not in _MODELLED_TAGS}
+    return record
+
+
+def read_pbn(lines: Iterable[str]) -> Iterator[BoardRecord]:
+    """
+    :param lines: lines of a PBN file, e.g. the open file object
+    :return: generator of the games in the file, one BoardRecord each
+    """
+    tags: Dict[str, str] = {}
+    previous_tags: Dict[str, str] = {}
+    sections: Dict[str, List[str]] = {}
+    section = None
+    in_comment = False
+    for line in lines:
+        line = line.strip()
+        if in_comment:
+            in_comment = "}" not in line
+            continue
+        if not line:
+            if tags:
+                yield _record_from_pbn(tags, sections)
+                previous_tags, tags, sections, section = tags, {}, {}, None
+            continue
+        if line.startswith("%") or line.startswith(";"):
+            continue
+        if line.startswith("{"):
+            in_comment = "}" not in line
+            continue
+        match = _TAG.match(line)
+        if match:
+            name, value = match.groups()
+            tags[name] = previous_tags.get(name, "") if value == "#" else value
+            section = name if name in ("Auction", "Play") else None
+            if section:
+                sections[section] = []
+        elif section:
+            sections[section].append(line)
+    if tags:
+        yield _record_from_pbn(tags, sections)
+
+
+def format_pbn(record: BoardRecord) -> str:
+    """
+    :return: the record as one PBN game, without the separating blank line
+    """
+    lines = [f'[{name} "{record.tags[name]}"]' for name in _LEADING_TAGS if name in record.tags]
+    if record.board_number is not None:
+        lines.append(f'[Board "{record.board_number}"]')
+    for name, direction in sorted(_PLAYER_TAGS.items(), key=lambda item: (item[1].value + 1) % 4):
+        if direction in record.players:
+            lines.append(f'[{name} "{record.players[direction]}"]')
+    lines.append(f'[Dealer "{record.dealer.abbreviation()}"]')
+    lines.append(f'[Vulnerable "{_VULNERABILITY_TO_PBN[record.vulnerability]}"]')
+    hands = " ".join(hand_to_pbn(record.hands[direction]) for direction in Direction)
+    lines.append(f'[Deal "N:{hands}"]')
+    if record.contract is not None:
+        declarer = record.contract.declarer.abbreviation() if record.contract.declarer is not None else ""
+        lines.append(f'[Declarer "{declarer}"]')
+        lines.append(f'[Contract "{_contract_to_pbn(record.contract)}"]')
+    if record.tricks is not None:
+        lines.append(f'[Result "{record.tricks}"]')
+    lines.extend(f'[{name} "{value}"]' for name, value in record.tags.items() if name not in _LEADING_TAGS)
+
+    if record.bidding:
+        lines.append(f'[Auction "{record.dealer.abbreviation()}"]')
+        calls = ["Pass" if call == "PASS" else call for call in record.bidding]
+        lines.extend(" ".join(calls[start:start + 4]) for start in range(0, len(calls), 4))
+    if record.play:
+        first_leader = record.owner(record.play[0])
+        lines.append(f'[Play "{first_leader.abbreviation()}"]')
+        for start in range(0, len(record.play), 4):
+            columns = ["-"] * 4
+            for card in record.play[start:start + 4]:
+                columns[(record.owner(card).value - first_leader.value) % 4] = str(card)
+            lines.append(" ".join(columns))
+        lines.append("*")
+    return "\n".join(lines)
+
+
+def write_pbn(records: Iterable[BoardRecord], stream: TextIO) -> int:
+    """
+    Write records to an open text stream as they arrive
+    :return: number of records written
+    """
+    stream.write("% PBN 2.1\n% EXPORT\n\n")
+    count = 0
+    for record in records:
+        stream.write(format_pbn(record))
+        stream.write("\n\n")
+        count += 1
+    return count
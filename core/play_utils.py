@@ -147,6 +147,52 @@ _SUBSEQUENT_UNDERTRICK_VALUE = {
 }
 
 
+def _undertrick_penalty(undertricks: int, vulnerable: bool, doubled: int) -> int:
+    penalty = 0
+    for i in range(undertricks):
+        if i == 0:
+            score_dict = _FIRST_UNDERTRICK_VALUE
+        elif i < 3:
+            score_dict = _SECOND_THIRD_UNDERTRICK_VALUE
+        else:
+            score_dict = _SUBSEQUENT_UNDERTRICK_VALUE
+        penalty += score_dict[(vulnerable, doubled)]
+    return penalty
+
+
+# (vulnerable, doubled) -> penalty for going down 0..13 tricks
+_UNDERTRICK_PENALTY = {
+    (vulnerable, doubled): tuple(_undertrick_penalty(undertricks, vulnerable, doubled) for undertricks in range(14))
+    for vulnerable in (False, True)
+    for doubled in (0, 1, 2)
+}
+
+
+def _compute_score(level: int, suit: BiddingSuit, doubled: int, tricks: int, vulnerable: bool) -> int:
+    scoring_tricks = tricks - 6
+    if scoring_tricks >= level:
+        double_multiplier = pow(2, doubled)
+        first_trick_score = _FIRST_TRICK_VALUE[suit] * double_multiplier
+        subsequent_tricks_score = _TRICK_VALUE[suit] * double_multiplier * (level - 1)
+        bonus = _calculate_bonus(
+            level, suit, doubled, vulnerable, first_trick_score + subsequent_tricks_score, scoring_tricks - level
+        )
+        return first_trick_score + subsequent_tricks_score + bonus
+    return -_UNDERTRICK_PENALTY[(vulnerable, doubled)][level + 6 - tricks]
+
+
+# (level, suit, doubled, vulnerable) -> declarer's score for taking 0..13 tricks
+_SCORE_TABLE = {
+    (level, suit, doubled, vulnerable): tuple(
+        _compute_score(level, suit, doubled, tricks, vulnerable) for tricks in range(14)
+    )
+    for level in range(1, 8)
+    for suit in BiddingSuit
+    for doubled in (0, 1, 2)
+    for vulnerable in (False, True)
+}
+
+
 def calculate_score(level: int, suit: Optional[BiddingSuit], doubled: int, tricks: int, vulnerable: bool) -> int:
     """
     :param level: contract level (4 in 4S)
@@ -159,30 +205,10 @@ def calculate_score(level: int, suit: Optional[BiddingSuit], doubled: int, trick
 
     if level == 0:  # Pass Out
         return 0
-    scoring_tricks = tricks - 6
-    if scoring_tricks >= level:
-        double_multiplier = pow(2, doubled)
-        first_trick_score = _FIRST_TRICK_VALUE[suit] * double_multiplier
-        subsequent_tricks_score = _TRICK_VALUE[suit] * double_multiplier * (level - 1)
-        bonus = _calculate_bonus(
-            level, suit, doubled, vulnerable, first_trick_score + subsequent_tricks_score, scoring_tricks - level
-        )
-        print(f'First trick: {first_trick_score}, subsequent tricks_log: {subsequent_tricks_score}, bonus: {bonus}')
-        return first_trick_score + subsequent_tricks_score + bonus
-    else:
-        undertricks = level + 6 - tricks
-        score_key = (vulnerable, doubled)
-        score = 0
-        for i in range(0, undertricks):
-            score_dict = (
-                _FIRST_UNDERTRICK_VALUE
-                if i == 0
-                else _SECOND_THIRD_UNDERTRICK_VALUE
-                if 0 < i < 3
-                else _SUBSEQUENT_UNDERTRICK_VALUE
-            )
-            score -= score_dict[score_key]
-        return score
+    scores = _SCORE_TABLE.get((level, suit, doubled, bool(vulnerable)))
+    if scores is None or not 0 <= tricks <= 13:
+        raise ValueError(f"Invalid contract result: level {level}, suit {suit}, doubled {doubled}, tricks {tricks}")
+    return scores[tricks]
 
 
 class TeamScore:
@@ -250,20 +276,7 @@ class TeamScore:
             return 'Continue game'
         else:
             undertricks = level + 6 - tricks
-            score_key = (self.vulnerable, doubled)
-            score = 0
-
-            for i in range(undertricks):
-                if i == 0:
-                    score_dict = _FIRST_UNDERTRICK_VALUE
-                elif i < 3:
-                    score_dict = _SECOND_THIRD_UNDERTRICK_VALUE
-                else:
-                    score_dict = _SUBSEQUENT_UNDERTRICK_VALUE
-
-                score += score_dict[score_key]
-
-            self.penalty_points -= score
+            self.penalty_points -= _UNDERTRICK_PENALTY[(self.vulnerable, doubled)][undertricks]
             return 'Continue game'
 
 
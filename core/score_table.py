@@ -0,0 +1,60 @@
+import numpy as np
+
+from core.deal_enums import BiddingSuit
+from core.play_utils import calculate_score
+
+"""
+Contract scores as a NumPy lookup table, for scoring many results at once.
+
+SCORE_TABLE[level, strain, doubled, tricks, vulnerable] is the declarer's score from play_utils.calculate_score, with
+level 0 standing for a passed-out board, strain being BiddingSuit.value[0] (clubs 0 .. no trump 4) and vulnerable
+0 or 1. score_batch indexes it with whole arrays, so scoring millions of results is a single vectorized lookup.
+"""
+
+STRAIN_CODES = {strain: strain.value[0] for strain in BiddingSuit}
+
+
+def _build_score_table() -> np.ndarray:
+    table = np.zeros((8, len(BiddingSuit), 3, 14, 2), dtype=np.int32)
+    for level in range(1, 8):
+        for strain in BiddingSuit:
+            for doubled in range(3):
+                for tricks in range(14):
+                    for vulnerable in (False, True):
+                        table[level, STRAIN_CODES[strain], doubled, tricks, int(vulnerable)] = calculate_score(
+                            level, strain, doubled, tricks, vulnerable
+                        )
+    table.setflags(write=False)
+    return table
+
+
+SCORE_TABLE = _build_score_table()
+
+
+def strain_codes(strains) -> np.ndarray:
+    """
+    :param strains: iterable of BiddingSuit
+    :return: their codes as used by SCORE_TABLE
+    """
+    return np.fromiter((STRAIN_CODES[strain] for strain in strains), dtype=np.int8)
+
+
+def score_batch(levels, strains, doubled, tricks, vulnerable) -> np.ndarray:
+    """
+    Score many results in one call. All arguments are array-likes broadcast against each other
+    :param levels: contract levels 0..7 (0 = passed out)
+    :param strains: strain codes 0..4, see strain_codes
+    :param doubled: 0=undoubled, 1=doubled, 2=redoubled
+    :param tricks: tricks taken by declarer, 0..13
+    :param vulnerable: vulnerability of declarer (bool or 0/1)
+    :return: declarer's scores as an int32 array of the broadcast shape
+    """
+    indices = []
+    for name, values, size in zip(("levels", "strains", "doubled", "tricks", "vulnerable"),
+                                  (levels, strains, doubled, tricks, vulnerable), SCORE_TABLE.shape):
+        codes = np.asarray(values, dtype=np.intp)
+        # Negative codes would silently wrap around in the lookup
+        if ((codes < 0) | (codes >= size)).any():
+            raise ValueError(f"{name} must be in 0..{size - 1}")
+        indices.append(codes)
+    return SCORE_TABLE[tuple(indices)]
@@ -0,0 +1,56 @@
+from random import Random
+
+from core.deal_enums import GameStatus
+from game_logic import Game
+
+"""
+Games driven by seeded random legal actions, shared by the tests of the game engine, its log and its storage.
+"""
+
+
+def act(game: Game, rng: Random) -> None:
+    """
+    Take the next action of the game: deal, a call (a pass or the cheapest bid, so that contracts can make and
+    rubbers end), a legal card, or the next deal once the score is shown
+    """
+    status = game.game_status
+    if status == GameStatus.DEAL_CARDS:
+        game.deal_cards()
+    elif status == GameStatus.AUCTION:
+        game.bid(rng.choice(game.get_legal_bids()[:2]))
+    elif status == GameStatus.PLAY:
+        game.play_card(rng.choice(game.get_legal_cards_to_play()))
+    elif status == GameStatus.DISPLAY_SCORE:
+        game.prepare_new_deal()
+
+
+def play(game: Game, rng: Random, actions: int) -> None:
+    """
+    Take up to `actions` actions, fewer when the rubber ends
+    """
+    for _ in range(actions):
+        if game.game_status == GameStatus.GAME_OVER:
+            return
+        act(game, rng)
+
+
+def play_rubber(game: Game, rng: Random) -> Game:
+    while game.game_status != GameStatus.GAME_OVER:
+        act(game, rng)
+    return game
+
+
+def play_until(game: Game, rng: Random, status: GameStatus) -> None:
+    """
+    Act until the game reaches `status`
+    """
+    while game.game_status != status:
+        act(game, rng)
+
+
+def assert_same_game(rebuilt: Game, game: Game) -> None:
+    assert rebuilt.version == game.version
+    assert rebuilt.deltas == game.deltas
+    assert rebuilt.game_status == game.game_status
+    assert str(rebuilt.get_current_scores()) == str(game.get_current_scores())
+    assert rebuilt.get_dealt_hands() == game.get_dealt_hands()
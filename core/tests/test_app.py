@@ -0,0 +1,21 @@
+from app import app
+
+
+def test_state_does_not_deal():
+    client = app.test_client()
+    client.post('/table/state-read/close')
+    assert client.get('/table/state-read/state').status_code == 404
+
+    client.get('/table/state-read')  # opening the table deals
+    client.post('/table/state-read/bid', data={'bid': 'PASS'})
+    for _ in range(3):
+        client.post('/table/state-read/bid', data={'bid': 'PASS'})
+    # passed out: the table waits for the next deal
+    response = client.get('/table/state-read/state')
+    state = response.get_json()
+    assert state['status'] == 'DEAL_CARDS'
+    assert state['hands'] is None and state['turn'] is None and state['legal_bids'] == []
+
+    again = client.get('/table/state-read/state', headers={'If-None-Match': response.headers['ETag']})
+    assert again.status_code == 304
+    assert client.get('/table/state-read/state').get_json() == state
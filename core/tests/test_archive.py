@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from core.archive import DealArchive, pack_seats, unpack_seats, write_archive
+from core.dealer import deal_masks, generate_deals, iter_deal_chunks
+from core.deal_enums import Direction, Vulnerability
+
+
+def test_pack_round_trip():
+    deals = generate_deals(200, seed=1)
+    packed = pack_seats(deals)
+    assert packed.shape == (200, 13)
+    assert (unpack_seats(packed) == deals).all()
+
+
+def test_archive_random_access(tmp_path):
+    path = str(tmp_path / "deals.bda")
+    assert write_archive(path, iter_deal_chunks(300, seed=2)) == 300
+    assert (tmp_path / "deals.bda").stat().st_size == 8 + 300 * 14
+
+    deals = generate_deals(300, seed=2)
+    archive = DealArchive(path)
+    assert len(archive) == 300
+    deal, dealer, vulnerability = archive[16]
+    assert deal == deal_masks(deals[16])
+    # The 17th board has the same dealer and vulnerability as board 1
+    assert (dealer, vulnerability) == (Direction.NORTH, Vulnerability.NONE)
+    assert archive[5][1:] == (Direction.EAST, Vulnerability.EAST_WEST)
+    assert (archive.seats(100, 150) == deals[100:150]).all()
+
+
+def test_empty_archive(tmp_path):
+    path = str(tmp_path / "empty.bda")
+    write_archive(path, [])
+    assert len(DealArchive(path)) == 0
+
+
+def test_not_an_archive(tmp_path):
+    path = tmp_path / "deals.npy"
+    np.save(path, generate_deals(3, seed=0))
+    with pytest.raises(ValueError):
+        DealArchive(str(path))
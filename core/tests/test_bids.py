@@ -0,0 +1,70 @@
+import pytest
+
+from core.bids import BID_CODES, DOUBLE_CODE, LEGAL_BIDS, PASS_CODE, REDOUBLE_CODE, BiddingState, bid_code, \
+    bids_from_mask
+
+NS, EW = 0, 1
+
+
+def bid_sequence(state: BiddingState, calls, first_side=NS):
+    side = first_side
+    for call in calls:
+        state.apply(bid_code(call), side)
+        side = 1 - side
+    return side
+
+
+def test_codes_follow_legal_bids():
+    assert [BID_CODES[bid] for bid in LEGAL_BIDS] == list(range(38))
+    assert (PASS_CODE, DOUBLE_CODE, REDOUBLE_CODE) == (0, 36, 37)
+    assert bid_code("1nt") == BID_CODES["1NT"]
+    with pytest.raises(ValueError):
+        bid_code("8C")
+
+
+def test_opening_bids():
+    state = BiddingState()
+    for side in (NS, EW):
+        assert bids_from_mask(state.legal_mask(side)) == LEGAL_BIDS[:DOUBLE_CODE]
+
+
+def test_only_higher_contract_bids_after_a_bid():
+    state = BiddingState()
+    bid_sequence(state, ["PASS", "2H"])
+    legal = bids_from_mask(state.legal_mask(NS))
+    assert legal[:3] == ["PASS", "2S", "2NT"]
+    assert "2H" not in legal and "1NT" not in legal
+    assert legal[-1] == "X"
+    # The side that bid it can raise but not double
+    assert bids_from_mask(state.legal_mask(EW))[-1] == "7NT"
+
+
+def test_double_and_redouble():
+    state = BiddingState()
+    bid_sequence(state, ["1S", "X"])
+    assert state.is_legal(REDOUBLE_CODE, NS)
+    assert not state.is_legal(REDOUBLE_CODE, EW)
+    assert not state.is_legal(DOUBLE_CODE, EW)
+
+    # Passes keep the double in force, the declaring side may still redouble in the balancing seat
+    bid_sequence(state, ["PASS", "PASS"])
+    assert state.is_legal(REDOUBLE_CODE, NS)
+    state.apply(REDOUBLE_CODE, NS)
+    assert state.doubled == 2
+    assert not state.is_legal(DOUBLE_CODE, EW) and not state.is_legal(REDOUBLE_CODE, NS)
+
+
+def test_redouble_needs_a_double():
+    state = BiddingState()
+    bid_sequence(state, ["1C"])
+    assert not state.is_legal(REDOUBLE_CODE, NS)
+    with pytest.raises(ValueError):
+        state.apply(REDOUBLE_CODE, NS)
+
+
+def test_new_bid_clears_double():
+    state = BiddingState()
+    bid_sequence(state, ["1C", "X", "1H"])
+    assert (state.contract_code, state.declaring_side, state.doubled) == (BID_CODES["1H"], NS, 0)
+    assert state.is_legal(DOUBLE_CODE, EW)
+    assert not state.is_legal(BID_CODES["1D"], EW)
@@ -0,0 +1,61 @@
+import pytest
+
+from core import Card, PlayerHand, Rank, Suit
+from core.bitboard import (FULL_DECK, card_index, deal_masks_valid, iter_indices, legal_mask, mask_from_indices,
+                           suit_holding, suit_length)
+
+
+def hand(spades: str, hearts: str, diamonds: str, clubs: str) -> PlayerHand:
+    return PlayerHand.from_string_lists(list(spades), list(hearts), list(diamonds), list(clubs))
+
+
+def test_card_index_bounds():
+    assert card_index(Suit.CLUBS, Rank.TWO) == 0
+    assert card_index(Suit.SPADES, Rank.ACE) == 51
+    assert Card.from_index(51) == Card.from_str("SA")
+
+
+def test_suit_holding_and_length():
+    player_hand = hand("AKQ", "JT98", "765", "432")
+    assert suit_holding(player_hand.mask, Suit.SPADES) == 0b1110000000000
+    assert suit_length(player_hand.mask, Suit.HEARTS) == 4
+    assert suit_length(player_hand.mask, Suit.CLUBS) == 3
+
+
+def test_hand_cards_view_matches_constructor():
+    player_hand = hand("AKQ", "JT98", "765", "432")
+    assert [str(card) for card in player_hand.cards] == [
+        "SA", "SK", "SQ", "HJ", "HT", "H9", "H8", "C4", "C3", "C2", "D7", "D6", "D5"
+    ]
+    assert player_hand.suits[Suit.HEARTS] == [Rank.JACK, Rank.TEN, Rank.NINE, Rank.EIGHT]
+    assert PlayerHand.from_cards(player_hand.cards) == player_hand
+
+
+def test_remove_and_contains():
+    player_hand = hand("AKQ", "JT98", "765", "432")
+    card = Card.from_str("SK")
+    assert card in player_hand
+    player_hand.remove(card)
+    assert card not in player_hand
+    assert len(player_hand) == 12
+    with pytest.raises(ValueError):
+        player_hand.remove(card)
+
+
+def test_legal_cards_follow_suit():
+    player_hand = hand("AKQ", "JT98", "765", "432")
+    assert [str(card) for card in player_hand.legal_cards(Suit.DIAMONDS)] == ["D7", "D6", "D5"]
+    assert len(player_hand.legal_cards(None)) == 13
+
+
+def test_legal_cards_void_in_led_suit():
+    player_hand = hand("AKQJT", "98765", "432", "")
+    assert player_hand.contains_suit(Suit.CLUBS) is False
+    assert legal_mask(player_hand.mask, Suit.CLUBS) == player_hand.mask
+
+
+def test_deal_masks_valid():
+    deal = tuple(mask_from_indices(range(start, 52, 4)) for start in range(4))
+    assert deal_masks_valid(deal)
+    assert sorted(index for mask in deal for index in iter_indices(mask)) == list(range(52))
+    assert not deal_masks_valid((FULL_DECK, 0, 0, 0))
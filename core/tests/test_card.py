@@ -0,0 +1,39 @@
+import copy
+import pickle
+
+import pytest
+
+from core import Card, Rank, Suit
+
+
+def test_cards_are_interned():
+    card = Card.from_str("SA")
+    assert Card(Suit.SPADES, Rank.ACE) is card
+    assert Card.from_index(51) is card
+    assert Card.from_str("sa") is card
+    assert Card.from_str("H10") is Card.from_str("HT")
+
+
+def test_card_is_immutable():
+    card = Card.from_str("D7")
+    with pytest.raises(AttributeError):
+        card.rank = Rank.ACE
+    assert not hasattr(card, "__dict__")
+    assert card.image_path == "assets/PNG-cards/D7.png"
+
+
+def test_card_copy_and_pickle_keep_identity():
+    card = Card.from_str("C2")
+    assert copy.copy(card) is card
+    assert copy.deepcopy(card) is card
+    assert pickle.loads(pickle.dumps(card)) is card
+
+
+def test_card_ordering():
+    assert Card.from_str("C2") < Card.from_str("CA") < Card.from_str("D2") < Card.from_str("S2")
+    assert sorted(Card.from_index(index) for index in (51, 0, 13)) == [Card.from_index(index) for index in (0, 13, 51)]
+
+
+def test_unknown_card_string():
+    with pytest.raises(KeyError):
+        Card.from_str("X9")
@@ -0,0 +1,133 @@
+import asyncio
+from typing import Tuple
+
+import socketio
+
+from cluster import BusManager, LocalBus, Router, merge_metrics, shard_of
+from spectators import spectator_room
+
+
+def test_shard_of_is_stable():
+    # crc32 of the id: the same shard in every process and after restarts
+    assert [shard_of(table_id, 4) for table_id in ['main', 'stol2', 'a', 'b']] == [0, 3, 3, 1]
+    assert all(shard_of('main', 1) == 0 for _ in range(3))
+    assert {shard_of(f"table{n}", 3) for n in range(30)} == {0, 1, 2}
+
+
+async def _route(router: Router, request: bytes) -> Tuple[int, bytes]:
+    """
+    Send a request through the router to local workers recording what they receive
+    :return: index of the worker that got the request and the request head as it received it
+    """
+    received = {}
+
+    async def worker(index, reader, writer):
+        received[index] = await reader.readuntil(b'\r\n\r\n')
+        writer.close()
+
+    servers = [await asyncio.start_server(lambda r, w, index=index: worker(index, r, w), '127.0.0.1', 0)
+               for index in range(len(router.workers))]
+    router.workers = [('127.0.0.1', server.sockets[0].getsockname()[1]) for server in servers]
+    proxy = await router.serve('127.0.0.1', 0)
+    reader, writer = await asyncio.open_connection('127.0.0.1', proxy.sockets[0].getsockname()[1])
+    writer.write(request)
+    await writer.drain()
+    await reader.read()
+    writer.close()
+    proxy.close()
+    for server in servers:
+        server.close()
+    (index, head), = received.items()
+    return index, head
+
+
+def test_router_sends_table_to_its_worker():
+    router = Router([('127.0.0.1', 1), ('127.0.0.1', 2), ('127.0.0.1', 3)])
+    assert router.route('stol2') == router.workers[shard_of('stol2', 3)]
+
+    request = b"GET /socket.io/?table=stol2&EIO=4 HTTP/1.1\r\nHost: x\r\nConnection: keep-alive\r\n\r\n"
+    index, head = asyncio.run(_route(router, request))
+    assert index == shard_of('stol2', 3)
+    # one request per connection, the next one may be for another table
+    assert head == b"GET /socket.io/?table=stol2&EIO=4 HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n"
+
+    request = b"GET /socket.io/?EIO=4 HTTP/1.1\r\nHost: x\r\nConnection: Upgrade\r\nUpgrade: websocket\r\n\r\n"
+    index, head = asyncio.run(_route(router, request))
+    assert index == shard_of('main', 3)
+    assert head == request
+
+
+async def _emit_across_workers():
+    bus = LocalBus()
+    servers = []
+    for owned in ('tA', 'tX'):
+        server = socketio.AsyncServer(async_mode='asgi', client_manager=BusManager(bus, owned.__eq__))
+        server.manager.initialize()
+        servers.append(server)
+    first, second = servers
+    await asyncio.sleep(0)  # both managers listen to the bus
+
+    delivered = []
+
+    async def record(eio_sid, packet):
+        delivered.append((eio_sid, packet.data))
+
+    second._send_eio_packet = record
+    sid = await second.manager.connect('eio-1', '/')
+    await second.manager.enter_room(sid, '/', 'tX')
+    await second.manager.enter_room(sid, '/', spectator_room('tX'))
+
+    assert second.manager._is_local('tX', '/')
+    assert second.manager._is_local(spectator_room('tX'), '/')
+    assert not first.manager._is_local('tX', '/')
+
+    await first.emit('update_par', {'score': 420}, to='tX')
+    for _ in range(10):
+        await asyncio.sleep(0)
+    for server in servers:
+        server.manager.thread.cancel()
+    return delivered
+
+
+def test_emit_reaches_table_in_other_worker():
+    (eio_sid, data), = asyncio.run(_emit_across_workers())
+    assert eio_sid == 'eio-1'
+    assert 'update_par' in data and '420' in data
+
+
+def test_merge_metrics_labels_every_shard():
+    worker = ('# HELP bridge_events_total Events\n# TYPE bridge_events_total counter\n'
+              'bridge_events_total{event="bid"} 3\n'
+              '# HELP bridge_active_tables Tables\n# TYPE bridge_active_tables gauge\nbridge_active_tables 2\n')
+    merged = merge_metrics([worker, None, worker.replace(' 3\n', ' 5\n')])
+    assert merged.count('# TYPE bridge_events_total counter') == 1
+    assert 'bridge_events_total{event="bid",shard="0"} 3\nbridge_events_total{event="bid",shard="2"} 5\n' in merged
+    assert 'bridge_active_tables{shard="0"} 2\nbridge_active_tables{shard="2"} 2\n' in merged
+    assert 'bridge_shard_up{shard="1"} 0\n' in merged
+
+
+async def _scrape_router() -> bytes:
+    async def worker(shard, reader, writer):
+        await reader.readuntil(b'\r\n\r\n')
+        body = f'# TYPE bridge_active_tables gauge\nbridge_active_tables {shard + 1}\n'.encode()
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n' % len(body) + body)
+        writer.close()
+
+    servers = [await asyncio.start_server(lambda r, w, shard=shard: worker(shard, r, w), '127.0.0.1', 0)
+               for shard in range(2)]
+    router = Router([('127.0.0.1', server.sockets[0].getsockname()[1]) for server in servers])
+    proxy = await router.serve('127.0.0.1', 0)
+    reader, writer = await asyncio.open_connection('127.0.0.1', proxy.sockets[0].getsockname()[1])
+    writer.write(b"GET /metrics HTTP/1.1\r\nHost: x\r\n\r\n")
+    response = await reader.read()
+    writer.close()
+    proxy.close()
+    for server in servers:
+        server.close()
+    return response
+
+
+def test_router_serves_metrics_of_all_workers():
+    response = asyncio.run(_scrape_router())
+    assert response.startswith(b'HTTP/1.1 200 OK')
+    assert b'bridge_active_tables{shard="0"} 1\nbridge_active_tables{shard="1"} 2\n' in response
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from core.constraints import Constraint, DealFeatures, constrained_deals
+from core.dealer import generate_deals
+
+# North holds all spades, East all hearts, South all diamonds and West all clubs
+SUIT_PER_SEAT = np.repeat(np.array([3, 2, 1, 0], dtype=np.uint8), 13).reshape(1, 52)
+
+
+def test_features():
+    features = DealFeatures(SUIT_PER_SEAT)
+    assert features.hcp(0)[0] == 10
+    assert features.controls(3)[0] == 3
+    assert features.lengths(3)[0].tolist() == [13, 0, 0, 0]
+    assert features.owner(51)[0] == 0
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("N spades 13", True),
+    ("N spade 13+ and E hcp 10", True),
+    ("W clubs 12-", False),
+    ("NS hcp >= 20 and EW hcp < 21", True),
+    ("not (N has SA or E controls > 3)", False),
+    ("W shape 0=0=0=13 or N balanced", True),
+    ("W shape 0-13-0-0", True),
+    ("W shape 0=13=0=0", False),
+    ("S diamonds = 13 and not S balanced", True),
+])
+def test_evaluation(text, expected):
+    assert Constraint(text)(SUIT_PER_SEAT)[0] == expected
+
+
+@pytest.mark.parametrize("text", ["", "X hcp 12", "N hcp", "N hcp 12 and", "NS balanced", "N shape 4432x",
+                                  "N has ZZ", "(N hcp 12", "N has SA and S has SA", "N shape 5=5=2=2"])
+def test_bad_constraints(text):
+    with pytest.raises(ValueError):
+        Constraint(text)
+
+
+def test_generated_deals_match_and_are_reproducible():
+    text = "N hcp 15-17 and N balanced and S spades 5+ and S has HA"
+    constraint = Constraint(text)
+    assert constraint.shape_seat in (0, 2)
+    assert constraint.fixed_cards == {38: 2}
+    deals = constrained_deals(constraint, 500, seed=4)
+    assert deals.shape == (500, 52)
+    assert (np.sort(deals, axis=1) == np.repeat(np.arange(4), 13)).all()
+    assert constraint(deals).all()
+    assert (deals == constrained_deals(text, 500, seed=4)).all()
+
+
+def test_shape_first_dealing_is_unbiased():
+    constraint = Constraint("N spades 6+ and N has SK")
+    planned = constrained_deals(constraint, 20000, seed=1)
+    pool = generate_deals(1 << 20, seed=2)
+    rejected = pool[constraint(pool)]
+    for seat in range(4):
+        assert abs(DealFeatures(planned).hcp(seat).mean() - DealFeatures(rejected).hcp(seat).mean()) < 0.15
+        assert np.allclose(DealFeatures(planned).lengths(seat).mean(axis=0),
+                           DealFeatures(rejected).lengths(seat).mean(axis=0), atol=0.05)
+
+
+def test_gives_up_after_max_candidates():
+    with pytest.raises(ValueError):
+        constrained_deals("N hcp 40", 1, seed=0, batch_size=1000, max_candidates=5000)
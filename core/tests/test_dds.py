@@ -0,0 +1,134 @@
+import random
+import statistics
+from functools import lru_cache
+
+import pytest
+
+from core import BiddingSuit, Card, Direction
+from core.bitboard import SUIT_MASKS, iter_indices, mask_from_indices
+from core.dds import DoubleDummySolver, declarer_tricks, solve
+from core.play_utils import evaluate_trick_winner
+
+
+def pack_ranks(hands) -> tuple:
+    """
+    The same hands with the cards left in every suit moved up to the top ranks in the same order: the rest of the play
+    only depends on which cards are higher
+    """
+    packed = [0, 0, 0, 0]
+    for suit_mask in SUIT_MASKS:
+        cards = list(iter_indices((hands[0] | hands[1] | hands[2] | hands[3]) & suit_mask))
+        top = suit_mask.bit_length()
+        for number, index in enumerate(cards):
+            seat = next(seat for seat in range(4) if hands[seat] >> index & 1)
+            packed[seat] |= 1 << (top - len(cards) + number)
+    return tuple(packed)
+
+
+def brute_force(deal, strain: BiddingSuit, leader: Direction) -> int:
+    """
+    Plain minimax over the legal cards, returns the tricks of the side on lead. Of touching cards in one hand (no other
+    card left in play or on the table between them) only the highest is tried, and positions at the end of a trick are
+    remembered with their ranks packed
+    """
+
+    @lru_cache(None)
+    def tricks_ns(hands, leader_value):
+        if not hands[0]:
+            return 0
+
+        def play(hands, trick):
+            seat = (leader_value + len(trick)) % 4
+            led = SUIT_MASKS[trick[0][1].suit.value] if trick else 0
+            legal = hands[seat] & led or hands[seat]
+            in_play = hands[0] | hands[1] | hands[2] | hands[3] | mask_from_indices(card.index for _, card in trick)
+            results = []
+            for index in iter_indices(legal):
+                # the next higher card of the suit still in play
+                higher = in_play & SUIT_MASKS[index // 13] & -(2 << index)
+                if higher & -higher & legal:
+                    continue
+                left = list(hands)
+                left[seat] ^= 1 << index
+                played = trick + [(Direction(seat), Card.from_index(index))]
+                if len(played) < 4:
+                    results.append(play(tuple(left), played))
+                    continue
+                winning_card = evaluate_trick_winner(played, strain)
+                winner = next(direction for direction, card in played if card == winning_card)
+                results.append((winner.value % 2 == 0) + tricks_ns(pack_ranks(left), winner.value))
+            return max(results) if seat % 2 == 0 else min(results)
+
+        return play(hands, [])
+
+    ns = tricks_ns(tuple(deal), leader.value)
+    return ns if leader.value % 2 == 0 else deal[0].bit_count() - ns
+
+
+def random_ending(rng: random.Random, cards_each: int):
+    deck = rng.sample(range(52), 4 * cards_each)
+    return tuple(mask_from_indices(deck[seat * cards_each:(seat + 1) * cards_each]) for seat in range(4))
+
+
+@pytest.mark.parametrize("seed, strain", list(enumerate(BiddingSuit)))
+def test_solver_matches_brute_force(seed, strain):
+    rng = random.Random(seed)
+    for _ in range(6):
+        deal = random_ending(rng, rng.choice([2, 3, 4]))
+        solver = DoubleDummySolver(strain)
+        for leader in Direction:
+            assert solver.solve(deal, leader) == brute_force(deal, strain, leader)
+
+
+@pytest.mark.parametrize("seed, strain", list(enumerate(BiddingSuit)))
+def test_solver_matches_brute_force_in_longer_endings(seed, strain):
+    rng = random.Random(100 + seed)
+    deal = random_ending(rng, 5 + seed % 3)
+    leader = Direction(seed % 4)
+    assert DoubleDummySolver(strain).solve(deal, leader) == brute_force(deal, strain, leader)
+
+
+def test_top_cards_all_win_in_notrump():
+    hands = ["SA SK SQ", "S4 S3 S2", "HA HK HQ", "H4 H3 H2"]
+    deal = tuple(mask_from_indices(Card.from_str(card).index for card in hand.split()) for hand in hands)
+    assert solve(deal, BiddingSuit.NO_TRUMP, Direction.NORTH) == 3
+    # East can only lead a spade into North's tops
+    assert solve(deal, BiddingSuit.NO_TRUMP, Direction.EAST) == 0
+    assert declarer_tricks(deal, BiddingSuit.NO_TRUMP, Direction.NORTH) == 3
+
+
+def test_ruff_in_trumps():
+    hands = ["SA SK", "H2 H3", "D2 D3", "C2 C3"]
+    deal = tuple(mask_from_indices(Card.from_str(card).index for card in hand.split()) for hand in hands)
+    assert solve(deal, BiddingSuit.HEARTS, Direction.NORTH) == 0
+    assert solve(deal, BiddingSuit.NO_TRUMP, Direction.NORTH) == 2
+
+
+# Tricks taken by the side on lead (West) in random full deals, from the DDS library. Deal i of the seeded stream is
+# solved in strain i % 5
+FULL_DEALS_SEED = 11
+FULL_DEAL_RESULTS = [10, 8, 6, 3, 8, 4, 2]
+# Search nodes a typical deal may take: a solve visits about 30 000 nodes a second on the reference machine
+FULL_DEAL_NODE_BUDGET = 30_000
+
+
+def test_full_deals_match_dds_within_node_budget():
+    rng = random.Random(FULL_DEALS_SEED)
+    strains = list(BiddingSuit)
+    nodes = []
+    for number, tricks in enumerate(FULL_DEAL_RESULTS):
+        deck = rng.sample(range(52), 52)
+        deal = tuple(mask_from_indices(deck[seat * 13:(seat + 1) * 13]) for seat in range(4))
+        solver = DoubleDummySolver(strains[number % 5])
+        assert solver.solve(deal, Direction.WEST) == tricks
+        nodes.append(solver.nodes)
+    assert statistics.median(nodes) <= FULL_DEAL_NODE_BUDGET
+    # the hardest deals may take a few seconds, but not more
+    assert max(nodes) <= 5 * FULL_DEAL_NODE_BUDGET
+
+
+def test_invalid_deal():
+    with pytest.raises(ValueError):
+        solve((0b1, 0b10, 0b100, 0b11000), BiddingSuit.NO_TRUMP, Direction.NORTH)
+    with pytest.raises(ValueError):
+        solve((0b1, 0b1, 0b100, 0b1000), BiddingSuit.NO_TRUMP, Direction.NORTH)
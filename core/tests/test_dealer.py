@@ -0,0 +1,30 @@
+import numpy as np
+
+from core.bitboard import deal_masks_valid, deal_owner
+from core.dealer import CHUNK_SIZE, deal_masks, deal_masks_array, generate_deals, iter_deal_chunks
+
+
+def test_every_deal_gives_thirteen_cards_to_each_seat():
+    deals = generate_deals(1000, seed=3)
+    assert deals.shape == (1000, 52)
+    assert deals.dtype == np.uint8
+    assert (np.sort(deals, axis=1) == np.repeat(np.arange(4), 13)).all()
+
+
+def test_stream_is_reproducible():
+    count = CHUNK_SIZE + 100
+    deals = generate_deals(count, seed=11)
+    assert (deals == generate_deals(count, seed=11, processes=2)).all()
+    assert (deals == np.concatenate(list(iter_deal_chunks(count, seed=11)))).all()
+    assert (deals == np.concatenate(list(iter_deal_chunks(count, seed=11, processes=2)))).all()
+    assert not (deals[:100] == generate_deals(100, seed=12)).all()
+
+
+def test_deal_masks():
+    deals = generate_deals(50, seed=7)
+    masks = deal_masks_array(deals)
+    for row, row_masks in zip(deals, masks):
+        deal = deal_masks(row)
+        assert deal == tuple(int(mask) for mask in row_masks)
+        assert deal_masks_valid(deal)
+        assert all(deal_owner(deal, index).value == seat for index, seat in enumerate(row))
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from core import BiddingSuit, Direction, calculate_score
+from core.board_record import BridgeContract
+from core.duplicate import DuplicateSession, butler_datums, butler_imps, cross_imps, imps, matchpoints, ns_scores
+from core.score_table import STRAIN_CODES
+
+
+def test_imps_scale():
+    assert imps([0, 10, 20, 40, 50, 420, 430, 3990, 4000, 7000]).tolist() == [0, 0, 1, 1, 2, 9, 10, 23, 24, 24]
+    assert imps(-620).item() == -12
+
+
+def test_ns_scores_sign_and_vulnerability():
+    spades = STRAIN_CODES[BiddingSuit.SPADES]
+    # Board vulnerable for North-South only: 4S by East is not vulnerable
+    scores = ns_scores(4, spades, 0, 10, [Direction.NORTH.value, Direction.EAST.value], 1)
+    assert scores.tolist() == [calculate_score(4, BiddingSuit.SPADES, 0, 10, True),
+                               -calculate_score(4, BiddingSuit.SPADES, 0, 10, False)]
+
+
+def test_matchpoints_with_ties_and_missing_results():
+    scores = np.array([[420, 420, -50, 170, 0]])
+    played = np.array([[True, True, True, True, False]])
+    points, top = matchpoints(scores, played)
+    assert points.tolist() == [[5, 5, 0, 2, 0]]
+    assert top.tolist() == [6]
+
+
+def test_matchpoints_neuberg():
+    scores = np.array([[100, 200, 300], [100, 200, 0]])
+    played = np.array([[True, True, True], [True, True, False]])
+    points, top = matchpoints(scores, played)
+    assert points[1].tolist() == [0.5, 3.5, 0]
+    assert top.tolist() == [4, 4]
+    raw, raw_top = matchpoints(scores, played, neuberg=False)
+    assert raw[1].tolist() == [0, 2, 0] and raw_top.tolist() == [4, 2]
+
+
+def test_matchpoints_match_pairwise_comparison():
+    rng = np.random.default_rng(3)
+    scores = rng.choice([-200, -100, 50, 110, 140, 420, 450, 620], (20, 9))
+    played = rng.random((20, 9)) < 0.9
+    points, _ = matchpoints(scores, played, neuberg=False)
+    for board in range(20):
+        for table in np.flatnonzero(played[board]):
+            others = [scores[board, other] for other in np.flatnonzero(played[board]) if other != table]
+            expected = sum(2 if scores[board, table] > other else 1 if scores[board, table] == other else 0
+                           for other in others)
+            assert points[board, table] == expected
+
+
+def test_cross_imps():
+    scores = np.array([[420, 420, -50, 170]])
+    assert cross_imps(scores).tolist() == [[16 / 3, 16 / 3, -26 / 3, -2]]
+
+
+def test_butler_datum_drops_extremes():
+    scores = np.array([[420, 420, -50, 170], [100, 200, 0, 0]])
+    played = np.array([[True] * 4, [True, True, False, False]])
+    assert butler_datums(scores, played).tolist() == [300, 150]
+    assert butler_imps(scores, played).tolist() == [[3, 3, -8, -4], [-2, 2, 0, 0]]
+
+
+def test_session_ranking():
+    # Two tables, two boards, NS pairs 0 and 1, EW pairs 2 and 3 switching tables on board 2
+    session = DuplicateSession([[0, 1], [0, 1]], [[2, 3], [3, 2]])
+    session.set_result(0, 0, BridgeContract(4, BiddingSuit.SPADES, 0, Direction.NORTH), 10)
+    session.set_result(0, 1, BridgeContract(4, BiddingSuit.SPADES, 0, Direction.NORTH), 9)
+    session.set_result(1, 0, None)
+    session.set_score(1, 1, -100)
+
+    assert session.pair_totals().tolist() == [4, 0, 2, 2]
+    assert session.percentages().tolist() == [100, 0, 50, 50]
+    assert session.ranking() == [(1, 0, 4.0), (2, 2, 2.0), (2, 3, 2.0), (4, 1, 0.0)]
+    # Board 1: 4S= and 4S-1 around their mean, board 2: 0 and -100 around -50 (2 IMPs each way)
+    score = calculate_score(4, BiddingSuit.SPADES, 0, 10, False)
+    board_1 = imps(score - round((score - 50) / 20) * 10).item()
+    assert session.pair_totals('butler').tolist() == [board_1 + 2, -board_1 - 2, 2 - board_1, board_1 - 2]
+
+    # A board left with one result is an average after Neuberg scaling
+    session.clear_result(1, 1)
+    assert session.pair_totals().tolist() == [3, 0, 0, 3]
+
+
+def test_session_rejects_cells_outside_the_movement():
+    session = DuplicateSession([[0, -1]], [[1, -1]])
+    with pytest.raises(ValueError):
+        session.set_score(0, 1, 100)
+    with pytest.raises(ValueError):
+        session.ranking('total_points')
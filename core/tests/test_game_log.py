@@ -0,0 +1,31 @@
+from random import Random
+
+from core.tests.helpers import assert_same_game, play_rubber
+from game_log import GameLog, apply_event
+from game_logic import Game
+
+
+def test_replay_full_rubber_with_and_without_snapshot():
+    log = GameLog(snapshot_every=7)
+    rng = Random(5)
+    game = play_rubber(Game(rng, log=log), rng)
+    assert log.snapshot is not None and log.snapshot_index > 0
+
+    assert_same_game(log.rebuild(), game)
+    # The events alone, replayed from the first deal
+    replayed = GameLog.from_bytes(log.to_bytes())
+    assert replayed.snapshot is None
+    assert_same_game(replayed.rebuild(), game)
+
+
+def test_rebuild_in_the_middle_of_a_rubber():
+    log = GameLog(snapshot_every=5)
+    rng = Random(12)
+    play_rubber(Game(rng, log=log), rng)
+    for count in range(1, len(log.events), 37):
+        # The rubber cut after `count` events, in every phase of a deal
+        partial = GameLog(snapshot_every=5)
+        game = Game(log=partial)
+        for event in log.events[:count]:
+            apply_event(game, event)
+        assert_same_game(partial.rebuild(), game)
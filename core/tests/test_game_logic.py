@@ -0,0 +1,42 @@
+from random import Random
+
+from core.deal_enums import GameStatus
+from core.tests.helpers import act, play, play_until
+from game_logic import Game
+
+
+def test_deltas_follow_the_play():
+    rng = Random(2)
+    game = Game(rng)
+    play_until(game, rng, GameStatus.PLAY)
+    start = game.version
+    play(game, rng, 6)
+    deltas = game.deltas_since(start)
+    assert [delta['version'] for delta in deltas] == list(range(start + 1, game.version + 1))
+    assert game.deltas_since(game.version) == []
+
+
+def test_versions_across_deal_and_auction_need_full_state():
+    rng = Random(4)
+    game = Game(rng)
+    play_until(game, rng, GameStatus.PLAY)
+    play(game, rng, 5)
+    in_play = game.version
+
+    play_until(game, rng, GameStatus.DISPLAY_SCORE)
+    assert game.deltas_since(in_play) is not None
+    game.prepare_new_deal()
+    # a new deal started, the previous deal's play is no base for deltas
+    assert game.deltas_since(in_play) is None
+
+    game.deal_cards()
+    before_auction = game.version
+    assert game.deltas_since(in_play) is None
+    act(game, rng)
+    # the auction records no deltas
+    assert game.deltas_since(before_auction) is None
+
+    play_until(game, rng, GameStatus.PLAY)
+    act(game, rng)
+    assert game.deltas_since(in_play) is None
+    assert game.deltas_since(before_auction) is None
@@ -0,0 +1,68 @@
+import random
+
+import numpy as np
+
+from core import Card, PlayerHand, Rank, Suit
+from core.dealer import deal_masks, deal_masks_array, generate_deals
+from core.hand_eval import BatchEvaluation, HandEvaluation
+
+HONOURS = {Rank.ACE: 4, Rank.KING: 3, Rank.QUEEN: 2, Rank.JACK: 1}
+
+
+def slow_metrics(hand: PlayerHand):
+    """
+    The same metrics counted card by card
+    """
+    hcp = sum(HONOURS.get(card.rank, 0) for card in hand.cards)
+    controls = sum({Rank.ACE: 2, Rank.KING: 1}.get(card.rank, 0) for card in hand.cards)
+    losers = 0
+    for ranks in hand.suits.values():
+        top = ranks[:3]
+        losers += len(top) - sum(rank in (Rank.ACE, Rank.KING, Rank.QUEEN)[:len(top)] for rank in top)
+    return hcp, controls, losers
+
+
+def test_lookup_matches_card_by_card_counting():
+    rng = random.Random(5)
+    for _ in range(200):
+        deck = list(range(52))
+        rng.shuffle(deck)
+        hand = PlayerHand.from_cards(Card.from_index(index) for index in deck[:13])
+        assert (hand.hcp, hand.controls, hand.losers) == slow_metrics(hand)
+        assert hand.suit_lengths == tuple(len(hand.suits[suit]) for suit in Suit)
+        assert sum(hand.shape) == 13 and list(hand.shape) == sorted(hand.shape, reverse=True)
+
+
+def test_known_hand():
+    hand = PlayerHand.from_string_lists(["A", "K", "5", "3"], ["Q", "J", "2"], ["K", "7"], ["A", "Q", "4", "2"])
+    assert hand.hcp == 19
+    assert hand.controls == 6
+    assert hand.losers == 1 + 2 + 1 + 1
+    assert hand.quick_tricks == 2 + 0.5 + 1.5
+    assert hand.shape == (4, 4, 3, 2)
+    assert hand.suit_lengths[Suit.SPADES.value] == 4
+
+
+def test_cached_evaluation_follows_the_hand():
+    hand = PlayerHand.from_string_lists(["A", "K", "5", "3"], ["Q", "J", "2"], ["K", "7"], ["A", "Q", "4", "2"])
+    evaluation = hand.evaluation
+    assert hand.evaluation is evaluation
+    hand.remove(Card.from_str("SA"))
+    assert hand.hcp == 15
+    assert hand.evaluation is not evaluation
+
+
+def test_batch_matches_single_hands():
+    deals = generate_deals(300, seed=9)
+    batch = BatchEvaluation(deal_masks_array(deals))
+    for row, seats in enumerate(deals):
+        for seat, mask in enumerate(deal_masks(seats)):
+            single = HandEvaluation(mask)
+            assert batch.hcp[row, seat] == single.hcp
+            assert batch.losers[row, seat] == single.losers
+            assert batch.controls[row, seat] == single.controls
+            assert batch.quick_tricks[row, seat] == single.quick_tricks
+            assert tuple(batch.suit_lengths[row, seat]) == single.suit_lengths
+            assert tuple(batch.shape[row, seat]) == single.shape
+    assert (batch.hcp.sum(axis=1) == 40).all()
+    assert np.isin(batch.losers, np.arange(13)).all()
@@ -0,0 +1,146 @@
+import io
+import random
+
+from core import BiddingSuit, Card, Direction
+from core.bitboard import iter_indices, mask_from_indices
+from core.board_record import BoardRecord, BridgeContract, contract_from_bidding
+from core.deal_enums import Vulnerability
+from core.lin import format_lin, read_lin, write_lin
+from core.pbn import format_pbn, read_pbn, write_pbn
+from core.play_utils import evaluate_trick_winner
+
+
+def random_board(seed: int) -> BoardRecord:
+    """
+    A board with a 4S contract and a complete random (but legal) play
+    """
+    rng = random.Random(seed)
+    deck = list(range(52))
+    rng.shuffle(deck)
+    deal = tuple(mask_from_indices(deck[seat * 13:(seat + 1) * 13]) for seat in range(4))
+    record = BoardRecord.from_deal(deal, dealer=Direction.EAST, vulnerability=Vulnerability.BOTH, board_number=seed)
+    record.players = {direction: direction.name.title() for direction in Direction}
+    record.bidding = ["1S", "PASS", "4S", "X", "XX", "PASS", "PASS", "PASS"]
+    record.contract = contract_from_bidding(record.dealer, record.bidding)
+
+    hands = list(deal)
+    leader = record.contract.declarer.next()
+    record.tricks = 0
+    for _ in range(13):
+        trick = []
+        for offset in range(4):
+            seat = leader.offset(offset)
+            led = [index for index in iter_indices(hands[seat.value]) if trick and index // 13 == trick[0][1].suit.value]
+            index = rng.choice(led or list(iter_indices(hands[seat.value])))
+            hands[seat.value] ^= 1 << index
+            trick.append((seat, Card.from_index(index)))
+        record.play.extend(card for _, card in trick)
+        winner = evaluate_trick_winner(trick, BiddingSuit.SPADES)
+        leader = next(seat for seat, card in trick if card == winner)
+        record.tricks += leader.value % 2 == record.contract.declarer.value % 2
+    return record
+
+
+def test_contract_from_bidding():
+    contract = contract_from_bidding(Direction.EAST, random_board(1).bidding)
+    assert str(contract) == "4SXX E"
+
+
+def test_pbn_round_trip():
+    records = [random_board(seed) for seed in range(1, 4)]
+    records[0].tags["Event"] = "Club pairs"
+    stream = io.StringIO()
+    assert write_pbn(records, stream) == 3
+    stream.seek(0)
+    assert list(read_pbn(stream)) == records
+    assert next(read_pbn(io.StringIO(format_pbn(records[0])))).tags == {"Event": "Club pairs"}
+
+
+def test_pbn_reader_details():
+    text = """% PBN 2.1
+[Event "Club pairs"]
+[Board "7"]
+[Dealer "S"]
+[Vulnerable "All"]
+[Deal "W:KQT2.AT.J6542.85 963.63.AKQT87.KJ A854.K54.93.AQT6 J7.QJ9872..97432"]
+[Contract "3NT"]
+[Declarer "N"]
+[Auction "S"]
+1C =1= 1H! {strong} 3D Pass ; 3D was a transfer
+3NT {to
+play} AP
+[Play "E"]
+H4 HQ HA H3
+H5 H2 {HK} HT H6 ; SA
+{ the defence
+  is not recorded }
+*
+
+[Event "#"]
+[Board "8"]
+[Deal "N:- - - -"]
+"""
+    first, second = read_pbn(io.StringIO(text))
+    assert first.board_number == 7
+    assert first.dealer == Direction.SOUTH
+    assert first.vulnerability == Vulnerability.BOTH
+    assert first.bidding == ["1C", "1H", "3D", "PASS", "3NT", "PASS", "PASS", "PASS"]
+    assert str(first.contract) == "3NT N"
+    # Columns always start with East; West won the first trick and led to the second
+    assert [str(card) for card in first.play] == ["H4", "HQ", "HA", "H3", "HT", "H6", "H5", "H2"]
+    assert second.tags["Event"] == "Club pairs"
+    assert second.board_number == 8
+
+
+def test_lin_round_trip():
+    records = [random_board(seed) for seed in range(1, 4)]
+    stream = io.StringIO()
+    assert write_lin(records, stream) == 3
+    stream.seek(0)
+    assert list(read_lin(stream)) == records
+
+
+def test_lin_reader_details():
+    text = ("pn|Dee,Ann,Bob,Cid|st||md|3S876HA987DT98CA87,S543H632D7654C654,SAKQ2HK54DA32CK32,|rh||ah|Board 1|"
+            "sv|n|mb|1N!|an|15-17|mb|p|mb|3N|mb|p|mb|p|mb|p|pc|CQ|pc|C8|pc|C4|pc|CK|mc|9|\n")
+    record = next(read_lin(io.StringIO(text)))
+    assert record.dealer == Direction.NORTH
+    assert record.vulnerability == Vulnerability.NORTH_SOUTH
+    assert record.players[Direction.SOUTH] == "Dee"
+    assert [len(hand) for hand in record.hands.values()] == [13, 13, 13, 13]
+    assert str(record.contract) == "3NT N"
+    assert record.tricks == 9
+    assert "mc|9|" in format_lin(record)
+
+
+def test_pbn_to_lin_conversion_streams():
+    records = [random_board(seed) for seed in range(1, 6)]
+    pbn = io.StringIO()
+    write_pbn(records, pbn)
+    pbn.seek(0)
+
+    lin = io.StringIO()
+    # Records are converted one at a time, never collected into a list
+    assert write_lin(read_pbn(pbn), lin) == 5
+    lin.seek(0)
+    assert list(read_lin(lin)) == records
+
+
+def test_passed_out_board():
+    record = random_board(1)
+    record.bidding = ["PASS"] * 4
+    record.contract = BridgeContract.empty_contract()
+    record.play = []
+    record.tricks = None
+    assert next(read_pbn(io.StringIO(format_pbn(record)))) == record
+    assert next(read_lin(io.StringIO(format_lin(record)))) == record
+
+
+def test_pbn_contract_without_declarer():
+    record = random_board(2)
+    record.bidding = []
+    record.play = []
+    record.contract = BridgeContract(4, BiddingSuit.SPADES, 0, None)
+    text = format_pbn(record)
+    assert '[Declarer ""]' in text
+    assert next(read_pbn(io.StringIO(text))) == record
@@ -0,0 +1,115 @@
+from itertools import combinations
+
+import numpy as np
+import pytest
+
+from core.duplicate import DuplicateSession
+from core.movements import howell, match_imps, mitchell, swiss_pairings, team_round, victory_points
+
+
+def _opponents(movement):
+    opponents = {}
+    for round_ in range(movement.rounds):
+        for table in range(movement.tables):
+            if movement.is_played(round_, table):
+                ns, ew = int(movement.ns[round_, table]), int(movement.ew[round_, table])
+                opponents.setdefault(ns, []).append(ew)
+                opponents.setdefault(ew, []).append(ns)
+    return opponents
+
+
+def _board_sets_of(movement, pair):
+    return movement.board_sets[(movement.ns == pair) | (movement.ew == pair)].tolist()
+
+
+@pytest.mark.parametrize("tables", [1, 2, 3, 4, 7, 10, 13])
+def test_mitchell(tables):
+    movement = mitchell(tables)
+    opponents = _opponents(movement)
+    for pair in range(tables):
+        assert sorted(opponents[pair]) == list(range(tables, 2 * tables))
+    for pair in range(2 * tables):
+        assert sorted(_board_sets_of(movement, pair)) == list(range(tables))
+
+
+@pytest.mark.parametrize("pairs", [3, 4, 7, 8, 13, 20])
+def test_howell_is_a_round_robin(pairs):
+    movement = howell(pairs)
+    opponents = _opponents(movement)
+    for pair in range(pairs):
+        assert sorted(opponents[pair]) == [other for other in range(pairs) if other != pair]
+        sets = _board_sets_of(movement, pair)
+        assert len(sets) == len(set(sets))
+
+
+def test_board_pairs_feed_the_session():
+    movement = mitchell(3, boards_per_round=2)
+    ns, ew = movement.board_pairs()
+    assert ns.shape == ew.shape == (6, 3)
+    assert (ns >= 0).all() and (ew >= 0).all()
+    # Every result cell of a round is the board played there
+    board, slot = movement.result_cell(1, 2, movement.boards_at(1, 2)[1])
+    assert ns[board, slot] == movement.ns[1, 2] and ew[board, slot] == movement.ew[1, 2]
+    with pytest.raises(ValueError):
+        movement.result_cell(1, 2, movement.boards_at(1, 1)[0])
+    DuplicateSession(ns, ew)
+
+
+def test_howell_with_odd_pairs_has_a_sit_out():
+    movement = howell(5)
+    assert movement.pair_count == 5
+    assert all((movement.ns[round_] < 0).sum() == 1 for round_ in range(movement.rounds))
+    ns, _ = movement.board_pairs()
+    assert (ns >= 0).sum() == movement.rounds * (movement.tables - 1) * movement.boards_per_round
+
+
+def test_team_round_and_match_imps():
+    movement = team_round([(0, 1), (3, 2)], boards_per_round=4)
+    assert movement.ns.tolist() == [[0, 3, 6, 5]]
+    assert movement.ew.tolist() == [[2, 1, 4, 7]]
+    scores = np.array([[420, -50, 100, 100], [-100, -100, 0, 50]])
+    assert match_imps(scores).tolist() == [10 + 0, 0 - 2]
+
+
+def test_victory_points():
+    points = victory_points([0, 12, -12, 200], boards=16)
+    assert points[0] == 10
+    assert points[1] + points[2] == 20
+    assert 10 < points[1] < 20
+    assert points[3] == 20
+
+
+def test_swiss_pairs_by_score_without_rematches():
+    scores = [10, 50, 30, 40, 20, 0]
+    matches, bye = swiss_pairings(scores)
+    assert bye is None
+    assert matches == [(1, 3), (2, 4), (0, 5)]
+
+    matches, _ = swiss_pairings(scores, played=[frozenset((1, 3))])
+    assert matches == [(1, 2), (3, 4), (0, 5)]
+
+
+def test_swiss_backtracks_and_gives_one_bye_each():
+    # 0 would take 2 after its rematch with 1 is ruled out, but then 1 could only meet 3 again
+    played = [frozenset((0, 1)), frozenset((1, 3))]
+    matches, bye = swiss_pairings([3, 2, 1, 0], played)
+    assert matches == [(0, 3), (1, 2)]
+    assert bye is None
+
+    byes = []
+    for _ in range(5):
+        _, bye = swiss_pairings([0] * 5, byes=byes)
+        byes.append(bye)
+    assert sorted(byes) == list(range(5))
+
+
+def test_swiss_round_robin_without_rematches():
+    rng = np.random.default_rng(2)
+    scores, played = [0.0] * 8, set()
+    for _ in range(7):
+        matches, _ = swiss_pairings(scores, played)
+        for first, second in matches:
+            assert frozenset((first, second)) not in played
+            played.add(frozenset((first, second)))
+            scores[first] += rng.random()
+    assert played == {frozenset(pair) for pair in combinations(range(8), 2)}
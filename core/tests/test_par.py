@@ -0,0 +1,96 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from threading import Event
+
+import pytest
+
+from core import BiddingSuit, Card, Direction, calculate_score
+from core.bitboard import mask_from_indices
+from core.dds import declarer_tricks
+from core.par import dd_table, par_contract, solve_dd_table, submit_dd_table
+
+
+def table_from_ns(ns_tricks: dict) -> dict:
+    return {
+        strain: {
+            Direction.NORTH: tricks, Direction.SOUTH: tricks,
+            Direction.EAST: 13 - tricks, Direction.WEST: 13 - tricks,
+        }
+        for strain, tricks in ns_tricks.items()
+    }
+
+
+def test_par_is_best_making_contract():
+    table = table_from_ns({
+        BiddingSuit.CLUBS: 6, BiddingSuit.DIAMONDS: 6, BiddingSuit.HEARTS: 6, BiddingSuit.SPADES: 10,
+        BiddingSuit.NO_TRUMP: 7,
+    })
+    contract, score = par_contract(table, vulnerable_ns=False, vulnerable_ew=False)
+    assert str(contract) == "4S N"
+    assert score == calculate_score(4, BiddingSuit.SPADES, 0, 10, False)
+
+
+def test_par_is_sacrifice():
+    table = table_from_ns({
+        BiddingSuit.CLUBS: 6, BiddingSuit.DIAMONDS: 6, BiddingSuit.HEARTS: 4, BiddingSuit.SPADES: 10,
+        BiddingSuit.NO_TRUMP: 6,
+    })
+    contract, score = par_contract(table, vulnerable_ns=True, vulnerable_ew=False)
+    assert str(contract) == "5HX E"
+    assert score == 300
+
+
+def test_par_pass_out():
+    table = {strain: {direction: 6 for direction in Direction} for strain in BiddingSuit}
+    contract, score = par_contract(table, vulnerable_ns=False, vulnerable_ew=False)
+    assert contract.level == 0
+    assert score == 0
+
+
+def test_dd_table_matches_single_solves():
+    hands = ["SA SK H2", "S4 S3 HA", "HK HQ C2", "H4 H3 C3"]
+    deal = tuple(mask_from_indices(Card.from_str(card).index for card in hand.split()) for hand in hands)
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        table = dd_table(deal, pool)
+    for strain in BiddingSuit:
+        for declarer in Direction:
+            assert table[strain][declarer] == declarer_tricks(deal, strain, declarer)
+
+
+def test_submitted_table_matches_cells():
+    hands = ["SA SK H2", "S4 S3 HA", "HK HQ C2", "H4 H3 C3"]
+    deal = tuple(mask_from_indices(Card.from_str(card).index for card in hand.split()) for hand in hands)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        assert submit_dd_table(deal, pool, time_limit=10).result() == dd_table(deal, pool)
+
+
+def test_submitted_table_time_limit_cancels_strains():
+    deck = list(range(52))
+    deal = tuple(mask_from_indices(deck[seat::4]) for seat in range(4))
+    gate = Event()
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pool.submit(gate.wait)  # holds the only worker so the strains stay queued
+        future = submit_dd_table(deal, pool, time_limit=0)
+        gate.set()
+        with pytest.raises(TimeoutError):
+            future.result(timeout=10)
+    # the first strain timed out, the queued ones were never solved
+    assert sum(part.cancelled() for part in future._parts.values()) == len(BiddingSuit) - 1
+
+
+def test_cancel_submitted_table():
+    deck = list(range(52))
+    deal = tuple(mask_from_indices(deck[seat::4]) for seat in range(4))
+    gate = Event()
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pool.submit(gate.wait)
+        future = submit_dd_table(deal, pool, time_limit=0)
+        assert future.cancel()
+        assert future.cancelled()
+        gate.set()
+
+
+def test_table_time_limit():
+    deck = list(range(52))
+    deal = tuple(mask_from_indices(deck[seat::4]) for seat in range(4))
+    with pytest.raises(TimeoutError):
+        solve_dd_table(deal, time_limit=0)
@@ -0,0 +1,30 @@
+from random import Random
+
+from core.tests.helpers import assert_same_game, play
+from game_logic import Game
+from persistence import TableStore
+
+
+def test_reopened_store_rebuilds_tables(tmp_path):
+    path = str(tmp_path / 'tables.db')
+    store = TableStore(path, flush_interval=0)
+    games = {}
+    for seed, table_id in enumerate(['main', 'stol2']):
+        rng = Random(seed)
+        games[table_id] = game = Game(rng, log=store.open_log(table_id, snapshot_every=10))
+        play(game, rng, 45 + seed * 30)
+    # A new rubber at a table replaces the previous one
+    games['stol2'] = game = Game(Random(7), log=store.open_log('stol2', snapshot_every=10))
+    play(game, game.rng, 12)
+    store.close()
+
+    store = TableStore(path, flush_interval=0)
+    logs = store.load()
+    assert sorted(logs) == ['main', 'stol2']
+    for table_id, game in games.items():
+        assert_same_game(logs[table_id].rebuild(), game)
+    assert logs['main'].snapshot is not None
+
+    # Rubbers started after the restart get new ids
+    assert store.open_log('third').rubber_id not in {log.rubber_id for log in logs.values()}
+    store.close()
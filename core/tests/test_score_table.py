@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from core import BiddingSuit, calculate_score
+from core.score_table import SCORE_TABLE, score_batch, strain_codes
+
+
+# (level, strain, doubled, tricks, vulnerable) -> declarer's score computed by hand with this game's rubber
+# bonuses: 200 / 500 for a game, no part-score bonus, 50 / 100 for making a doubled / redoubled contract
+KNOWN_SCORES = {
+    (2, BiddingSuit.HEARTS, 0, 8, False): 60,
+    (4, BiddingSuit.SPADES, 0, 10, False): 320,
+    (4, BiddingSuit.SPADES, 0, 11, False): 350,
+    (3, BiddingSuit.NO_TRUMP, 0, 9, True): 600,
+    (6, BiddingSuit.SPADES, 0, 12, True): 1430,
+    (7, BiddingSuit.NO_TRUMP, 0, 13, False): 1420,
+    (2, BiddingSuit.HEARTS, 1, 8, False): 370,
+    (2, BiddingSuit.HEARTS, 1, 9, True): 870,
+    (1, BiddingSuit.NO_TRUMP, 2, 7, False): 460,
+    (1, BiddingSuit.CLUBS, 2, 9, True): 980,
+    (4, BiddingSuit.SPADES, 0, 9, False): -50,
+    (4, BiddingSuit.SPADES, 0, 7, True): -300,
+    (3, BiddingSuit.NO_TRUMP, 1, 8, False): -100,
+    (3, BiddingSuit.NO_TRUMP, 1, 5, False): -800,
+    (4, BiddingSuit.HEARTS, 1, 7, True): -800,
+    (5, BiddingSuit.NO_TRUMP, 1, 7, True): -1100,
+    (2, BiddingSuit.DIAMONDS, 2, 6, False): -600,
+    (7, BiddingSuit.NO_TRUMP, 2, 0, True): -7600,
+}
+
+
+def test_known_scores():
+    for (level, strain, doubled, tricks, vulnerable), score in KNOWN_SCORES.items():
+        assert calculate_score(level, strain, doubled, tricks, vulnerable) == score
+        assert SCORE_TABLE[level, strain.value[0], doubled, tricks, int(vulnerable)] == score
+
+
+def test_passed_out_scores_zero():
+    assert not SCORE_TABLE[0].any()
+
+
+def test_score_batch():
+    rng = np.random.default_rng(5)
+    size = 1000
+    levels = rng.integers(1, 8, size)
+    strains = list(rng.choice(list(BiddingSuit), size))
+    doubled = rng.integers(0, 3, size)
+    tricks = rng.integers(0, 14, size)
+    vulnerable = rng.integers(0, 2, size).astype(bool)
+
+    scores = score_batch(levels, strain_codes(strains), doubled, tricks, vulnerable)
+    expected = [calculate_score(*args) for args in zip(levels, strains, doubled, tricks, vulnerable)]
+    assert scores.tolist() == expected
+
+
+def test_score_batch_broadcasts():
+    scores = score_batch(4, strain_codes([BiddingSuit.SPADES]), 0, np.arange(14), False)
+    assert scores.shape == (14,)
+    assert scores[10] == calculate_score(4, BiddingSuit.SPADES, 0, 10, False)
+
+
+def test_out_of_range_results_are_rejected():
+    for args in [(8, BiddingSuit.SPADES, 0, 10, False), (-1, BiddingSuit.SPADES, 0, 10, False),
+                 (4, None, 0, 10, False), (4, BiddingSuit.SPADES, 3, 10, False),
+                 (4, BiddingSuit.SPADES, 0, 14, False), (4, BiddingSuit.SPADES, 0, -1, False)]:
+        with pytest.raises(ValueError):
+            calculate_score(*args)
+    assert calculate_score(0, None, 0, 0, False) == 0
+
+    spades = strain_codes([BiddingSuit.SPADES])
+    with pytest.raises(ValueError, match="tricks"):
+        score_batch(4, spades, 0, np.array([10, -1]), False)
+    with pytest.raises(ValueError, match="levels"):
+        score_batch([4, 8], spades, 0, 10, False)
+    with pytest.raises(ValueError, match="strains"):
+        score_batch(4, 5, 0, 10, False)
+    with pytest.raises(ValueError, match="doubled"):
+        score_batch(4, spades, 3, 10, False)
+    with pytest.raises(ValueError, match="vulnerable"):
+        score_batch(4, spades, 0, 10, 2)
@@ -0,0 +1,23 @@
+from simulator import simulate, simulate_chunk
+
+_FIELDS = ('games', 'finished', 'wins_ns', 'wins_ew', 'deals', 'passed_out', 'contracts_made', 'points_ns',
+           'points_ew')
+
+
+def _stats(report):
+    return [getattr(report, name) for name in _FIELDS]
+
+
+def test_seeded_run_is_reproducible():
+    report = simulate(6, seed=3)
+    assert report.games == 6
+    assert report.wins_ns + report.wins_ew == report.finished
+    assert _stats(simulate(6, seed=3)) == _stats(report)
+    assert _stats(simulate(6, seed=4)) != _stats(report)
+
+
+def test_results_do_not_depend_on_chunks():
+    whole = simulate_chunk(8, 0, 4)
+    first, second = simulate_chunk(8, 0, 1), simulate_chunk(8, 1, 3)
+    first.merge(second)
+    assert _stats(first) == _stats(whole)
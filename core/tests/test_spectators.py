@@ -0,0 +1,47 @@
+import json
+
+from spectators import Spectators, spectator_room
+
+
+class Table:
+    """
+    Stands for a game_handler_jason.Handler, only its public view is used
+    """
+
+    def __init__(self):
+        self.moves = 0
+
+    def public_status(self, show_hands: bool = False):
+        return {'moves': self.moves, 'hands': show_hands}
+
+
+def test_release_newest_due_view_per_table():
+    spectators = Spectators(delay=2.0)
+    tables = {'a': Table(), 'b': Table(), 'c': Table()}
+    spectators.join('s1', 'a')
+    spectators.join('s2', 'b')
+    for now in (0.0, 0.5, 1.0):
+        for table_id in ('a', 'b', 'c'):
+            tables[table_id].moves += 1
+            assert spectators.publish(table_id, tables[table_id], now) == (table_id != 'c')  # nobody watches c
+
+    assert spectators.release(1.9) == []  # nothing is due before the delay
+    released = dict(spectators.release(2.6))
+    assert {room: json.loads(view)['moves'] for room, view in released.items()} == \
+        {spectator_room('a'): 2, spectator_room('b'): 2}
+    assert spectators.feeds['a'].latest == released[spectator_room('a')]
+    assert [json.loads(view)['moves'] for _, view in spectators.release(3.0)] == [3, 3]
+    assert spectators.release(10.0) == []
+
+
+def test_without_delay_views_are_due_at_once():
+    spectators = Spectators(show_hands=True)
+    table = Table()
+    spectators.join('s1', 't')
+    table.moves = 1
+    spectators.publish('t', table, 5.0)
+    (room, view), = spectators.release(5.0)
+    assert room == spectator_room('t') and json.loads(view) == {'moves': 1, 'hands': True}
+    assert spectators.leave('s1') == 't'
+    assert not spectators.watching('t')
+    assert not spectators.publish('t', table, 6.0)
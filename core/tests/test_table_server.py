@@ -0,0 +1,173 @@
+import gc
+from concurrent.futures import ProcessPoolExecutor
+from random import Random
+
+from core import BiddingSuit
+from core.bitboard import mask_from_indices
+from core.par import submit_dd_table
+from metrics import REGISTRY
+from table_server import PAR_TIME_LIMIT, Emit, TableServer
+
+
+def test_servers_share_the_gauges():
+    first, second = TableServer(None), TableServer(None)
+    first.join('a', 'main', False)
+    first.join('b', 'stol2', False)
+    second.join('c', 'main', False)
+    text = REGISTRY.render()
+    assert text.count('# TYPE bridge_active_tables gauge') == 1
+    assert 'bridge_active_tables 3\n' in text
+    assert 'bridge_active_connections 3\n' in text
+
+    del second
+    gc.collect()
+    assert 'bridge_active_tables 2\n' in REGISTRY.render()
+
+
+def seated_table(server: TableServer, rng: Random = None):
+    """
+    Four players ready at table 't' and a spectator 'x' watching it
+    :param rng: shuffles the deal, when given
+    :return: the table, its auction started
+    """
+    handler, _ = server.join('n', 't', False)
+    handler.par_time_limit = 0
+    handler.rubber.rng = rng
+    for sid, role in zip('nesw', 'NESW'):
+        if sid != 'n':
+            server.join(sid, 't', False)
+        server.choose_role(sid, role)
+    server.join('x', 't', False)
+    server.choose_role('x', 'Spectator')
+    for sid in 'nesw':
+        server.toggle_ready(sid)
+    return handler
+
+
+def failed(actions, sid: str) -> bool:
+    return [(action.event, action.to) if isinstance(action, Emit) else action for action in actions] == \
+        [('action_failed', sid)]
+
+
+def test_only_the_player_on_turn_acts():
+    server = TableServer(None)
+    handler = seated_table(server)
+    assert failed(server.make_bid('x', '1C'), 'x')
+    assert failed(server.make_bid('e', '1C'), 'e')
+    for sid, bid in zip('nesw', ['1C', 'PASS', 'PASS', 'PASS']):
+        assert not failed(server.make_bid(sid, bid), sid)
+    assert handler.get_game_status_str() == 'PLAY'
+
+    # North declares, East leads and North plays the dummy's cards
+    while handler.get_game_status_str() == 'PLAY':
+        turn = handler.rubber.playing_direction.abbreviation()
+        sid = 'n' if turn in 'NS' else turn.lower()
+        card = str(handler.rubber.get_legal_cards_to_play()[0])
+        version = handler.rubber.version
+        for other in 'xnesw':
+            if other != sid:
+                assert failed(server.play_card(other, card), other)
+        assert handler.rubber.version == version
+        assert not failed(server.play_card(sid, card), sid)
+    assert handler.get_game_status_str() == 'DISPLAY_SCORE'
+
+    assert failed(server.end_scores('x'), 'x')
+    assert handler.get_game_status_str() == 'DISPLAY_SCORE'
+    assert not failed(server.end_scores('w'), 'w')
+    assert handler.get_game_status_str() == 'AUCTION'
+    assert failed(server.end_scores('n'), 'n')
+
+
+def test_illegal_actions_of_the_seat_on_turn_fail():
+    server = TableServer(None)
+    handler = seated_table(server, Random(3))
+    server.make_bid('n', '1NT')
+    for bid in ['1C', 'XX', '8NT']:
+        assert failed(server.make_bid('e', bid), 'e')
+    assert handler.rubber.playing_direction.abbreviation() == 'E'
+    for sid in 'esw':
+        server.make_bid(sid, 'PASS')
+    assert handler.get_game_status_str() == 'PLAY'
+
+    # East leads: a card of another hand is refused
+    north_card = str(handler.rubber.players[0].hand.cards[0])
+    assert failed(server.play_card('e', north_card), 'e')
+    revokes = 0
+    while handler.get_game_status_str() == 'PLAY':
+        turn = handler.rubber.playing_direction.abbreviation()
+        sid = 'n' if turn in 'NS' else turn.lower()
+        legal = handler.rubber.get_legal_cards_to_play()
+        player = handler.rubber.players['NESW'.index(turn)]
+        others = [str(card) for card in player.hand.cards if str(card) not in legal]
+        if others:
+            # not following suit while holding the suit led
+            hand, version = player.hand.mask, handler.rubber.version
+            assert failed(server.play_card(sid, others[0]), sid)
+            assert (player.hand.mask, handler.rubber.version) == (hand, version)
+            revokes += 1
+        assert not failed(server.play_card(sid, str(legal[0])), sid)
+    assert revokes
+    assert handler.get_game_status_str() == 'DISPLAY_SCORE'
+
+
+def events_to(actions, sid: str):
+    return [action.event for action in actions if isinstance(action, Emit) and action.to == sid]
+
+
+def test_player_takes_the_seat_back_in_a_running_game():
+    server = TableServer(None)
+    handler = seated_table(server)
+    server.make_bid('n', '1C')
+    actions = server.disconnect('e')
+    assert handler.game_running
+    assert [action.data for action in actions if action.event in ('player_left', 'available_roles')] == ['E', ['E']]
+
+    server.join('e2', 't', False)
+    assert Emit('available_roles', ['E'], 't') in server.connected('e2')
+    actions = server.choose_role('e2', 'E')
+    assert events_to(actions, 'e2') == ['role_assigned', 'bidding_phase', 'update_auction', 'player_update_auction']
+    assert handler.get_status() == {'N': True, 'S': True, 'W': True, 'E': True}
+    assert not failed(server.make_bid('e2', 'PASS'), 'e2')
+    for sid in 'sw':
+        server.make_bid(sid, 'PASS')
+    assert handler.get_game_status_str() == 'PLAY'
+
+    # The declarer comes back during the play and plays the dummy's cards again
+    server.disconnect('n')
+    server.join('n2', 't', False)
+    actions = server.choose_role('n2', 'N')
+    (update,) = [action.data for action in actions if action.event == 'update_play']
+    assert update['dummy_controller_sid'] == 'n2' and len(update['direction_hands']['N']) == 13
+    assert not failed(server.play_card('e2', str(handler.rubber.get_legal_cards_to_play()[0])), 'e2')
+    assert not failed(server.play_card('n2', str(handler.rubber.get_legal_cards_to_play()[0])), 'n2')
+
+
+def test_players_come_back_to_a_rebuilt_table():
+    server = TableServer(None)
+    handler = seated_table(server)
+    server.table_logs['t'] = handler.rubber.log
+    server.make_bid('n', '1NT')
+    for sid in 'xnesw':
+        server.disconnect(sid)
+    assert 't' not in server.tables
+
+    rebuilt, new_table = server.join('s2', 't', False)
+    rebuilt.par_time_limit = 0
+    assert new_table and server.restore('t', rebuilt)
+    assert rebuilt.game_running and rebuilt.available_dirs() == ['N', 'E', 'S', 'W']
+    actions = server.choose_role('s2', 'S')
+    (auction,) = [action.data for action in actions if action.event == 'update_auction']
+    assert auction['turn'] == 'E' and auction['contract'] == '1NT N'
+    (hand,) = [action.data for action in actions if action.event == 'player_update_auction']
+    assert hand == [str(card) for card in handler.rubber.players[2].hand.cards]
+
+
+def test_typical_table_finishes_within_par_time_limit():
+    # a deal of typical difficulty: about 10 s of solving in all, up to 3 s for one strain
+    rng = Random(40)
+    for _ in range(5):
+        deck = rng.sample(range(52), 52)
+    deal = tuple(mask_from_indices(deck[seat * 13:(seat + 1) * 13]) for seat in range(4))
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        table = submit_dd_table(deal, pool, PAR_TIME_LIMIT).result()
+    assert set(table) == set(BiddingSuit)
@@ -0,0 +1,62 @@
+from random import Random
+
+import pytest
+
+from core import calculate_score
+from core.deal_enums import Direction, GameStatus
+from core.movements import mitchell
+from game_logic import Game
+from rooms import TableManager
+from tournament import Tournament
+
+
+@pytest.fixture
+def tournament(tmp_path):
+    movement = mitchell(3)
+    archive = Tournament.deal_boards(movement, str(tmp_path / 'boards.bda'), seed=2)
+    return Tournament(movement, archive, TableManager(Game), 'ev')
+
+
+def test_start_board_deals_archive_board(tournament):
+    for table, board in [(0, 1), (2, 4)]:
+        deal, dealer, vulnerability = tournament.archive[board]
+        game = tournament.start_board(table, board)
+        assert tournament.tables.get(f"ev-{table + 1}") is game
+        assert game.get_dealt_hands() == deal
+        assert game.game_status == GameStatus.AUCTION
+        assert game.playing_direction == dealer
+        score = game.get_current_scores()
+        assert score.team_ns.vulnerable == vulnerability.is_vulnerable(Direction.NORTH)
+        assert score.team_ew.vulnerable == vulnerability.is_vulnerable(Direction.EAST)
+    with pytest.raises(ValueError):
+        tournament.start_board(0, 2)  # played at another table in the first round
+
+
+def test_record_passed_out_and_played_boards(tournament):
+    game = tournament.start_board(0, 0)
+    for _ in range(4):
+        game.bid('PASS')
+    tournament.record_board(0, 0)
+    cell = tournament.movement.result_cell(0, 0, 0)
+    assert tournament.session.played[cell] and tournament.session.scores[cell] == 0
+
+    game = tournament.start_board(0, 1)
+    with pytest.raises(ValueError):
+        tournament.record_board(0, 1)  # the auction is not over
+    game.bid('3NT')
+    for _ in range(3):
+        game.bid('PASS')
+    rng = Random(0)
+    while game.game_status == GameStatus.PLAY:
+        game.play_card(rng.choice(game.get_legal_cards_to_play()))
+    tournament.record_board(0, 1)
+
+    contract = game.auction.contract
+    tricks_ns, tricks_ew = game.get_tricks_count()
+    declarer_ns = contract.declarer in (Direction.NORTH, Direction.SOUTH)
+    vulnerable = tournament.archive[1][2].is_vulnerable(contract.declarer)
+    score = calculate_score(contract.level, contract.suit, contract.doubled, tricks_ns if declarer_ns else tricks_ew,
+                            vulnerable)
+    cell = tournament.movement.result_cell(0, 0, 1)
+    assert tournament.session.played[cell]
+    assert tournament.session.scores[cell] == (score if declarer_ns else -score)
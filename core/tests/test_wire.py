@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+from core import Card
+from core.deal import PlayerHand
+from core.dealer import deal_masks, generate_deals
+from core.wire import CARD_NAMES, cards_of, decode, encode_delta, encode_hand, encode_play, event_of, mask_of
+
+
+def _json(message):
+    return json.loads(json.dumps(message))
+
+
+def _hands(seed=3):
+    return [[str(card) for card in PlayerHand.from_mask(mask).cards] for mask in deal_masks(generate_deals(1, seed)[0])]
+
+
+def test_card_names_follow_card_indices():
+    assert CARD_NAMES == [str(Card.from_index(index)) for index in range(52)]
+
+
+def test_hand_round_trip_in_display_order():
+    for cards in _hands():
+        assert cards_of(mask_of(cards)) == cards
+        message = encode_hand(cards)
+        assert len(message) == 8
+        assert decode(message) == cards
+        assert event_of(message) == 'player_update_auction'
+
+
+def test_play_round_trip():
+    north, east, south, west = _hands(seed=5)
+    update = {
+        'turn': True,
+        'trick_count': (3, 2),
+        'trick': [('W', west[0]), ('N', north[1])],
+        'last_full_trick': [('S', south[0]), ('W', west[1]), ('N', north[0]), ('E', east[0])],
+        'direction_hands': {'N': north[2:], 'E': ['*'] * 12, 'S': south[1:], 'W': ['*'] * 11},
+        'legal_hand': north[2:5],
+        'vis_dir': 'S',
+        'contract': '3NT by N',
+        'dummy_controller_sid': 'abc',
+        'current_playing_direction': 'E',
+        'version': 70000,
+    }
+    message = encode_play(update, 'abc')
+    assert len(message) < len(json.dumps(update)) / 4
+    decoded = decode(message)
+    assert decoded.pop('dummy_controller_sid') is True
+    expected = _json(update)
+    del expected['dummy_controller_sid']
+    assert _json(decoded) == expected
+
+    update['vis_dir'] = None
+    assert decode(encode_play(update, 'other'))['dummy_controller_sid'] is None
+    assert decode(encode_play(update))['vis_dir'] is None
+
+
+def test_delta_round_trip():
+    north = _hands()[0]
+    delta = {'version': 14, 'deltas': [
+        {'version': 11, 'type': 'card_played', 'direction': 'W', 'card': 'HA'},
+        {'version': 12, 'type': 'dummy_revealed', 'direction': 'N', 'cards': north},
+        {'version': 13, 'type': 'trick_won', 'direction': 'E', 'trick_count': [0, 1]},
+        {'version': 14, 'type': 'turn', 'direction': 'E'},
+    ]}
+    message = encode_delta(delta)
+    assert event_of(message) == 'play_delta'
+    assert decode(message) == delta
+    assert decode(encode_delta({'version': 9, 'deltas': []})) == {'version': 9, 'deltas': []}
+    assert encode_delta(None) is None
+
+
+def test_unknown_message():
+    with pytest.raises(ValueError):
+        decode(b'\x09')
@@ -0,0 +1,211 @@
+import struct
+from typing import Iterable, List, Optional, Tuple
+
+from core.bitboard import RANKS, SUITS, iter_indices
+from core.deal_enums import Suit
+
+"""
+Compact binary encoding of the Socket.IO messages that carry cards, for clients that ask for it.
+
+A card is one byte, its index as in core.bitboard (suit.value * 13 + rank - 2). A hand is its 52-bit mask in 7
+little-endian bytes, a hidden hand only its number of cards. A direction is one byte, Direction.value. Every message
+starts with a byte telling its kind; the 32-bit version is little-endian:
+
+    HAND    kind | mask                                                           player_update_auction
+    PLAY    kind | flags (1: player's turn, 2: controls dummy) | version | tricks NS, EW | direction to play
+            | dummy direction, or 255 | legal cards mask | hands N E S W | trick | last full trick
+            | contract: length, UTF-8                                              update_play
+    DELTA   kind | version of the first delta | count | deltas                     play_delta
+
+A hand in PLAY is 255 followed by its mask when visible, otherwise its number of cards. A trick is its number of
+cards followed by (direction, card) pairs. A delta is its type byte, then card_played: direction, card;
+dummy_revealed: direction, mask; trick_won: direction, tricks NS, EW; turn: direction. Versions of the deltas after
+the first one follow on by one.
+
+decode() turns a message back into the dict (or list) the JSON protocol sends, and static/client.js does the same
+(decodeWire), so the handlers of both protocols are the same past decoding. Cards come out of masks in display order
+(core.deal.PlayerHand.cards).
+"""
+
+HAND, PLAY, DELTA = 1, 2, 3
+EVENTS = {HAND: 'player_update_auction', PLAY: 'update_play', DELTA: 'play_delta'}
+
+DIRECTIONS = 'NESW'
+CARD_NAMES = [suit.name[0] + rank.value[1] for suit in SUITS for rank in RANKS]  # by card index
+CARD_INDEX = {name: index for index, name in enumerate(CARD_NAMES)}
+_CARD_BITS = {name: 1 << index for index, name in enumerate(CARD_NAMES)}
+DELTA_TYPES = ['card_played', 'dummy_revealed', 'trick_won', 'turn']
+
+MASK_BYTES = 7
+VISIBLE = 255
+NO_DIRECTION = 255
+FLAG_TURN, FLAG_DUMMY = 1, 2
+
+_DISPLAY_SUITS = [Suit.SPADES, Suit.HEARTS, Suit.CLUBS, Suit.DIAMONDS]  # core.deal.CUSTOM_SUIT_ORDER reversed
+_VERSION = struct.Struct('<I')
+_PLAY_HEADER = struct.Struct('<BBIBBBB')
+
+
+def mask_of(cards: Iterable[str]) -> int:
+    mask = 0
+    for card in cards:
+        mask |= _CARD_BITS[card]
+    return mask
+
+
+def cards_of(mask: int) -> List[str]:
+    """
+    :return: names of the cards of a mask in display order
+    """
+    cards = []
+    for suit in _DISPLAY_SUITS:
+        holding = (mask >> (13 * suit.value)) & 0x1FFF
+        cards.extend(CARD_NAMES[13 * suit.value + rank] for rank in reversed(list(iter_indices(holding))))
+    return cards
+
+
+def _direction(direction: Optional[str]) -> int:
+    return DIRECTIONS.index(direction) if direction else NO_DIRECTION
+
+
+def _trick(trick: List[Tuple[str, str]]) -> bytes:
+    out = bytearray([len(trick)])
+    for direction, card in trick:
+        out += bytes((DIRECTIONS.index(direction), CARD_INDEX[card]))
+    return bytes(out)
+
+
+def encode_hand(cards: Iterable[str]) -> bytes:
+    return bytes([HAND]) + mask_of(cards).to_bytes(MASK_BYTES, 'little')
+
+
+def encode_play(update: dict, sid: Optional[str] = None) -> bytes:
+    """
+    :param update: an update_play message as sent to one player
+    :param sid: the player's sid, to tell whether it plays the dummy
+    """
+    flags = (FLAG_TURN if update['turn'] else 0) | \
+        (FLAG_DUMMY if sid is not None and update['dummy_controller_sid'] == sid else 0)
+    ns, ew = update['trick_count']
+    out = bytearray(_PLAY_HEADER.pack(PLAY, flags, update['version'], ns, ew,
+                                      _direction(update['current_playing_direction']), _direction(update['vis_dir'])))
+    out += mask_of(update['legal_hand']).to_bytes(MASK_BYTES, 'little')
+    hands = update['direction_hands']
+    for direction in DIRECTIONS:
+        cards = hands[direction]
+        if cards and cards[0] == '*':
+            out.append(len(cards))
+        else:
+            out.append(VISIBLE)
+            out += mask_of(cards).to_bytes(MASK_BYTES, 'little')
+    out += _trick(update['trick'])
+    out += _trick(update['last_full_trick'])
+    contract = update['contract'].encode()
+    out.append(len(contract))
+    out += contract
+    return bytes(out)
+
+
+def encode_delta(delta: Optional[dict]) -> Optional[bytes]:
+    """
+    :param delta: a play_delta message; None (the client has to resync) stays None
+    """
+    if delta is None:
+        return None
+    deltas = delta['deltas']
+    first = deltas[0]['version'] if deltas else delta['version'] + 1
+    out = bytearray([DELTA]) + _VERSION.pack(first) + bytes([len(deltas)])
+    for change in deltas:
+        kind = change['type']
+        out.append(DELTA_TYPES.index(kind))
+        out.append(DIRECTIONS.index(change['direction']))
+        if kind == 'card_played':
+            out.append(CARD_INDEX[change['card']])
+        elif kind == 'dummy_revealed':
+            out += mask_of(change['cards']).to_bytes(MASK_BYTES, 'little')
+        elif kind == 'trick_won':
+            out += bytes(change['trick_count'])
+    return bytes(out)
+
+
+def event_of(message: bytes) -> str:
+    """
+    :return: name of the Socket.IO event carrying a message
+    """
+    return EVENTS.get(message[0], 'binary') if message else 'binary'
+
+
+def decode(message: bytes):
+    """
+    Inverse of the encode functions: the message as the JSON protocol sends it. In an update_play, the player who
+    plays the dummy gets True as dummy_controller_sid, the others None
+    """
+    kind = message[0]
+    if kind == HAND:
+        return cards_of(int.from_bytes(message[1:1 + MASK_BYTES], 'little'))
+    if kind == PLAY:
+        return _decode_play(message)
+    if kind == DELTA:
+        return _decode_delta(message)
+    raise ValueError(f"Unknown message kind {kind}")
+
+
+def _read_mask(message: bytes, offset: int) -> Tuple[int, int]:
+    return int.from_bytes(message[offset:offset + MASK_BYTES], 'little'), offset + MASK_BYTES
+
+
+def _read_trick(message: bytes, offset: int) -> Tuple[List[Tuple[str, str]], int]:
+    count = message[offset]
+    trick = [(DIRECTIONS[message[offset + 1 + 2 * i]], CARD_NAMES[message[offset + 2 + 2 * i]]) for i in range(count)]
+    return trick, offset + 1 + 2 * count
+
+
+def _decode_play(message: bytes) -> dict:
+    _, flags, version, ns, ew, turn, dummy = _PLAY_HEADER.unpack_from(message)
+    legal, offset = _read_mask(message, _PLAY_HEADER.size)
+    hands = {}
+    for direction in DIRECTIONS:
+        if message[offset] == VISIBLE:
+            mask, offset = _read_mask(message, offset + 1)
+            hands[direction] = cards_of(mask)
+        else:
+            hands[direction] = ['*'] * message[offset]
+            offset += 1
+    trick, offset = _read_trick(message, offset)
+    last_full_trick, offset = _read_trick(message, offset)
+    contract = message[offset + 1:offset + 1 + message[offset]].decode()
+    return {
+        'turn': bool(flags & FLAG_TURN),
+        'trick_count': (ns, ew),
+        'trick': trick,
+        'last_full_trick': last_full_trick,
+        'direction_hands': hands,
+        'legal_hand': cards_of(legal),
+        'vis_dir': None if dummy == NO_DIRECTION else DIRECTIONS[dummy],
+        'contract': contract,
+        'dummy_controller_sid': True if flags & FLAG_DUMMY else None,
+        'current_playing_direction': DIRECTIONS[turn],
+        'version': version,
+    }
+
+
+def _decode_delta(message: bytes) -> dict:
+    version = _VERSION.unpack_from(message, 1)[0]
+    count = message[1 + _VERSION.size]
+    offset = 2 + _VERSION.size
+    deltas = []
+    for index in range(count):
+        kind = DELTA_TYPES[message[offset]]
+        change = {'version': version + index, 'type': kind, 'direction': DIRECTIONS[message[offset + 1]]}
+        offset += 2
+        if kind == 'card_played':
+            change['card'] = CARD_NAMES[message[offset]]
+            offset += 1
+        elif kind == 'dummy_revealed':
+            mask, offset = _read_mask(message, offset)
+            change['cards'] = cards_of(mask)
+        elif kind == 'trick_won':
+            change['trick_count'] = [message[offset], message[offset + 1]]
+            offset += 2
+        deltas.append(change)
+    return {'version': version + count - 1, 'deltas': deltas}
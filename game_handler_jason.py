@@ -1,11 +1,41 @@
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from functools import partial
+from threading import RLock
+from typing import Optional
+
 from core.deal_enums import GameStatus, Direction
+from core.par import par_contract, submit_dd_table
+from game_log import GameLog
 from game_logic import Game, get_player_by_direction
 
 class Handler:
-    def __init__(self):
-        self.rubber = Game()
+    def __init__(self, solver_pool: Optional[Executor] = None, par_time_limit: Optional[float] = None):
+        self.rubber = Game(log=GameLog())
         self.player_dict = {}  # sid: {dir: ..., ready:..., has_played:...}
         self.game_running = False
+        self.solver_pool = solver_pool  # shared by all tables of a server; created on first use if not given
+        # seconds a deal's double dummy table may take before its par is given up; 0 turns par off
+        self.par_time_limit = par_time_limit
+        self.par_job = None  # {future: ..., deal: ..., vulnerable: (ns, ew), dealer: ..., submitted: ...} for the current deal
+        self._par_running: Optional[Future] = None  # future of the table whose strains hold this table's workers
+        self._par_lock = RLock()  # the pool's callbacks run in its own thread
+
+    def restore(self, log: GameLog) -> bool:
+        """
+        Continue the rubber recorded in the log, with all seats free for the players to take back. A finished rubber
+        is not restored
+        :return: whether the rubber was restored
+        """
+        rubber = log.rebuild()
+        if rubber.game_status == GameStatus.GAME_OVER:
+            return False
+        for player in rubber.players:
+            player.name = ''
+        self.rubber = rubber
+        self.game_running = rubber.game_status != GameStatus.DEAL_CARDS
+        if rubber.game_status in (GameStatus.AUCTION, GameStatus.PLAY):
+            self.start_par()
+        return True
 
     def get_game_status_str(self) -> str:
         return str(self.rubber.game_status)
@@ -18,7 +48,8 @@ class Handler:
             return False
         player = get_player_by_direction(self.rubber.players, Direction.from_str(role))
         player.name = 'Prr Prr Patapim'
-        self.player_dict[sid] = {'dir': role[0], 'ready': False, 'has_played': False}
+        # Taking a free seat of a running game (a player came back) joins it at once
+        self.player_dict[sid] = {'dir': role[0], 'ready': self.game_running, 'has_played': False}
         return True
 
     def get_status(self):
@@ -59,26 +90,108 @@ class Handler:
                 self.game_running = True
 
     def remove_player(self, sid) -> bool:
+        """
+        Free the seat of a player who left. A running game goes on, the seat waits for the player to come back
+        """
         if sid in self.player_dict:
             player = get_player_by_direction(self.rubber.players, Direction.from_str(self.player_dict[sid]['dir']))
             player.name = ''
             self.player_dict.pop(sid)
-            self.game_running = False
-            for p in self.player_dict.values():
-                p['ready'] = False
+            if not self.game_running:
+                for p in self.player_dict.values():
+                    p['ready'] = False
             return True
         return False
 
     def deal_cards(self):
         self.rubber.deal_cards()
+        self.start_par()
+
+    def start_par(self):
+        # The double dummy table is solved in worker processes, one per strain, while the deal is being played, the
+        # Socket.IO worker only waits for par_job['future']. A table has at most one deal in the pool: the strains of
+        # the previous deal are cancelled while they are queued, and when one is already running (a solve cannot be
+        # interrupted, it only stops at the time limit) the new deal is submitted once it finishes
+        self.close()
+        if self.par_time_limit == 0:
+            return
+        if self.solver_pool is None:
+            self.solver_pool = ProcessPoolExecutor()
+        score = self.rubber.get_current_scores()
+        job = {
+            'future': Future(),
+            'deal': self.rubber.get_dealt_hands(),
+            'vulnerable': (score.team_ns.vulnerable, score.team_ew.vulnerable),
+            'dealer': self.rubber.game_starter_direction,
+            'submitted': False,
+        }
+        with self._par_lock:
+            self.par_job = job
+            if self._par_running is None or self._par_running.done():
+                self._submit_par(job)
+
+    def _submit_par(self, job):
+        job['submitted'] = True
+        self._par_running = submit_dd_table(job['deal'], self.solver_pool, self.par_time_limit)
+        self._par_running.add_done_callback(partial(self._par_done, job))
+
+    def _par_done(self, job, running: Future):
+        with self._par_lock:
+            if not job['future'].done():
+                if running.cancelled():
+                    job['future'].cancel()
+                elif running.exception() is not None:
+                    job['future'].set_exception(running.exception())
+                else:
+                    job['future'].set_result(running.result())
+            if self.par_job is not None and not self.par_job['submitted']:
+                self._submit_par(self.par_job)
+
+    def close(self):
+        with self._par_lock:
+            job, self.par_job = self.par_job, None
+            if job:
+                job['future'].cancel()
+                if self._par_running is not None:
+                    self._par_running.cancel()
+
+    @staticmethod
+    def par_ready(par_job) -> bool:
+        return par_job['future'].done()
+
+    @staticmethod
+    def par_status(par_job):
+        """
+        :return: par of the finished job; raises the job's error (TimeoutError when the table took too long)
+        """
+        table = par_job['future'].result()
+        contract, score = par_contract(table, *par_job['vulnerable'], par_job['dealer'])
+        return {
+            'contract': str(contract),
+            'score': score,
+            'table': {
+                strain.abbreviation(): {d.abbreviation(): tricks for d, tricks in row.items()}
+                for strain, row in table.items()
+            },
+        }
+
+    def direction_of(self, sid) -> Optional[str]:
+        """
+        :return: the seat of a player, None for a spectator or a connection without a seat
+        """
+        player = self.player_dict.get(sid)
+        return player['dir'] if player else None
 
     def valid_status(self, exp_status: GameStatus) -> bool:
         return self.rubber.game_status == exp_status
 
     def make_bid(self, sid, bid) -> bool:
-        if not self.valid_status(GameStatus.AUCTION) or self.player_dict[sid]['dir'] != self.rubber.playing_direction.abbreviation():
+        if not self.valid_status(GameStatus.AUCTION) or self.direction_of(sid) != self.rubber.playing_direction.abbreviation():
+            return False
+        try:
+            self.rubber.bid(bid)
+        except ValueError:  # an illegal bid
             return False
-        self.rubber.bid(bid)
         if self.valid_status(GameStatus.DEAL_CARDS):
             self.deal_cards()
         return True
@@ -90,17 +203,40 @@ class Handler:
             'trick': [(d.abbreviation(), str(c)) for d, c in trick],
             'last_full_trick': [(d.abbreviation(), str(c)) for d, c in self.rubber.play.tricks_log[-1]] if self.rubber.play.tricks_log else [],
             'current_playing_direction': self.rubber.playing_direction.abbreviation(),
-            'contract': str(self.rubber.auction.contract)
+            'contract': str(self.rubber.auction.contract),
+            'version': self.rubber.version,
         }
 
+    def play_delta(self, version: int):
+        """
+        Changes since the given version, common to all players. Clients follow the play from these and keep the
+        hands locally; None means the version is too old and a full play_status snapshot is needed
+        """
+        deltas = self.rubber.deltas_since(version)
+        if deltas is None:
+            return None
+        return {'version': self.rubber.version, 'deltas': deltas}
+
     def player_hand_update(self):
         return {
             'legal_hand': [str(card) for card in self.rubber.get_legal_cards_to_play()],
             'player_turns': self.player_turns()
         }
 
-    def play_card(self, card: str):
-        self.rubber.play_card(card)
+    def play_card(self, sid, card: str) -> bool:
+        if not self.valid_status(GameStatus.PLAY):
+            return False
+        turn = self.rubber.playing_direction
+        declarer = self.rubber.auction.contract.declarer
+        if turn == declarer.partner():  # the declarer plays the dummy's cards
+            turn = declarer
+        if self.direction_of(sid) != turn.abbreviation():
+            return False
+        try:
+            self.rubber.play_card(card)
+        except ValueError:  # not in the hand or not following suit; the game is left as it was
+            return False
+        return True
 
     def score_status(self):
         return {
@@ -109,13 +245,40 @@ class Handler:
             'scores': str(self.rubber.get_current_scores())
         }
 
-    def end_scores(self):
+    def end_scores(self, sid) -> bool:
+        if not self.valid_status(GameStatus.DISPLAY_SCORE) or sid not in self.player_dict:
+            return False
         self.rubber.prepare_new_deal()
-        self.rubber.deal_cards()
+        self.deal_cards()
+        return True
 
     def game_over_status(self):
         return str(self.rubber.get_current_scores())
 
+    def public_status(self, show_hands: bool = False):
+        """
+        What a spectator sees: the phase and its public state, the same for all spectators
+        :param show_hands: all four hands (VuGraph), otherwise only the dummy's once it is down
+        """
+        view = {'phase': self.get_game_status_str() if self.game_running else 'LOBBY',
+                'lobby': self.get_status(), 'version': self.rubber.version}
+        if view['phase'] == 'AUCTION':
+            view['turn'] = self.rubber.playing_direction.abbreviation()
+            view['bidding_history'] = self.rubber.get_bidding_history()
+        elif view['phase'] == 'PLAY':
+            view.update(self.play_status())
+            vis_dir = self.get_visible_dir()
+            view['vis_dir'] = vis_dir
+            view['direction_hands'] = {
+                d: cards if show_hands or d == vis_dir else ['*'] * len(cards)
+                for d, cards in self.get_direction_hands().items()
+            }
+        elif view['phase'] == 'DISPLAY_SCORE':
+            view.update(self.score_status())
+        elif view['phase'] == 'GAME_OVER':
+            view['scores'] = self.game_over_status()
+        return view
+
     def get_visible_hands_per_sid(self):
         all_hands = self.get_direction_hands()
         vis_dir = self.rubber.visible_direction
@@ -0,0 +1,111 @@
+import pickle
+import struct
+from random import Random
+from typing import Iterator, List, Optional, Tuple
+
+from core.bids import LEGAL_BIDS
+from core.deal import Card
+from game_logic import EVENT_BID, EVENT_CARD, EVENT_DEAL, EVENT_NEW_DEAL, Game
+
+"""
+Event log of a game, with snapshots.
+
+Every action that changes a Game (dealing, a call, a card, moving on to a new deal) is appended to the game's log as
+a small tuple of ints:
+
+    (EVENT_DEAL, north, east, south, west)    card masks of the dealt hands
+    (EVENT_BID, code)                         index in core.bids.LEGAL_BIDS
+    (EVENT_CARD, index)                       card index, see core.deal.Card.from_index
+    (EVENT_NEW_DEAL,)
+
+Every SNAPSHOT_EVERY events the whole game is pickled. A game is rebuilt by unpickling the last snapshot and replaying
+the events after it through the same Game methods, so at most SNAPSHOT_EVERY - 1 actions are replayed and the
+rebuilt game, including its version and play deltas, is the same as the original. The events alone are the full
+history of the rubber, to_bytes() packs them for storage or analysis.
+"""
+
+SNAPSHOT_EVERY = 64
+
+Event = Tuple[int, ...]
+
+_FORMATS = {EVENT_DEAL: struct.Struct("<4Q"), EVENT_BID: struct.Struct("<B"), EVENT_CARD: struct.Struct("<B"),
+            EVENT_NEW_DEAL: struct.Struct("")}
+
+
+def apply_event(game: Game, event: Event) -> None:
+    kind = event[0]
+    if kind == EVENT_DEAL:
+        game.deal_cards(event[1:])
+    elif kind == EVENT_BID:
+        game.bid(LEGAL_BIDS[event[1]])
+    elif kind == EVENT_CARD:
+        game.play_card(str(Card.from_index(event[1])))
+    elif kind == EVENT_NEW_DEAL:
+        game.prepare_new_deal()
+    else:
+        raise ValueError(f"Unknown event: {event}")
+
+
+class GameLog:
+    def __init__(self, snapshot_every: int = SNAPSHOT_EVERY):
+        self.snapshot_every = snapshot_every
+        self.events: List[Event] = []
+        self.snapshot: Optional[bytes] = None  # pickled game after the first snapshot_index events
+        self.snapshot_index = 0
+
+    def append(self, game: Game, event: Event) -> None:
+        """
+        Called by the game after each action, with the game already in its new state
+        """
+        self.events.append(event)
+        if len(self.events) - self.snapshot_index >= self.snapshot_every:
+            self.take_snapshot(game)
+
+    def take_snapshot(self, game: Game) -> None:
+        self.snapshot = pickle.dumps(game, pickle.HIGHEST_PROTOCOL)
+        self.snapshot_index = len(self.events)
+
+    def rebuild(self, rng: Optional[Random] = None) -> Game:
+        """
+        The game in its state after the last event, logging to this log from now on
+        :param rng: generator the rebuilt game shuffles with, snapshots do not keep one
+        """
+        game = pickle.loads(self.snapshot) if self.snapshot is not None else Game()
+        for event in self.events[self.snapshot_index:]:
+            apply_event(game, event)
+        game.rng = rng
+        game.log = self
+        return game
+
+    def to_bytes(self) -> bytes:
+        """
+        The events packed as a kind byte followed by the event's fields (33 bytes for a deal, 2 for a call or a card)
+        """
+        return b"".join(encode_event(event) for event in self.events)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, snapshot_every: int = SNAPSHOT_EVERY) -> 'GameLog':
+        """
+        A log with the packed events and no snapshot, rebuild() replays all of them
+        """
+        log = cls(snapshot_every)
+        log.events = list(iter_events(data))
+        return log
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+
+def encode_event(event: Event) -> bytes:
+    return bytes((event[0],)) + _FORMATS[event[0]].pack(*event[1:])
+
+
+def iter_events(data: bytes) -> Iterator[Event]:
+    offset = 0
+    while offset < len(data):
+        kind = data[offset]
+        if kind not in _FORMATS:
+            raise ValueError(f"Unknown event kind {kind} at byte {offset}")
+        fields = _FORMATS[kind].unpack_from(data, offset + 1)
+        offset += 1 + _FORMATS[kind].size
+        yield (kind,) + fields
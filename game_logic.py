@@ -1,14 +1,18 @@
 from copy import copy
-from random import shuffle
+from random import Random, shuffle
 from typing import List, Optional
 
 import core
 from core import Card, BiddingSuit
-from core.bids import LEGAL_BIDS
-from core.deal_enums import SpecialBid, Direction, GameStatus
+from core.bitboard import DealMasks, mask_from_indices
+from core.bids import BIDS, LEGAL_BIDS, PASS_CODE, BiddingState, bid_code, bids_from_mask
+from core.deal_enums import Direction, GameStatus
 from core.play_utils import validate_card_usage, evaluate_trick_winner, Score, InvalidGameActionError, \
     select_player_by_winner
 
+# Rodzaje zdarzeń zapisywanych w dzienniku gry (zob. game_log.py)
+EVENT_DEAL, EVENT_BID, EVENT_CARD, EVENT_NEW_DEAL = range(4)
+
 
 class Player:
     def __init__(self, name: str, cards: Optional[List[Card]], direction: str) -> None:
@@ -16,24 +20,24 @@ class Player:
         self.direction = core.Direction.from_str(direction)
         self.hand = core.PlayerHand.from_cards(cards) if cards else None
 
-    def play_card(self, card: str) -> Card:
-        if not self.hand.cards:
+    def card_from_hand(self, card: str) -> Card:
+        if not self.hand.mask:
             raise ValueError("Player has no cards left in hand.")
 
         try:
             played_card = Card.from_str(card)
         except Exception:
-            raise f"Invalid card input: '{card}'."
+            raise ValueError(f"Invalid card input: '{card}'.")
         else:
-            if played_card not in self.hand.cards:
-                raise f"The card '{played_card}' is not in your hand."
-            else:
-                self.hand.cards.remove(played_card)
-                return played_card
+            if played_card not in self.hand:
+                raise ValueError(f"The card '{played_card}' is not in your hand.")
+            return played_card
 
 
 class Game:
-    def __init__(self):
+    def __init__(self, rng: Optional[Random] = None, log=None):
+        self.rng = rng  # własny generator do tasowania (np. w symulacjach), domyślnie globalny moduł random
+        self.log = log  # dziennik zdarzeń (game_log.GameLog), do którego trafia każda akcja
         self.players = []
         self._init_players()
         self.auction = Auction()
@@ -43,6 +47,9 @@ class Game:
         self.game_starter_direction = Direction.NORTH
         self.playing_direction = None
         self.visible_direction = None
+        self.dealt_hands = None
+        self.version = 0  # rośnie przy każdej zmianie stanu gry
+        self.deltas = []  # zmiany stanu od początku rozgrywki bieżącego rozdania
         #self.deal_cards()
 
     def taken_dirs(self):
@@ -56,44 +63,62 @@ class Game:
 
         self.players = [player1, player2, player3, player4]
 
-    def deal_cards(self) -> None:
+    def deal_cards(self, deal: Optional[DealMasks] = None) -> None:
+        """Rozdaje karty: potasowaną talię albo podane rozdanie (maski kart N, E, S, W)."""
         self._validate_game_status(GameStatus.DEAL_CARDS)
 
-        all_cards = [core.Card(suit, rank) for suit in core.Suit for rank in core.Rank]
-        shuffle(all_cards)
-        index = 0
+        if deal is None:
+            deck = list(range(52))
+            if self.rng:
+                self.rng.shuffle(deck)
+            else:
+                shuffle(deck)
+            deal = tuple(mask_from_indices(deck[index * 13:index * 13 + 13]) for index in range(4))
 
         for player in self.players:
-            player.hand = core.PlayerHand.from_cards(all_cards[index:index + 13])
-            index += 13
+            player.hand = core.PlayerHand.from_mask(deal[player.direction.value])
+        self.dealt_hands = self.get_deal()
 
         self.playing_direction = self.game_starter_direction
         self.game_status = GameStatus.AUCTION
+        self.version += 1
+        self._log(EVENT_DEAL, *self.dealt_hands)
 
     def bid(self, bid: str) -> None:
         self._validate_game_status(GameStatus.AUCTION)
 
-        self.auction.bid(self.playing_direction, bid)
+        code = bid_code(bid)
+        self.auction.bid_code(self.playing_direction, code)
+        self.version += 1
         if self.auction.auction_end():
             if self.auction.pass_count == 4:
-                self.prepare_new_deal()
+                self._start_new_deal()
             else:
                 self.game_status = GameStatus.PLAY
                 self.play = Play(self.auction.contract.suit)
                 self.playing_direction = self.auction.determine_play_starting_direction()
+                self.visible_direction = None
+                self.deltas = []
         else:
             self.playing_direction = self.playing_direction.next()
+        self._log(EVENT_BID, code)
 
     def play_card(self, card: str) -> None:
         self._validate_game_status(GameStatus.PLAY)
 
         current_player = get_player_by_direction(self.players, self.playing_direction)
 
-        played_card = current_player.play_card(card)
+        # Karta schodzi z ręki dopiero po sprawdzeniu, czy można ją zagrać: nieudany ruch nie zmienia gry
+        played_card = current_player.card_from_hand(card)
         self.play.play_card(played_card, current_player)
+        current_player.hand.remove(played_card)
+        self._record('card_played', direction=self.playing_direction.abbreviation(), card=str(played_card))
 
         if not self.visible_direction:
             self.visible_direction = self.playing_direction.next()
+            dummy = get_player_by_direction(self.players, self.visible_direction)
+            self._record('dummy_revealed', direction=self.visible_direction.abbreviation(),
+                         cards=[str(c) for c in dummy.hand.cards])
 
         if self.play.trick_over():
             finished_trick = self.play.tricks_log[-1]
@@ -104,6 +129,8 @@ class Game:
             else:
                 self.play.tricks_ew += 1
             self.playing_direction = winning_direction
+            self._record('trick_won', direction=winning_direction.abbreviation(),
+                         trick_count=[self.play.tricks_ns, self.play.tricks_ew])
             if self.play.play_over():
                 game_over = self.score.update_game_score(self.auction.contract, self.play.tricks_ns,
                                                          self.play.tricks_ew)
@@ -115,11 +142,50 @@ class Game:
         else:
             self.playing_direction = self.playing_direction.next()
 
+        if self.game_status == GameStatus.PLAY:
+            self._record('turn', direction=self.playing_direction.abbreviation())
+        self._log(EVENT_CARD, played_card.index)
+
+    def _record(self, kind: str, **data) -> None:
+        """Zapisuje zmianę stanu rozgrywki jako kolejną, numerowaną deltę."""
+        self.version += 1
+        self.deltas.append({'version': self.version, 'type': kind, **data})
+
+    def deltas_since(self, version: int) -> Optional[List[dict]]:
+        """
+        Zwraca zmiany nowsze niż podana wersja albo None, jeśli nie da się ich odtworzyć z delt
+        (wersja sprzed rozgrywki bieżącego rozdania albo zmiana bez delty: rozdanie, licytacja) i klient
+        potrzebuje pełnego stanu.
+        """
+        if version >= self.version:
+            return []
+        if not self.deltas or self.deltas[-1]['version'] != self.version or version < self.deltas[0]['version'] - 1:
+            return None
+        return self.deltas[version - self.deltas[0]['version'] + 1:]
+
     def prepare_new_deal(self):
         if self.game_status in [GameStatus.AUCTION, GameStatus.DISPLAY_SCORE]:
-            self.game_status = GameStatus.DEAL_CARDS
-            self.auction = Auction()
-            self.game_starter_direction = self.game_starter_direction.next()
+            self._start_new_deal()
+            self._log(EVENT_NEW_DEAL)
+
+    def _start_new_deal(self):
+        self.version += 1
+        self.deltas = []
+        self.game_status = GameStatus.DEAL_CARDS
+        self.auction = Auction()
+        self.game_starter_direction = self.game_starter_direction.next()
+
+    def _log(self, *event: int) -> None:
+        # Wołane na końcu akcji, dziennik może wtedy zrobić migawkę kompletnego stanu
+        if self.log is not None:
+            self.log.append(self, event)
+
+    def __getstate__(self):
+        # Migawka w dzienniku to sam stan gry, bez dziennika i generatora
+        state = self.__dict__.copy()
+        state['log'] = None
+        state['rng'] = None
+        return state
 
     def _validate_game_status(self, expected_status: GameStatus) -> None:
         if self.game_status != expected_status:
@@ -151,25 +217,23 @@ class Game:
         return rounds, dir_names
 
     def get_legal_bids(self) -> list[str]:
-        legal = []
-        all_bids = LEGAL_BIDS
-        for bid_str in all_bids:
-            bid = core.BridgeBid.from_str(bid_str)
-            if core.play_utils.is_bid_legal(previous_bid=self.auction.curr_bid, last_contract=self.get_contract(),
-                                            new_bid=bid, new_bid_direction=self.playing_direction):
-                legal.append(bid_str)
-
-        return legal
+        return bids_from_mask(self.auction.legal_bid_mask(self.playing_direction))
 
     def get_legal_cards_to_play(self) -> list[str]:
         if self.game_status != GameStatus.PLAY or not self.play:
             return []
 
         player = get_player_by_direction(self.players, self.playing_direction)
-        return [
-            str(card) for card in player.hand.cards
-            if validate_card_usage(card, self.play.trick, player.hand)
-        ]
+        led_suit = self.play.trick[0][1].suit if self.play.trick else None
+        return [str(card) for card in player.hand.legal_cards(led_suit)]
+
+    def get_deal(self) -> DealMasks:
+        """Zwraca rozdanie jako cztery maski kart (N, E, S, W)."""
+        return tuple(get_player_by_direction(self.players, direction).hand.mask for direction in Direction)
+
+    def get_dealt_hands(self) -> Optional[DealMasks]:
+        """Zwraca rozdanie w stanie z chwili rozdania kart (przed rozegraniem lew)."""
+        return self.dealt_hands
 
     def get_players(self) -> List['Player']:
         """Zwraca listę graczy."""
@@ -213,26 +277,33 @@ class Auction:
         self.curr_bid = None
         self.bid_log = []
         self.contract_log = []
+        self.state = BiddingState()
 
     def bid(self, bidding_player_direction: Direction, bid: str) -> None:
-        new_bid = core.BridgeBid.from_str(bid)
+        self.bid_code(bidding_player_direction, bid_code(bid))
+
+    def bid_code(self, bidding_player_direction: Direction, code: int) -> None:
+        """Zgłasza odzywkę podaną jako kod z core.bids (indeks w LEGAL_BIDS)."""
+        self.state.apply(code, bidding_player_direction.value % 2)
 
-        if new_bid.special == SpecialBid.PASS:
+        if code == PASS_CODE:
             self.pass_count += 1
             self.bid_log.append('PASS')
-
-        elif core.play_utils.is_bid_legal(previous_bid=self.curr_bid, last_contract=self.contract, new_bid=new_bid,
-                                          new_bid_direction=bidding_player_direction):
-            self.curr_bid = new_bid
+        else:
+            self.curr_bid = BIDS[code]
             self.contract.update_from_bridge_bid(self.curr_bid, bidding_player_direction)
-            self.bid_log.append(bid)
+            self.bid_log.append(LEGAL_BIDS[code])
             self.contract_log.append(copy(self.contract))
             self.pass_count = 0
-        else:
-            raise ValueError('Illegal bid')
+
+    def legal_bid_mask(self, bidding_player_direction: Direction) -> int:
+        """Zwraca legalne odzywki gracza jako maskę bitową kodów odzywek."""
+        return self.state.legal_masks[bidding_player_direction.value % 2]
 
     def auction_end(self) -> bool:
-        if self.pass_count == 4 or (self.pass_count == 3 and self.curr_bid is not None):
+        if self.pass_count == 4 and self.curr_bid is None:
+            return True  # rozdanie spasowane, nie ma rozgrywającego
+        if self.pass_count == 3 and self.curr_bid is not None:
             self.contract.declarer = self.determine_play_starting_direction().previous()
             return True
         return False
@@ -0,0 +1,165 @@
+from bisect import bisect_left
+from inspect import ismethod
+from threading import Lock
+from weakref import WeakMethod
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+"""
+Minimal in-process metrics in the Prometheus text format.
+
+Counter, Gauge and Histogram keep their values in plain dicts keyed by label values, so recording is a dict lookup,
+a bisect for histograms and an addition under an uncontended lock. render() produces the text exposition format
+(version 0.0.4) served by the /metrics endpoint of app_socket.py; quantiles such as p99 are computed from the histogram
+buckets on the Prometheus side with histogram_quantile().
+"""
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "".join(metric.render() for metric in self.metrics)
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), registry: Optional[Registry] = REGISTRY):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._lock = Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def _header(self) -> str:
+        return f"# HELP {self.name} {self.help}\n# TYPE {self.name} {self.kind}\n"
+
+    def render(self) -> str:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def get(self, *label_values: str) -> float:
+        return self.values.get(label_values, 0)
+
+    def render(self) -> str:
+        lines = [f"{self.name}{_labels(self.label_names, key)} {_number(value)}\n"
+                 for key, value in sorted(self.values.items())]
+        return self._header() + "".join(lines)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, function: Optional[Callable[[], float]] = None, **kwargs):
+        """
+        :param function: called at every render to read the current value, instead of set(); see bind()
+        """
+        super().__init__(*args, **kwargs)
+        # references to the functions, a bound method is held weakly and dropped with its object
+        self.functions: List[Callable[[], Optional[Callable[[], float]]]] = []
+        self.values: Dict[Tuple[str, ...], float] = {}
+        if function is not None:
+            self.bind(function)
+
+    def bind(self, function: Callable[[], float]) -> None:
+        """
+        Read the value from `function` at every render. Several functions can be bound, e.g. a method of each
+        server object in the process; the gauge is then the sum of their values
+        """
+        reference = WeakMethod(function) if ismethod(function) else lambda: function
+        with self._lock:
+            self.functions.append(reference)
+
+    def set(self, value: float, *label_values: str) -> None:
+        self.values[label_values] = value
+
+    def render(self) -> str:
+        values = self.values
+        if self.functions:
+            with self._lock:
+                functions = [reference() for reference in self.functions]
+                self.functions = [reference for reference, function in zip(self.functions, functions) if function]
+            values = {(): sum(function() for function in functions if function)}
+        lines = [f"{self.name}{_labels(self.label_names, key)} {_number(value)}\n"
+                 for key, value in sorted(values.items())]
+        return self._header() + "".join(lines)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # label values: [count in each bucket (not cumulative) and above the last one, sum of observations]
+        self.values: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.values.get(label_values)
+            if series is None:
+                series = self.values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, *label_values: str) -> int:
+        series = self.values.get(label_values)
+        return sum(series[0]) if series else 0
+
+    def render(self) -> str:
+        lines = []
+        for key, (counts, total) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}\n")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(total)}\n")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {cumulative}\n")
+        return self._header() + "".join(lines)
+
+
+# Gauges of the realtime servers, read from every table_server.TableServer of the process (see TableServer.__init__)
+ACTIVE_TABLES = Gauge('bridge_active_tables', 'Open tables')
+ACTIVE_CONNECTIONS = Gauge('bridge_active_connections', 'Connections seated at a table')
+SPECTATORS = Gauge('bridge_spectators', 'Connections watching a table')
@@ -0,0 +1,177 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from game_log import SNAPSHOT_EVERY, Event, GameLog, encode_event, iter_events
+from game_logic import Game
+
+"""
+Durable game logs in SQLite.
+
+TableStore keeps the event log (game_log.GameLog) of the rubber played at every table. Each event is one row, each
+snapshot replaces the rubber's previous one, so after a restart load() returns the logs of the rubbers in progress
+and a table is rebuilt from its last snapshot and the events after it.
+
+Writes never wait for the disk. They are queued and a writer thread commits everything queued so far in one
+transaction every flush_interval seconds (group commit). The database is in WAL mode with synchronous=NORMAL: a commit
+is an append to the write-ahead log without an fsync, which survives the server process being killed or restarted; an
+operating system crash or power loss can lose the last commits. Events queued but not yet committed are lost if the
+process dies, close() (or flush()) writes them on a clean shutdown.
+"""
+
+FLUSH_INTERVAL = 0.05  # seconds between group commits
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rubbers (
+    id INTEGER PRIMARY KEY,
+    table_id TEXT NOT NULL,
+    active INTEGER NOT NULL DEFAULT 1,
+    snapshot BLOB,
+    snapshot_index INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS rubbers_active ON rubbers (active, table_id);
+CREATE TABLE IF NOT EXISTS events (
+    rubber_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    event BLOB NOT NULL,
+    PRIMARY KEY (rubber_id, seq)
+) WITHOUT ROWID;
+"""
+
+_INSERT_EVENT = "INSERT OR REPLACE INTO events (rubber_id, seq, event) VALUES (?, ?, ?)"
+_UPDATE_SNAPSHOT = "UPDATE rubbers SET snapshot = ?, snapshot_index = ? WHERE id = ?"
+_CLOSE_RUBBERS = "UPDATE rubbers SET active = 0 WHERE table_id = ? AND active = 1"
+_INSERT_RUBBER = "INSERT INTO rubbers (id, table_id) VALUES (?, ?)"
+
+
+class StoredLog(GameLog):
+    def __init__(self, store: 'TableStore', rubber_id: int, table_id: str, snapshot_every: int = SNAPSHOT_EVERY):
+        """
+        Game log that also queues its events and snapshots for the store
+        """
+        super().__init__(snapshot_every)
+        self.store = store
+        self.rubber_id = rubber_id
+        self.table_id = table_id
+
+    def append(self, game: Game, event: Event) -> None:
+        # The event is queued before a snapshot it may trigger, so a stored snapshot never skips an event
+        self.store.write(_INSERT_EVENT, (self.rubber_id, len(self.events), encode_event(event)))
+        super().append(game, event)
+
+    def take_snapshot(self, game: Game) -> None:
+        super().take_snapshot(game)
+        self.store.write(_UPDATE_SNAPSHOT, (self.snapshot, self.snapshot_index, self.rubber_id))
+
+
+class TableStore:
+    def __init__(self, path: str, flush_interval: float = FLUSH_INTERVAL):
+        """
+        :param path: database file, created if needed
+        :param flush_interval: seconds between group commits
+        """
+        self.flush_interval = flush_interval
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+        self._lock = threading.Lock()  # one user of the connection at a time
+        self._next_id = self._connection.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM rubbers").fetchone()[0]
+        self._queue = queue.Queue()
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, name='table-store-writer', daemon=True)
+        self._writer.start()
+
+    def load(self, snapshot_every: int = SNAPSHOT_EVERY) -> Dict[str, StoredLog]:
+        """
+        :return: table id: log of the rubber in progress at that table
+        """
+        logs = {}
+        with self._lock:
+            rubbers = self._connection.execute(
+                "SELECT id, table_id, snapshot, snapshot_index FROM rubbers WHERE active = 1 ORDER BY id").fetchall()
+            for rubber_id, table_id, snapshot, snapshot_index in rubbers:
+                log = StoredLog(self, rubber_id, table_id, snapshot_every)
+                log.events = [next(iter_events(event)) for event, in self._connection.execute(
+                    "SELECT event FROM events WHERE rubber_id = ? ORDER BY seq", (rubber_id,))]
+                if snapshot is not None:
+                    log.snapshot, log.snapshot_index = snapshot, snapshot_index
+                logs[table_id] = log
+        return logs
+
+    def open_log(self, table_id: str, snapshot_every: int = SNAPSHOT_EVERY) -> StoredLog:
+        """
+        Start recording a new rubber at the table; the table's previous rubber stays in the database but is no longer
+        loaded
+        """
+        rubber_id = self._next_id
+        self._next_id += 1
+        self.write(_CLOSE_RUBBERS, (table_id,))
+        self.write(_INSERT_RUBBER, (rubber_id, table_id))
+        return StoredLog(self, rubber_id, table_id, snapshot_every)
+
+    def write(self, sql: str, parameters: tuple) -> None:
+        if self._closed:
+            raise ValueError("The store is closed")
+        self._queue.put((sql, parameters))
+
+    def flush(self) -> None:
+        """
+        Wait until everything queued so far is committed
+        """
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def close(self) -> None:
+        """
+        Commit what is queued and stop the writer
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join()
+        self._connection.close()
+
+    def _commit(self, batch: List[Tuple[str, tuple]]) -> None:
+        if not batch:
+            return
+        with self._lock:
+            self._connection.execute("BEGIN")
+            try:
+                for sql, parameters in batch:
+                    self._connection.execute(sql, parameters)
+            except sqlite3.Error:
+                # The writer thread carries on, the games themselves are not affected
+                self._connection.execute("ROLLBACK")
+                logger.exception("Lost a batch of %d writes", len(batch))
+                return
+            self._connection.execute("COMMIT")
+
+    def _write_loop(self) -> None:
+        # Queue items: (sql, parameters) to write, an Event to set once everything before it is committed, None to stop
+        while True:
+            item = self._queue.get()  # sleep until there is something to write
+            if isinstance(item, tuple):
+                time.sleep(self.flush_interval)  # let the batch grow
+            batch = []
+            while True:
+                if isinstance(item, tuple):
+                    batch.append(item)
+                else:
+                    self._commit(batch)
+                    batch = []
+                    if item is None:
+                        return
+                    item.set()
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            self._commit(batch)
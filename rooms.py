@@ -0,0 +1,92 @@
+from typing import Callable, Dict, Generic, List, Optional, Set, TypeVar
+
+"""
+Hosting many independent tables in one server process.
+
+TableManager keeps one table object (a Handler for the Socket.IO server, a Game for the HTTP one) per table id and
+remembers which connection sits at which table. Tables are created when the first connection joins and destroyed
+when the last one leaves. The table id doubles as the Socket.IO room name, so broadcasts reach only that table.
+"""
+
+DEFAULT_TABLE = 'main'
+
+T = TypeVar('T')
+
+
+class TableManager(Generic[T]):
+    def __init__(self, factory: Callable[[], T], on_close: Optional[Callable[[T], None]] = None):
+        """
+        :param factory: builds a new table
+        :param on_close: called with a table when it is destroyed
+        """
+        self._factory = factory
+        self._on_close = on_close
+        self.tables: Dict[str, T] = {}
+        self.members: Dict[str, Set[str]] = {}  # table id: sids connected to it
+        self.sid_tables: Dict[str, str] = {}  # sid: table id
+
+    def get(self, table_id: str) -> Optional[T]:
+        return self.tables.get(table_id)
+
+    def get_or_create(self, table_id: str) -> T:
+        if table_id not in self.tables:
+            self.tables[table_id] = self._factory()
+            self.members[table_id] = set()
+        return self.tables[table_id]
+
+    def put(self, table_id: str, table: T) -> T:
+        """
+        Set the table object of an id, e.g. a new game for every board of a tournament; connections stay seated
+        """
+        previous = self.tables.get(table_id)
+        if previous is not None and previous is not table and self._on_close:
+            self._on_close(previous)
+        self.tables[table_id] = table
+        self.members.setdefault(table_id, set())
+        return table
+
+    def join(self, sid: str, table_id: str) -> T:
+        """
+        Seat a connection at a table, creating the table if needed. A connection sits at one table at a time
+        """
+        if self.sid_tables.get(sid) not in (None, table_id):
+            self.leave(sid)
+        table = self.get_or_create(table_id)
+        self.members[table_id].add(sid)
+        self.sid_tables[sid] = table_id
+        return table
+
+    def leave(self, sid: str) -> Optional[str]:
+        """
+        :return: id of the table the connection left, or None if it was not at any table
+        """
+        table_id = self.sid_tables.pop(sid, None)
+        if table_id is None:
+            return None
+        self.members[table_id].discard(sid)
+        if not self.members[table_id]:
+            self.remove_table(table_id)
+        return table_id
+
+    def remove_table(self, table_id: str) -> None:
+        table = self.tables.pop(table_id, None)
+        for sid in self.members.pop(table_id, set()):
+            self.sid_tables.pop(sid, None)
+        if table is not None and self._on_close:
+            self._on_close(table)
+
+    def table_id_of(self, sid: str) -> Optional[str]:
+        return self.sid_tables.get(sid)
+
+    def table_of(self, sid: str) -> Optional[T]:
+        table_id = self.sid_tables.get(sid)
+        return self.tables[table_id] if table_id is not None else None
+
+    def table_ids(self) -> List[str]:
+        return list(self.tables)
+
+    def __len__(self) -> int:
+        return len(self.tables)
+
+    def __contains__(self, table_id: str) -> bool:
+        return table_id in self.tables
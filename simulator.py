@@ -0,0 +1,215 @@
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from random import Random
+from typing import Callable, Dict, List, Optional, Tuple
+
+from core.bids import DOUBLE_CODE, LEGAL_BIDS, PASS_CODE
+from core.bitboard import iter_indices, legal_mask
+from core.deal import Card
+from core.deal_enums import Direction, GameStatus
+from game_logic import Game, get_player_by_direction
+
+"""
+Headless simulation of complete rubbers.
+
+Each rubber is played through Game exactly as at a table: dealing, auction, play and rubber scoring. The calls and the
+cards come from bot policies, objects with bid(game) -> call string and play(game) -> card string methods that are
+asked whenever the player of their direction is to act. A policy factory takes the rubber's Random and returns the
+policy for every direction, so bots can share state (or not) as they like.
+
+Rubber i of a run with seed s always uses Random(f"{s}:{i}") for both the deck and the bots, so results do not depend
+on how the rubbers are spread over worker processes.
+
+Command line: python simulator.py --games 10000 --seed 42 --processes 8
+"""
+
+CHUNK_SIZE = 250  # rubbers per task sent to a worker process
+MAX_DEALS = 200  # a rubber is abandoned after this many deals (e.g. bots that always pass)
+
+
+class RandomPolicy:
+    def __init__(self, rng: Random, pass_probability: float = 0.6, raise_range: int = 5):
+        """
+        Random legal calls and cards
+        :param pass_probability: chance of passing when the bot could call something else
+        :param raise_range: the bot picks one of this many lowest legal contract bids (or a double)
+        """
+        self.rng = rng
+        self.pass_probability = pass_probability
+        self.raise_range = raise_range
+
+    def bid(self, game: Game) -> str:
+        mask = game.auction.legal_bid_mask(game.playing_direction) & ~(1 << PASS_CODE)
+        if not mask or self.rng.random() < self.pass_probability:
+            return LEGAL_BIDS[PASS_CODE]
+        codes = list(iter_indices(mask))
+        contract_bids = [code for code in codes if code < DOUBLE_CODE][:self.raise_range]
+        return LEGAL_BIDS[self.rng.choice(contract_bids + [code for code in codes if code >= DOUBLE_CODE])]
+
+    def play(self, game: Game) -> str:
+        player = get_player_by_direction(game.players, game.playing_direction)
+        led_suit = game.play.trick[0][1].suit if game.play.trick else None
+        # Straight from the card mask, the cards do not need to be sorted for display
+        return str(Card.from_index(self.rng.choice(list(iter_indices(legal_mask(player.hand.mask, led_suit))))))
+
+
+def random_policies(rng: Random) -> Dict[Direction, RandomPolicy]:
+    policy = RandomPolicy(rng)
+    return {direction: policy for direction in Direction}
+
+
+class RubberResult:
+    def __init__(self, deals: int, passed_out: int, contracts_made: int, points_ns: int, points_ew: int,
+                 winner: Optional[str]):
+        self.deals = deals
+        self.passed_out = passed_out
+        self.contracts_made = contracts_made  # out of deals - passed_out played contracts
+        self.points_ns = points_ns
+        self.points_ew = points_ew
+        self.winner = winner  # 'NS', 'EW' or None for an abandoned rubber
+
+    @property
+    def finished(self) -> bool:
+        return self.winner is not None
+
+
+def play_rubber(policy_factory: Callable[[Random], Dict[Direction, object]], rng: Random,
+                max_deals: int = MAX_DEALS) -> RubberResult:
+    """
+    Play one rubber to the end (or until max_deals deals were dealt)
+    """
+    game = Game(rng)
+    policies = policy_factory(rng)
+    deals = passed_out = contracts_made = 0
+
+    while game.game_status != GameStatus.GAME_OVER:
+        status = game.game_status
+        if status == GameStatus.DEAL_CARDS:
+            if deals == max_deals:
+                break
+            game.deal_cards()
+            deals += 1
+        elif status == GameStatus.AUCTION:
+            game.bid(policies[game.playing_direction].bid(game))
+            if game.game_status == GameStatus.DEAL_CARDS:
+                passed_out += 1
+        elif status == GameStatus.PLAY:
+            # Declarer plays for dummy, as at the table
+            direction = game.playing_direction
+            if direction == game.auction.contract.declarer.partner():
+                direction = game.auction.contract.declarer
+            game.play_card(policies[direction].play(game))
+        elif status == GameStatus.DISPLAY_SCORE:
+            game.prepare_new_deal()
+
+        if game.game_status in (GameStatus.DISPLAY_SCORE, GameStatus.GAME_OVER) and status == GameStatus.PLAY:
+            contract = game.auction.contract
+            tricks = game.play.tricks_ns if contract.declarer in (Direction.NORTH, Direction.SOUTH) \
+                else game.play.tricks_ew
+            contracts_made += tricks >= contract.level + 6
+
+    score = game.get_current_scores()
+    winner = None
+    if game.game_status == GameStatus.GAME_OVER:
+        # The side that won the last game collected the bigger rubber bonus
+        winner = 'NS' if score.team_ns.rubber_bonus > score.team_ew.rubber_bonus else 'EW'
+    return RubberResult(deals, passed_out, contracts_made, score.team_ns.score_sum(), score.team_ew.score_sum(),
+                        winner)
+
+
+class SimulationReport:
+    def __init__(self):
+        self.games = 0
+        self.finished = 0
+        self.wins_ns = 0
+        self.wins_ew = 0
+        self.deals = 0
+        self.passed_out = 0
+        self.contracts_made = 0
+        self.points_ns = 0
+        self.points_ew = 0
+        self.elapsed = 0.0
+
+    def add(self, result: RubberResult) -> None:
+        self.games += 1
+        self.finished += result.finished
+        self.wins_ns += result.winner == 'NS'
+        self.wins_ew += result.winner == 'EW'
+        self.deals += result.deals
+        self.passed_out += result.passed_out
+        self.contracts_made += result.contracts_made
+        self.points_ns += result.points_ns
+        self.points_ew += result.points_ew
+
+    def merge(self, other: 'SimulationReport') -> None:
+        for name in ('games', 'finished', 'wins_ns', 'wins_ew', 'deals', 'passed_out', 'contracts_made',
+                     'points_ns', 'points_ew'):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    @property
+    def games_per_second(self) -> float:
+        return self.games / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        played = self.deals - self.passed_out
+        games = self.games or 1
+        return (
+            f"{self.games} rubbers ({self.games - self.finished} abandoned) in {self.elapsed:.2f}s, "
+            f"{self.games_per_second:,.1f} rubbers/s\n"
+            f"Rubbers won: NS {self.wins_ns}, EW {self.wins_ew}\n"
+            f"Deals: {self.deals} ({self.passed_out} passed out), contracts made: {self.contracts_made}/{played}\n"
+            f"Average points per rubber: NS {self.points_ns / games:.1f}, EW {self.points_ew / games:.1f}"
+        )
+
+
+def simulate_chunk(seed: int, start: int, count: int,
+                   policy_factory: Callable[[Random], Dict[Direction, object]] = random_policies) -> SimulationReport:
+    """
+    Play rubbers start .. start + count - 1 of the run with the given seed
+    """
+    report = SimulationReport()
+    for index in range(start, start + count):
+        report.add(play_rubber(policy_factory, Random(f"{seed}:{index}")))
+    return report
+
+
+def _chunk_plan(games: int) -> List[Tuple[int, int]]:
+    return [(start, min(CHUNK_SIZE, games - start)) for start in range(0, games, CHUNK_SIZE)]
+
+
+def simulate(games: int, seed: int = 0, processes: int = 1,
+             policy_factory: Callable[[Random], Dict[Direction, object]] = random_policies) -> SimulationReport:
+    """
+    :param games: number of rubbers
+    :param seed: seed of the run, the same seed gives the same results for any number of processes
+    :param processes: number of worker processes the rubbers are shared between
+    :param policy_factory: module-level callable (it is sent to the workers) returning the bot of every direction
+    """
+    start_time = time.perf_counter()
+    report = SimulationReport()
+    plan = _chunk_plan(games)
+    if processes > 1 and len(plan) > 1:
+        with ProcessPoolExecutor(processes) as pool:
+            futures = [pool.submit(simulate_chunk, seed, start, count, policy_factory) for start, count in plan]
+            for future in futures:
+                report.merge(future.result())
+    else:
+        for start, count in plan:
+            report.merge(simulate_chunk(seed, start, count, policy_factory))
+    report.elapsed = time.perf_counter() - start_time
+    return report
+
+
+def main(args: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Play bridge rubbers between bots without a server")
+    parser.add_argument("--games", type=int, required=True, help="number of rubbers")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the reproducible run")
+    parser.add_argument("--processes", type=int, default=1, help="worker processes")
+    options = parser.parse_args(args)
+
+    print(simulate(options.games, options.seed, options.processes))
+
+
+if __name__ == "__main__":
+    main()
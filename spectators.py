@@ -0,0 +1,108 @@
+import json
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+"""
+Spectators (kibitzers) of the tables.
+
+A spectator is seated at a table like a player, so rooms.TableManager keeps the table open while it is watched, but
+it is not in the table's Socket.IO room. It is in the table's spectator room instead and only gets 'spectator_update'
+messages with the public view of the game (Handler.public_status). Every change of a watched table builds that view
+once and serializes it once to JSON, and the same string is broadcast to the whole room: the work per change does not
+depend on the number of spectators, and tables nobody watches build nothing.
+
+With a delay (as on VuGraph, so that the view cannot help the players) the serialized views wait in a queue until they
+are due. release() returns only the newest due view of every table: each view is complete, older ones can be skipped,
+so a fast played hand costs at most one broadcast per tick. A joining spectator gets the last released view.
+"""
+
+SPECTATOR_ROLE = 'Spectator'
+SPECTATOR_TICK = 0.1  # seconds between releases of delayed views
+
+
+_SPECTATOR_SUFFIX = '/spectators'
+
+
+def spectator_room(table_id: str) -> str:
+    return f"{table_id}{_SPECTATOR_SUFFIX}"
+
+
+def room_table(room: str) -> str:
+    """
+    :return: id of the table a room belongs to, the table's own room or its spectator room
+    """
+    return room[:-len(_SPECTATOR_SUFFIX)] if room.endswith(_SPECTATOR_SUFFIX) else room
+
+
+class SpectatorFeed:
+    def __init__(self):
+        self.sids: Set[str] = set()
+        self.pending: Deque[Tuple[float, str]] = deque()  # (due time, view), oldest first
+        self.latest: Optional[str] = None  # last view released to the spectators
+
+
+class Spectators:
+    def __init__(self, delay: float = 0.0, show_hands: bool = False):
+        """
+        :param delay: seconds between a change at the table and the spectators seeing it
+        :param show_hands: show all four hands (VuGraph), otherwise only the cards the players see of each other
+        """
+        self.delay = delay
+        self.show_hands = show_hands
+        self.feeds: Dict[str, SpectatorFeed] = {}  # table id: its spectators, only for watched tables
+        self.sid_tables: Dict[str, str] = {}  # sid: table id
+
+    def __contains__(self, sid: str) -> bool:
+        return sid in self.sid_tables
+
+    def watching(self, table_id: str) -> bool:
+        return table_id in self.feeds
+
+    def join(self, sid: str, table_id: str) -> SpectatorFeed:
+        if self.sid_tables.get(sid) not in (None, table_id):
+            self.leave(sid)
+        feed = self.feeds.setdefault(table_id, SpectatorFeed())
+        feed.sids.add(sid)
+        self.sid_tables[sid] = table_id
+        return feed
+
+    def leave(self, sid: str) -> Optional[str]:
+        """
+        :return: id of the table the spectator watched, or None if it was not a spectator
+        """
+        table_id = self.sid_tables.pop(sid, None)
+        if table_id is None:
+            return None
+        feed = self.feeds[table_id]
+        feed.sids.discard(sid)
+        if not feed.sids:
+            del self.feeds[table_id]
+        return table_id
+
+    def publish(self, table_id: str, handler, now: float) -> bool:
+        """
+        Queue the current view of a table for its spectators, if it has any
+        :param handler: the table's game_handler_jason.Handler
+        :param now: time.monotonic()
+        :return: whether a view was queued
+        """
+        feed = self.feeds.get(table_id)
+        if feed is None:
+            return False
+        view = json.dumps(handler.public_status(self.show_hands), separators=(',', ':'))
+        feed.pending.append((now + self.delay, view))
+        return True
+
+    def release(self, now: float) -> List[Tuple[str, str]]:
+        """
+        :return: (spectator room, view) with the newest due view of every table that has one
+        """
+        released = []
+        for table_id, feed in self.feeds.items():
+            view = None
+            while feed.pending and feed.pending[0][0] <= now:
+                view = feed.pending.popleft()[1]
+            if view is not None:
+                feed.latest = view
+                released.append((spectator_room(table_id), view))
+        return released
@@ -1,13 +1,17 @@
-const socket = io();
+// Table to sit at, chosen with ?table=<id> in the page address
+const tableId = new URLSearchParams(window.location.search).get('table') || 'main';
+// Messages with cards come as JSON, or packed (see core/wire.py and decodeWire below) when the page is opened with ?wire=binary
+const wireProtocol = new URLSearchParams(window.location.search).get('wire') === 'binary' ? 'binary' : 'json';
+const socket = io({query: {table: tableId, wire: wireProtocol}});
 let myRole = 'Spectator';
 
 socket.on('lobby_phase', () => lobbyPhase());
 
 socket.on('available_roles', roles => {
-    document.getElementById('join-button').disabled = (roles.length === 0);
     const dropdown = document.getElementById('role-dropdown');
     dropdown.innerHTML = '';
-    roles.forEach(role => {
+    // Watching is always possible, even at a full table
+    roles.concat(['Spectator']).forEach(role => {
         const opt = document.createElement('option');
         opt.value = role;
         opt.text = role;
@@ -20,10 +24,61 @@ socket.on('action_failed', msg => alert(msg));
 socket.on('role_assigned', role => {
     myRole = role;
     document.getElementById('your-role').innerText = role;
+    if (role === 'Spectator') {
+        document.getElementById('ready-btn').style.display = 'none';
+        document.getElementById('end-scores-btn').style.display = 'none';
+    }
     lobbyPhase();
 });
 
-socket.on('update_lobby', players => {
+// Spectators get the whole public view of the table in one message (a JSON string, serialized once for all of them)
+socket.on('spectator_update', payload => {
+    const view = JSON.parse(payload);
+    renderLobby(view.lobby);
+    switch (view.phase) {
+        case 'LOBBY':
+            lobbyPhase();
+            break;
+        case 'AUCTION':
+            document.getElementById('your-role-bid').innerText = myRole;
+            document.getElementById('curr-turn').innerText = view.turn;
+            renderBiddingTable(view.bidding_history);
+            renderBidButtons([]);
+            switchView('auction');
+            break;
+        case 'PLAY': {
+            const trickWon = view.trick.length === 0 && view.last_full_trick.length === 4 &&
+                (!playState || playState.trickCount.toString() !== view.trick_count.toString());
+            playState = {
+                version: view.version,
+                hands: view.direction_hands,
+                trick: view.trick,
+                lastFullTrick: view.last_full_trick,
+                trickCount: view.trick_count,
+                turn: view.current_playing_direction,
+                visDir: view.vis_dir,
+                dummyControllerSid: null,
+                contract: view.contract,
+            };
+            document.getElementById('your-role-play').innerText = myRole;
+            switchView('play');
+            renderPlay(trickWon);
+            break;
+        }
+        case 'DISPLAY_SCORE':
+            renderScore(view);
+            switchView('score');
+            break;
+        case 'GAME_OVER':
+            document.getElementById('final-score-display').innerText = view.scores;
+            switchView('game-over');
+            break;
+    }
+});
+
+socket.on('update_lobby', players => renderLobby(players));
+
+function renderLobby(players) {
     const list = document.getElementById('player-status');
     list.innerHTML = '';
 
@@ -39,13 +94,15 @@ socket.on('update_lobby', players => {
 
         list.appendChild(li);
     }
-});
+}
 
 
-socket.on('game_paused', () => {
-    alert('Game paused. A player left the game.');
-    const btn = document.getElementById('ready-btn');
-    btn.innerText = 'Ready';
+// The game goes on without a player who lost the connection, the seat is kept free for the player to take back
+socket.on('player_left', direction => alert(`Player ${direction} left the game. Waiting for the player to come back.`));
+
+// A reconnected client has a new connection id: take the seat back, the server then sends the current state
+socket.io.on('reconnect', () => {
+    if (myRole !== 'Spectator') socket.emit('choose_role', myRole);
 });
 
 socket.on('bidding_phase', () => {
@@ -64,7 +121,7 @@ socket.on('update_auction', data => {
 
 
 socket.on('player_update_auction', hand => {
-    renderOwnHand('your-auction-hand', hand);
+    renderOwnHand('your-auction-hand', unpack(hand));
 });
 
 
@@ -74,51 +131,124 @@ socket.on('play_phase', () => {
 });
 
 let trickDisplayed = false;
+// Local copy of the play state: a full snapshot from 'update_play', then kept current with 'play_delta'
+let playState = null;
 
 socket.on('update_play', data => {
-    const {turn, trick_count, trick, direction_hands, legal_hand, last_full_trick, vis_dir,
-        dummy_controller_sid, current_playing_direction, contract} = data;
+    data = unpack(data);
+    playState = {
+        version: data.version,
+        hands: data.direction_hands,
+        trick: data.trick,
+        lastFullTrick: data.last_full_trick,
+        trickCount: data.trick_count,
+        turn: data.current_playing_direction,
+        visDir: data.vis_dir,
+        dummyControllerSid: data.dummy_controller_sid,
+        contract: data.contract,
+    };
+    renderPlay(data.trick.length === 0 && data.last_full_trick && data.last_full_trick.length === 4);
+});
 
-    let isMyTurn
-    if (dummy_controller_sid === socket.id && current_playing_direction === vis_dir){
-        isMyTurn = true;
+socket.on('play_delta', data => {
+    data = unpack(data);
+    if (!playState || !data || data.deltas.length === 0 || data.deltas[0].version !== playState.version + 1) {
+        // A missed change (or a table joined mid play) cannot be patched, ask the server for the full state
+        playState = null;
+        socket.emit('request_resync');
+        return;
     }
-    else if (current_playing_direction === vis_dir) {
-        isMyTurn = false
+    let trickWon = false;
+    data.deltas.forEach(delta => {
+        applyPlayDelta(delta);
+        trickWon = trickWon || delta.type === 'trick_won';
+    });
+    playState.version = data.version;
+    renderPlay(trickWon);
+});
+
+function applyPlayDelta(delta) {
+    const hand = playState.hands[delta.direction];
+    switch (delta.type) {
+        case 'card_played': {
+            // Hidden hands are only a list of card backs, one of them goes
+            const index = hand.includes(delta.card) ? hand.indexOf(delta.card) : hand.indexOf('*');
+            hand.splice(index, 1);
+            playState.trick.push([delta.direction, delta.card]);
+            break;
+        }
+        case 'dummy_revealed':
+            playState.hands[delta.direction] = delta.cards;
+            playState.visDir = delta.direction;
+            break;
+        case 'trick_won':
+            playState.lastFullTrick = playState.trick;
+            playState.trick = [];
+            playState.trickCount = delta.trick_count;
+            break;
+        case 'turn':
+            playState.turn = delta.direction;
+            break;
     }
-    else {
-        isMyTurn = turn;
+}
+
+function isMyPlayTurn() {
+    if (myRole === 'Spectator') return false;
+    const {turn, visDir, dummyControllerSid} = playState;
+    if (turn === visDir) {
+        return dummyControllerSid === socket.id;
     }
+    return turn === myRole[0];
+}
+
+function legalCards() {
+    // Follow the suit led if possible, otherwise any card
+    const hand = playState.hands[playState.turn].filter(card => card !== '*');
+    const led = playState.trick.length ? playState.trick[0][1][0] : null;
+    const following = hand.filter(card => card[0] === led);
+    return following.length ? following : hand;
+}
+
+function renderPlay(showLastTrick) {
+    const isMyTurn = isMyPlayTurn();
+    const legal = isMyTurn ? legalCards() : [];
+    const {hands, trick, lastFullTrick, trickCount, visDir, contract} = playState;
 
     document.getElementById('curr-turn-play').innerText = isMyTurn;
-    document.getElementById('tricks-ns').innerText = trick_count[0];
-    document.getElementById('tricks-we').innerText = trick_count[1];
+    document.getElementById('tricks-ns').innerText = trickCount[0];
+    document.getElementById('tricks-we').innerText = trickCount[1];
     document.getElementById('contract-play').innerText = contract;
 
-    if (trick.length === 0 && last_full_trick && last_full_trick.length === 4) {
+    if (showLastTrick && trick.length === 0) {
         trickDisplayed = true;
-        renderTrick(last_full_trick);
+        renderTrick(lastFullTrick);
 
         setTimeout(() => {
             trickDisplayed = false;
-            renderTrick([]);
-            renderHands('hands-view', direction_hands, legal_hand, isMyTurn, myRole[0], vis_dir);
+            if (playState) renderPlay(false);
         }, 1500);
     } else {
         renderTrick(trick);
-        renderHands('hands-view', direction_hands, legal_hand, isMyTurn, myRole[0], vis_dir);
+        renderHands('hands-view', hands, legal, isMyTurn);
     }
-});
-
+}
 
 
+socket.on('update_score', data => renderScore(data));
 
-socket.on('update_score', data => {
+function renderScore(data) {
     const {trick_count, contract, scores} = data;
     document.getElementById('tricks-ns-score').innerText = trick_count[0];
     document.getElementById('tricks-we-score').innerText = trick_count[1];
     document.getElementById('contract-score').innerText = contract;
     document.getElementById('score-display').innerText = scores;
+    document.getElementById('par-score').innerText = '-';
+}
+
+socket.on('update_par', data => {
+    const {contract, score, error} = data;
+    // error: 'timeout' when the deal took the solver too long, 'failed' when it could not be solved
+    document.getElementById('par-score').innerText = error ? 'n/a' : `${contract} (NS ${score})`;
 });
 
 socket.on('score_phase', () => switchView('score'));
@@ -225,7 +355,7 @@ function makeBidFromButton(bid) {
     socket.emit('make_bid', bid);
 }
 
-function renderHands(containerId, view, legalCards = [], isMyTurn = false, currentDir = null, vis_dir) {
+function renderHands(containerId, view, legalCards = [], isMyTurn = false) {
     const container = document.getElementById(containerId);
     container.innerHTML = '';
 
@@ -247,7 +377,7 @@ function renderHands(containerId, view, legalCards = [], isMyTurn = false, curre
             const button = document.createElement('button');
             button.className = 'card-button';
 
-            const isVisible = dir === currentDir || vis_dir === dir;
+            const isVisible = card !== '*';  // hidden cards come as '*'
             const isLegal = legalCards.includes(card) && !trickDisplayed; //&& isVisible && isMyTurn
 
             if (isLegal) {
@@ -325,3 +455,103 @@ function renderTrick(trick) {
     container.appendChild(gridWrapper);
 }
 
+
+// Binary protocol, the layout is described in core/wire.py
+const WIRE_DIRECTIONS = 'NESW';
+const WIRE_RANKS = '23456789TJQKA';
+const WIRE_DISPLAY_SUITS = [3, 2, 0, 1];  // spades, hearts, clubs, diamonds, as hands are shown
+const WIRE_DELTAS = ['card_played', 'dummy_revealed', 'trick_won', 'turn'];
+const WIRE_VISIBLE = 255;
+const wireText = new TextDecoder();
+
+function unpack(data) {
+    return data instanceof ArrayBuffer ? decodeWire(new Uint8Array(data)) : data;
+}
+
+function wireCard(index) {
+    return 'CDHS'[Math.floor(index / 13)] + WIRE_RANKS[index % 13];
+}
+
+function wireDirection(value) {
+    return value === 255 ? null : WIRE_DIRECTIONS[value];
+}
+
+function wireMask(bytes, offset) {
+    // 52-bit mask in 7 little-endian bytes, read bit by bit into the cards in display order
+    const cards = [];
+    WIRE_DISPLAY_SUITS.forEach(suit => {
+        for (let rank = 12; rank >= 0; rank--) {
+            const index = suit * 13 + rank;
+            if (bytes[offset + (index >> 3)] & (1 << (index & 7))) cards.push(wireCard(index));
+        }
+    });
+    return cards;
+}
+
+function decodeWire(bytes) {
+    const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+    let offset = 0;
+    const readTrick = () => {
+        const trick = [];
+        for (let i = 0; i < bytes[offset]; i++) {
+            trick.push([WIRE_DIRECTIONS[bytes[offset + 1 + 2 * i]], wireCard(bytes[offset + 2 + 2 * i])]);
+        }
+        offset += 1 + 2 * bytes[offset];
+        return trick;
+    };
+
+    switch (bytes[0]) {
+        case 1:
+            return wireMask(bytes, 1);
+        case 2: {
+            const flags = bytes[1];
+            const data = {
+                turn: (flags & 1) !== 0,
+                version: view.getUint32(2, true),
+                trick_count: [bytes[6], bytes[7]],
+                current_playing_direction: wireDirection(bytes[8]),
+                vis_dir: wireDirection(bytes[9]),
+                legal_hand: wireMask(bytes, 10),
+                dummy_controller_sid: (flags & 2) ? socket.id : null,
+                direction_hands: {},
+            };
+            offset = 17;
+            for (const dir of WIRE_DIRECTIONS) {
+                if (bytes[offset] === WIRE_VISIBLE) {
+                    data.direction_hands[dir] = wireMask(bytes, offset + 1);
+                    offset += 8;
+                } else {
+                    data.direction_hands[dir] = Array(bytes[offset]).fill('*');
+                    offset += 1;
+                }
+            }
+            data.trick = readTrick();
+            data.last_full_trick = readTrick();
+            data.contract = wireText.decode(bytes.subarray(offset + 1, offset + 1 + bytes[offset]));
+            return data;
+        }
+        case 3: {
+            const first = view.getUint32(1, true);
+            const count = bytes[5];
+            const deltas = [];
+            offset = 6;
+            for (let i = 0; i < count; i++) {
+                const delta = {version: first + i, type: WIRE_DELTAS[bytes[offset]], direction: WIRE_DIRECTIONS[bytes[offset + 1]]};
+                offset += 2;
+                if (delta.type === 'card_played') {
+                    delta.card = wireCard(bytes[offset]);
+                    offset += 1;
+                } else if (delta.type === 'dummy_revealed') {
+                    delta.cards = wireMask(bytes, offset);
+                    offset += 7;
+                } else if (delta.type === 'trick_won') {
+                    delta.trick_count = [bytes[offset], bytes[offset + 1]];
+                    offset += 2;
+                }
+                deltas.push(delta);
+            }
+            return {version: first + count - 1, deltas};
+        }
+    }
+    throw new Error(`Unknown binary message ${bytes[0]}`);
+}
@@ -0,0 +1,337 @@
+import logging
+import os
+from collections import namedtuple
+from concurrent.futures import Executor
+from contextlib import contextmanager
+from time import monotonic, perf_counter
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from core import wire
+from game_handler_jason import Handler
+from game_log import GameLog
+from metrics import ACTIVE_CONNECTIONS, ACTIVE_TABLES, SPECTATORS, Counter, Histogram
+from rooms import TableManager
+from spectators import SPECTATOR_ROLE, Spectators, spectator_room
+
+"""
+The realtime game shared by app_socket.py (Flask-SocketIO on gevent) and app_async.py (python-socketio on asyncio).
+
+TableServer holds the tables, spectators and wire protocol of the connections, and turns every Socket.IO event into
+the list of actions the server then carries out: Emit a message, MoveRoom a connection between rooms, StartPar to
+wait for the deal's par in the background. All decisions (which phase follows, who gets which message in which
+encoding, when the spectators see a change) are made here, once; the servers only adapt the actions to their
+Socket.IO flavour, one call at a time in app_socket.py and awaited in app_async.py.
+
+The metrics of both servers and their configuration from the environment live here as well:
+BRIDGE_PAR_TIME_LIMIT: seconds the double dummy table of a deal may take before its par is given up, 0 turns par off;
+BRIDGE_SPECTATOR_DELAY: seconds the spectators lag behind the table; BRIDGE_VUGRAPH=1: they see all four hands.
+"""
+
+PAR_TIME_LIMIT = float(os.environ.get('BRIDGE_PAR_TIME_LIMIT', 30))
+SPECTATOR_DELAY = float(os.environ.get('BRIDGE_SPECTATOR_DELAY', 0))
+VUGRAPH = os.environ.get('BRIDGE_VUGRAPH') == '1'
+LOCAL_ADDRESSES = ('127.0.0.1', '::1')  # the only clients allowed to read /metrics
+
+EVENT_LATENCY = Histogram('bridge_event_duration_seconds', 'Time spent handling a Socket.IO event', ['event'])
+EVENT_ERRORS = Counter('bridge_event_errors_total', 'Socket.IO event handlers that raised', ['event'])
+EMITS = Counter('bridge_emits_total', 'Messages sent to clients, one per recipient', ['event'])
+EMIT_BYTES = Counter('bridge_emit_bytes_total', 'Encoded size of the messages sent to clients', ['event'])
+
+logger = logging.getLogger(__name__)
+
+# data None sends the event without arguments; skip_sid: sids of the room that do not get it
+Emit = namedtuple('Emit', ['event', 'data', 'to', 'skip_sid'], defaults=[None, None])
+# leave or enter None: the connection only enters or only leaves a room
+MoveRoom = namedtuple('MoveRoom', ['sid', 'leave', 'enter'])
+# wait for the job in the background, then send par_update(...)
+StartPar = namedtuple('StartPar', ['handler', 'table_id', 'par_job'])
+
+
+@contextmanager
+def timed(event: str):
+    """
+    Time an event handler and count its errors
+    """
+    start = perf_counter()
+    try:
+        yield
+    except Exception:
+        EVENT_ERRORS.inc(event)
+        raise
+    finally:
+        EVENT_LATENCY.observe(perf_counter() - start, event)
+
+
+def count_packet(packet) -> None:
+    # Every message to every client goes through Engine.IO, a room emit is encoded once and sent per member
+    data = packet.data
+    # Socket.IO EVENT 2["name",...] or BINARY_EVENT 51-["name",...], followed by its binary attachment
+    if isinstance(data, str) and data[:1] in ('2', '5'):
+        start = data.find('["') + 2
+        event = data[start:data.find('"', start)]
+        EMITS.inc(event)
+        EMIT_BYTES.inc(event, amount=len(data.encode()))
+    elif isinstance(data, bytes):
+        EMIT_BYTES.inc(wire.event_of(data), amount=len(data))
+
+
+def par_update(handler: Handler, table_id: str, par_job) -> Optional[Emit]:
+    """
+    :param par_job: a finished job of the table
+    :return: the table's 'update_par' message, None when the job is stale (a new deal started or the table closed)
+    """
+    if par_job is not handler.par_job:
+        return None
+    try:
+        status = handler.par_status(par_job)
+    except TimeoutError:
+        logger.info("Gave up the par of table %s after %s s", table_id, handler.par_time_limit)
+        status = {'error': 'timeout'}
+    except Exception:
+        logger.exception("Par of table %s failed", table_id)
+        status = {'error': 'failed'}
+    return Emit('update_par', status, table_id)
+
+
+class TableServer:
+    def __init__(self, solver_pool: Executor):
+        """
+        :param solver_pool: process pool solving the par of every table
+        """
+        self.tables: TableManager[Handler] = TableManager(lambda: Handler(solver_pool, PAR_TIME_LIMIT),
+                                                          on_close=Handler.close)
+        # table id: event log of its rubber, kept after the table closes; filled by the server at startup with the
+        # rubbers in progress when it stopped
+        self.table_logs: Dict[str, GameLog] = {}
+        self.spectators = Spectators(SPECTATOR_DELAY, VUGRAPH)
+        self.binary_clients: Set[str] = set()  # sids that asked for card messages in the binary protocol (core.wire)
+        ACTIVE_TABLES.bind(self.table_count)
+        ACTIVE_CONNECTIONS.bind(self.connection_count)
+        SPECTATORS.bind(self.spectator_count)
+
+    def table_count(self) -> int:
+        return len(self.tables)
+
+    def connection_count(self) -> int:
+        return len(self.tables.sid_tables)
+
+    def spectator_count(self) -> int:
+        return len(self.spectators.sid_tables)
+
+    def seat_of(self, sid: str) -> Tuple[Optional[Handler], Optional[str]]:
+        return self.tables.table_of(sid), self.tables.table_id_of(sid)
+
+    def join(self, sid: str, table_id: str, binary: bool) -> Tuple[Handler, bool]:
+        """
+        Seat a new connection at its table
+        :param binary: the client asked for the binary protocol with ?wire=binary
+        :return: the table and whether it was just created, in which case the server restores its rubber
+        """
+        if binary:
+            self.binary_clients.add(sid)
+        new_table = table_id not in self.tables
+        return self.tables.join(sid, table_id), new_table
+
+    def restore(self, table_id: str, handler: Handler) -> bool:
+        """
+        Continue the rubber in progress at a new table (everybody left, or the server restarted) from its last
+        snapshot and the events after it
+        :return: whether there was one; if not, the server starts a new rubber with new_rubber
+        """
+        log = self.table_logs.get(table_id)
+        return log is not None and handler.restore(log)
+
+    def new_rubber(self, table_id: str, handler: Handler, log: GameLog) -> None:
+        """
+        :param log: a new log from the server's TableStore
+        """
+        handler.restore(log)
+        self.table_logs[table_id] = log
+
+    def connected(self, sid: str) -> List[Any]:
+        handler, table_id = self.seat_of(sid)
+        # Every table is a Socket.IO room named after its id. In a running game the free seats are those of players
+        # who left, a player coming back takes one to continue
+        return [MoveRoom(sid, None, table_id), Emit('available_roles', handler.available_dirs(), table_id)]
+
+    def disconnect(self, sid: str) -> List[Any]:
+        self.binary_clients.discard(sid)
+        handler, table_id = self.seat_of(sid)
+        if handler is None:
+            return []
+        actions = []
+        direction = handler.direction_of(sid)
+        if handler.remove_player(sid):
+            if handler.game_running:
+                actions.append(Emit('player_left', direction, table_id))
+            actions.append(Emit('available_roles', handler.available_dirs(), table_id))
+        actions.append(Emit('update_lobby', handler.get_status(), table_id))
+        if self.spectators.leave(sid) is None:
+            actions += self.spectator_update(handler, table_id)
+        self.tables.leave(sid)  # the table is destroyed when its last connection leaves
+        return actions
+
+    def choose_role(self, sid: str, role: str) -> List[Any]:
+        handler, table_id = self.seat_of(sid)
+        if role == SPECTATOR_ROLE:
+            return self.watch(handler, table_id, sid)
+        if sid in self.spectators:
+            return [Emit('action_failed', 'Spectators cannot take a seat.', sid)]
+        if not handler.add_player(sid, role):
+            return [Emit('action_failed', f'Role {role} is taken. Select a different role.', sid)]
+        actions = [
+            Emit('role_assigned', role, sid),
+            Emit('update_lobby', handler.get_status(), table_id),
+            Emit('available_roles', handler.available_dirs(), table_id),
+        ]
+        if handler.game_running:
+            # A player back at a running game gets its current state from the live (or rebuilt) rubber
+            actions += self.phase_state(handler, sid, sid)
+        return actions + self.spectator_update(handler, table_id)
+
+    def watch(self, handler: Handler, table_id: str, sid: str) -> List[Any]:
+        # Spectators leave the table's room: they only get the public view, delayed if so configured
+        if sid in handler.player_dict:
+            return [Emit('action_failed', 'Players cannot become spectators.', sid)]
+        feed = self.spectators.join(sid, table_id)
+        actions = [MoveRoom(sid, table_id, spectator_room(table_id)), Emit('role_assigned', SPECTATOR_ROLE, sid)]
+        if feed.latest is not None:
+            actions.append(Emit('spectator_update', feed.latest, sid))
+        else:
+            actions += self.spectator_update(handler, table_id)
+        return actions
+
+    def toggle_ready(self, sid: str) -> List[Any]:
+        handler, table_id = self.seat_of(sid)
+        handler.toggle_ready(sid)
+        actions = [Emit('update_lobby', handler.get_status(), table_id)]
+
+        if handler.game_running:
+            if handler.get_game_status_str() == 'DEAL_CARDS':
+                handler.deal_cards()
+            actions += self.phase_state(handler, table_id)
+        return actions + self.spectator_update(handler, table_id)
+
+    def phase_state(self, handler: Handler, to: str, sid: Optional[str] = None) -> List[Emit]:
+        """
+        The phase of the game and its state, for the whole table or for one player
+        :param to: the table id, or the sid of a player taking a seat in a running game
+        :param sid: the player's sid; None sends every player its hand
+        """
+        status = handler.get_game_status_str()
+        if status == 'AUCTION':
+            return [Emit('bidding_phase', None, to), Emit('update_auction', handler.auction_status(), to),
+                    *self.player_auction(handler, sid)]
+        if status == 'PLAY':
+            return [Emit('play_phase', None, to), *self.player_play(handler, sid)]
+        if status == 'DISPLAY_SCORE':
+            actions = [Emit('score_phase', None, to), Emit('update_score', handler.score_status(), to)]
+            if sid and handler.par_job is not None and handler.par_ready(handler.par_job):
+                update = par_update(handler, to, handler.par_job)
+                actions += [update] if update else []
+            return actions
+        if status == 'GAME_OVER':
+            return [Emit('game_finished', None, to), Emit('update_game_over', handler.game_over_status(), to)]
+        return []
+
+    def make_bid(self, sid: str, bid) -> List[Any]:
+        handler, table_id = self.seat_of(sid)
+        if not handler.make_bid(sid, bid):
+            return [Emit('action_failed', "Can't bid. Not your turn, wrong phase or illegal bid.", sid)]
+        actions = [Emit('update_auction', handler.auction_status(), table_id), *self.player_auction(handler)]
+        if handler.get_game_status_str() == 'PLAY':
+            actions += [Emit('play_phase', None, table_id), *self.player_play(handler)]
+        return actions + self.spectator_update(handler, table_id)
+
+    def play_card(self, sid: str, card) -> List[Any]:
+        handler, table_id = self.seat_of(sid)
+        version = handler.rubber.version
+        if not handler.play_card(sid, card):
+            return [Emit('action_failed', "Can't play. Not your turn, wrong phase or illegal card.", sid)]
+        actions = self.spectator_update(handler, table_id)
+
+        if handler.get_game_status_str() == 'DISPLAY_SCORE':
+            return actions + [Emit('score_phase', None, table_id),
+                              Emit('update_score', handler.score_status(), table_id),
+                              StartPar(handler, table_id, handler.par_job)]
+        elif handler.get_game_status_str() == 'GAME_OVER':
+            return actions + [Emit('game_finished', None, table_id),
+                              Emit('update_game_over', handler.game_over_status(), table_id),
+                              StartPar(handler, table_id, handler.par_job)]
+
+        # Only what changed goes out, the same message for the whole table; hands are kept by the clients
+        return actions + self.by_wire('play_delta', handler.play_delta(version), wire.encode_delta, table_id)
+
+    def request_resync(self, sid: str) -> List[Any]:
+        # A client that missed a delta (or joined late) asks for the full state, which is sent to it alone
+        handler = self.tables.table_of(sid)
+        if handler is not None and sid in handler.player_dict and handler.get_game_status_str() == 'PLAY':
+            return self.player_play(handler, sid)
+        return []
+
+    def end_scores(self, sid: str) -> List[Any]:
+        handler, table_id = self.seat_of(sid)
+        if not handler.end_scores(sid):
+            return [Emit('action_failed', "Only players can start the next deal, once the score is shown.", sid)]
+        return [
+            Emit('bidding_phase', None, table_id),
+            Emit('update_auction', handler.auction_status(), table_id),
+            *self.player_auction(handler),
+            *self.spectator_update(handler, table_id),
+        ]
+
+    def spectator_update(self, handler: Handler, table_id: str) -> List[Emit]:
+        # The public view is built and serialized once per change, whatever the number of spectators
+        if self.spectators.publish(table_id, handler, monotonic()) and not self.spectators.delay:
+            return self.spectator_views()
+        return []
+
+    def spectator_views(self) -> List[Emit]:
+        """
+        :return: the views due to the spectators of every table, sent every SPECTATOR_TICK when they are delayed
+        """
+        return [Emit('spectator_update', view, room) for room, view in self.spectators.release(monotonic())]
+
+    def by_wire(self, event: str, message, encode, table_id: str) -> List[Emit]:
+        # The same message for the whole table, packed once for the binary clients and once as JSON for the others
+        members = self.tables.members.get(table_id, ())
+        binary = [sid for sid in members if sid in self.binary_clients]
+        text = [sid for sid in members if sid not in self.binary_clients]
+        actions = []
+        if text:
+            actions.append(Emit(event, message, table_id, binary))
+        if binary:
+            actions.append(Emit(event, encode(message), table_id, text))
+        return actions
+
+    def player_auction(self, handler: Handler, sid: Optional[str] = None) -> List[Emit]:
+        player_hands = handler.get_player_hands()
+        return [
+            Emit('player_update_auction', wire.encode_hand(hand) if sid in self.binary_clients else hand, sid)
+            for sid, hand in ([(sid, player_hands[sid])] if sid else player_hands.items())
+        ]
+
+    def player_play(self, handler: Handler, sid: Optional[str] = None) -> List[Emit]:
+        hand_status = handler.player_hand_update()
+        visible_hands = handler.get_visible_hands_per_sid()
+        play_status = handler.play_status()
+        dummy_controller = handler.get_dummy_controller_sid()
+
+        actions = []
+        for sid in [sid] if sid else handler.player_dict:
+            update = {
+                'turn': hand_status['player_turns'][sid],
+                'trick_count': play_status['trick_count'],
+                'trick': play_status['trick'],
+                'last_full_trick': play_status['last_full_trick'],
+                'direction_hands': visible_hands[sid],
+                'legal_hand': hand_status['legal_hand'],
+                'vis_dir': handler.get_visible_dir(),
+                'contract': play_status['contract'],
+                'dummy_controller_sid': dummy_controller,
+                'current_playing_direction': play_status['current_playing_direction'],
+                'version': play_status['version'],
+            }
+            actions.append(Emit('update_play', wire.encode_play(update, sid) if sid in self.binary_clients else update,
+                                sid))
+        return actions
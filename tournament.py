@@ -0,0 +1,99 @@
+from typing import List, Optional, Tuple
+
+from core.archive import DealArchive, write_archive
+from core.dealer import generate_deals
+from core.deal_enums import Direction, GameStatus
+from core.duplicate import DuplicateSession
+from core.movements import Movement
+from game_logic import Game
+from rooms import TableManager
+
+"""
+A duplicate pairs event played on the server's tables.
+
+The deals of all boards are generated when the event is created and written to a deal archive, so every table that
+plays board b gets exactly the same cards. Each table of the movement is a table of the room manager with the id
+"<event>-<table number>"; for every board the table gets a new Game with the board dealt, the board's dealer
+starting the auction and the board's vulnerability. When the board is over its contract and tricks go into the
+event's DuplicateSession, which gives the standings at any moment.
+"""
+
+
+class Tournament:
+    def __init__(self, movement: Movement, archive: DealArchive, tables: TableManager, event_id: str = 'event'):
+        """
+        :param archive: deals of the boards, board b being record b (see deal_boards)
+        :param tables: room manager the games are put in
+        """
+        if len(archive) < movement.boards:
+            raise ValueError(f"The movement needs {movement.boards} boards, the archive has {len(archive)}")
+        self.movement = movement
+        self.archive = archive
+        self.tables = tables
+        self.table_ids = movement.table_ids(event_id)
+        self.session = DuplicateSession(*movement.board_pairs())
+        self.round = 0
+
+    @staticmethod
+    def deal_boards(movement: Movement, path: str, seed: Optional[int] = None) -> DealArchive:
+        """
+        Deal all boards of the movement into a new archive
+        """
+        write_archive(path, [generate_deals(movement.boards, seed)])
+        return DealArchive(path)
+
+    def assignments(self) -> List[Tuple[str, int, int, range]]:
+        """
+        :return: (table id, NS pair, EW pair, boards) of every table playing in the current round
+        """
+        movement = self.movement
+        return [(self.table_ids[table], int(movement.ns[self.round, table]), int(movement.ew[self.round, table]),
+                 movement.boards_at(self.round, table))
+                for table in range(movement.tables) if movement.is_played(self.round, table)]
+
+    def start_board(self, table: int, board: int) -> Game:
+        """
+        Put a new game with the board dealt at the table
+        """
+        if not self.movement.is_played(self.round, table) or board not in self.movement.boards_at(self.round, table):
+            raise ValueError(f"Board {board + 1} is not played at table {table + 1} in round {self.round + 1}")
+        deal, dealer, vulnerability = self.archive[board]
+        game = Game()
+        game.game_starter_direction = dealer
+        game.score.team_ns.vulnerable = vulnerability.is_vulnerable(Direction.NORTH)
+        game.score.team_ew.vulnerable = vulnerability.is_vulnerable(Direction.EAST)
+        game.deal_cards(deal)
+        return self.tables.put(self.table_ids[table], game)
+
+    def record_board(self, table: int, board: int) -> None:
+        """
+        Score the board just played at the table
+        """
+        game = self.tables.get(self.table_ids[table])
+        if game is None:
+            raise ValueError(f"Table {table + 1} has no game")
+        cell = self.movement.result_cell(self.round, table, board)
+        if game.game_status == GameStatus.DEAL_CARDS and game.dealt_hands is not None:
+            self.session.set_result(*cell, None)  # passed out, the game went back to dealing
+        elif game.game_status in (GameStatus.DISPLAY_SCORE, GameStatus.GAME_OVER):
+            contract = game.auction.contract
+            tricks_ns, tricks_ew = game.get_tricks_count()
+            tricks = tricks_ns if contract.declarer.value % 2 == 0 else tricks_ew
+            self.session.set_result(*cell, contract, tricks)
+        else:
+            raise ValueError(f"Board {board + 1} is still being played at table {table + 1}")
+
+    def next_round(self) -> bool:
+        """
+        :return: False when the last round is over
+        """
+        if self.round + 1 >= self.movement.rounds:
+            return False
+        self.round += 1
+        return True
+
+    def standings(self, method: str = 'matchpoints') -> List[Tuple[int, int, float]]:
+        """
+        :return: (place, pair, total) best first, see DuplicateSession.ranking
+        """
+        return self.session.ranking(method)